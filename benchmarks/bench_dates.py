@@ -0,0 +1,128 @@
+# benchmarks/bench_dates.py
+#
+# Micro-benchmark for invoices.dates: times the per-item date-range step
+# against the dateutil-per-match code it replaced, and checks both agree.
+#
+#   python -m benchmarks.bench_dates [items]
+
+import random
+import re
+import sys
+import timeit
+
+from dateutil import parser as dateparser
+
+from invoices.dates import DateRangeParser
+
+SAMPLES = [
+    "Emissions testing on Boiler 1. Project Dates: July 14 to 17, 2017",
+    "Stack test Unit 2 Project Dates: March 3, 5-7, 2016",
+    "Mobilization and testing June 28- July 2, 2018",
+    "RATA testing May 5-8, 2015 and May 12-14, 2015",
+    "Test date: Sept 4, 2014 opacity",
+    "Compliance testing performed on Jan 9, 2013",
+    "Project Dates: Feb 2 to Mar 4, 2012",
+    "Particulate testing, no dates given",
+    "Project Dates: October 30 to November 2, 2019",
+    "Kiln 3 Project Dates: Aug 1-3, 8, 10-12, 2020",
+]
+
+def legacy_date_ranges(description, state):
+    """
+    The per-item date logic as pdf_reader ran it before invoices.dates;
+    state stands in for the prev_month local it shared across items.
+    """
+    date_ranges = []
+    for mo1,d1,mo2,d2,yr in re.findall(
+        r"([A-Za-z]+)\s+(\d{1,2})-(?:\s*)([A-Za-z]+)\s+(\d{1,2}),\s*(\d{4})",
+        description
+    ):
+        try:
+            s = dateparser.parse(f"{mo1} {d1}, {yr}").date()
+            e = dateparser.parse(f"{mo2} {d2}, {yr}").date()
+            date_ranges.append((s,e))
+        except: pass
+    for mo,d1,d2,yr in re.findall(
+        r"([A-Za-z]+)\s+(\d{1,2})-(\d{1,2}),\s*(\d{4})",
+        description
+    ):
+        try:
+            s = dateparser.parse(f"{mo} {d1}, {yr}").date()
+            e = dateparser.parse(f"{mo} {d2}, {yr}").date()
+            date_ranges.append((s,e))
+        except: pass
+    if len(date_ranges) <= 1:
+        if m := re.search(
+            r"Project\s+Dates?:\s*(.*?),\s*(\d{4})",
+            description, re.IGNORECASE
+        ):
+            raw, yr = m.groups()
+            if m_to := re.match(
+                r"([A-Za-z]+)\s+(\d{1,2})\s+to\s+(?:([A-Za-z]+)\s+)?(\d{1,2})",
+                raw, re.IGNORECASE
+            ):
+                mo1,d1,mo2,d2 = m_to.groups(); mo2=mo2 or mo1
+                try:
+                    s = dateparser.parse(f"{mo1} {d1}, {yr}").date()
+                    e = dateparser.parse(f"{mo2} {d2}, {yr}").date()
+                    date_ranges = [(s,e)]
+                except: date_ranges=[]
+            else:
+                prev_month = state.get("prev_month")
+                for part in [p.strip() for p in raw.split(",")]:
+                    if " " in part:
+                        prev_month,days = part.split(" ",1)
+                    elif prev_month is None:
+                        raise UnboundLocalError("prev_month")
+                    else:
+                        days = part
+                    state["prev_month"] = prev_month
+                    if "-" in days:
+                        d1,d2 = days.split("-",1)
+                    else:
+                        d1=d2=days
+                    try:
+                        s = dateparser.parse(f"{prev_month} {d1}, {yr}").date()
+                        e = dateparser.parse(f"{prev_month} {d2}, {yr}").date()
+                        date_ranges.append((s,e))
+                    except: pass
+    if not date_ranges:
+        if m_s := re.search(
+            r"Test\s*date[s]?:\s*([A-Za-z]+\s+\d{1,2},\s*\d{4})",
+            description, re.IGNORECASE
+        ):
+            try:
+                dt = dateparser.parse(m_s.group(1)).date()
+                date_ranges.append((dt,dt))
+            except: pass
+    if not date_ranges:
+        if m_any := re.search(r"([A-Za-z]+\s+\d{1,2},\s*\d{4})", description):
+            try:
+                dt = dateparser.parse(m_any.group(1)).date()
+                date_ranges.append((dt,dt))
+            except: pass
+    return date_ranges
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 2000
+    rng = random.Random(0)
+    items = [rng.choice(SAMPLES) for _ in range(n)]
+
+    # Both must agree before the timings mean anything
+    parser, state = DateRangeParser(), {}
+    for desc in SAMPLES:
+        new = parser.parse(desc)
+        old = legacy_date_ranges(desc, state)
+        assert new == old, (desc, new, old)
+
+    t_old = min(timeit.repeat(lambda: [legacy_date_ranges(d, state) for d in items],
+                              number=1, repeat=3))
+    t_new = min(timeit.repeat(lambda: [parser.parse(d) for d in items],
+                              number=1, repeat=3))
+    print(f"{n} items")
+    print(f"  dateutil per match: {t_old / n * 1e6:8.1f} us/item")
+    print(f"  invoices.dates:     {t_new / n * 1e6:8.1f} us/item")
+    print(f"  speedup:            {t_old / t_new:8.1f}x")
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,121 @@
+# benchmarks/bench_parser.py
+#
+# Micro-benchmark for the text side of invoices.pdf_reader on large
+# multi-page invoices: times the header search and the one-pass line
+# scan against the split-filter-rescan code they replaced, and checks
+# both agree on every invoice first.
+#
+#   python -m benchmarks.bench_parser [--items 20,200,2000] [--seed S]
+
+import argparse
+import random
+import re
+import timeit
+
+from benchmarks.corpus import PAGE_LINES, invoice_lines
+from invoices.pdf_reader import _find_header, _scan_items
+from invoices.utils import parse_amount
+
+_LEGACY_HEADER_RE = re.compile(
+    r"Invoice\s*(?:Number|No\.?)[:\s]*([\w-]+).*?"
+    r"Date[:\s]*([A-Za-z]{3,}\.?\s*\d{1,2},\s*\d{4})",
+    re.DOTALL|re.IGNORECASE
+)
+_LEGACY_ITEM_SPLIT_RE = re.compile(r"\r?\n(?=\s*\d+\s*\r?\n)")
+_LEGACY_ITEM_NO_RE = re.compile(r"\d+")
+_LEGACY_AMT_RE1 = re.compile(r"^\$\s?([\d,]+(?:\.\d+)?)$")
+_LEGACY_AMT_RE2 = re.compile(r"^[\d,]+(?:\.\d+)?$")
+
+def legacy_header(text):
+    """The header search as pdf_reader ran it before _find_header."""
+    header = _LEGACY_HEADER_RE.search(text)
+    return header.groups() if header else None
+
+def legacy_items(text):
+    """
+    Item blocks, descriptions and amounts as pdf_reader found them before
+    _scan_items, as (item number, description, amount) tuples.
+    """
+    blocks = _LEGACY_ITEM_SPLIT_RE.split(text)
+    item_blocks = []
+    for b in blocks:
+        lines = [ln.strip() for ln in b.splitlines() if ln.strip()]
+        if lines and _LEGACY_ITEM_NO_RE.fullmatch(lines[0]):
+            item_blocks.append(lines)
+
+    items = []
+    for lines in item_blocks:
+        item_idx = int(lines[0])
+        invoice_amount = None
+        amt_idx = len(lines)
+        for idx, ln in enumerate(lines):
+            ln_str = ln.strip()
+            if m1 := _LEGACY_AMT_RE1.match(ln_str):
+                invoice_amount = parse_amount(m1.group(1)); amt_idx = idx; break
+            if ln_str == "$" and idx+1 < len(lines):
+                if m2 := _LEGACY_AMT_RE2.match(lines[idx+1].strip()):
+                    invoice_amount = parse_amount(m2.group(0)); amt_idx = idx; break
+            if idx and (m3 := _LEGACY_AMT_RE2.match(ln_str)):
+                invoice_amount = parse_amount(m3.group(0)); amt_idx = idx; break
+        description = " ".join(lines[1:amt_idx]).strip()
+        items.append((item_idx, description, invoice_amount))
+    return items
+
+def invoice_text(rng, items, page_headers=False, dated=True):
+    """
+    Text of one synthetic invoice as pdf_reader.extract_text returns it:
+    PAGE_LINES lines per page, pages joined by newlines. page_headers
+    repeats the invoice number atop every page, as long invoices do;
+    dated=False drops every line with "date" in it, header date included,
+    which made the old header regex rescan the rest of the text from each
+    page's invoice number.
+    """
+    lines = invoice_lines(rng, "08100001", items)
+    if not dated:
+        lines = [ln for ln in lines if "date" not in ln.lower()]
+    pages = []
+    for start in range(0, len(lines), PAGE_LINES):
+        page = lines[start:start + PAGE_LINES]
+        if page_headers and start:
+            page = ["Invoice Number: 08100001 (continued)"] + page
+        pages.append("\n".join(page) + "\n")
+    return "\n".join(pages)
+
+def best(fn, repeat=5):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the header search and line scan of pdf_reader."
+    )
+    parser.add_argument("--items", default="20,200,2000",
+                        help="comma-separated line items per invoice")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    cases = []
+    for n in map(int, args.items.split(",")):
+        cases.append((f"{n} items", invoice_text(rng, n)))
+        cases.append((f"{n} items, page headers, no date",
+                      invoice_text(rng, n, page_headers=True, dated=False)))
+
+    # Both must agree before the timings mean anything
+    for name, text in cases:
+        assert _find_header(text) == legacy_header(text), name
+        assert list(_scan_items(text)) == legacy_items(text), name
+
+    print(f"{'invoice':<36}{'pages':>6}  {'phase':<8}{'old ms':>10}{'new ms':>10}{'speedup':>9}")
+    for name, text in cases:
+        pages = text.count("\n\n") + 1
+        for phase, old, new in (
+            ("header", legacy_header, _find_header),
+            ("items", legacy_items, lambda t: list(_scan_items(t))),
+        ):
+            t_old = best(lambda: old(text))
+            t_new = best(lambda: new(text))
+            print(f"{name:<36}{pages:>6}  {phase:<8}{t_old * 1e3:>10.3f}"
+                  f"{t_new * 1e3:>10.3f}{t_old / t_new:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# benchmarks/bench_readers.py
+#
+# End-to-end benchmark for the PDF reader path on a synthetic corpus
+# (see benchmarks/corpus.py). Times extract_invoice_data per file, split
+# into its extract_text and parse phases, then process_folder over the
+# whole corpus and append_to_workbook into a new and an existing store
+# and workbook.
+# Results are written as JSON; with --baseline, any phase slower than the
+# baseline by more than --threshold fails the run (exit status 1).
+#
+#   python -m benchmarks.bench_readers [--files N] [--items MAX]
+#       [--workers W] [--json OUT] [--baseline FILE] [--threshold 0.25]
+#
+# WPD files are left out: converting them needs LibreOffice, whose startup
+# would swamp everything measured here.
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from benchmarks.corpus import make_corpus
+from extract_invoice_data import append_to_workbook, process_folder
+from invoices import pdf_reader
+from invoices.store import store_path_for
+
+def best_of(repeat, fn):
+    """
+    Fastest of `repeat` runs of fn(), in seconds, and its last result.
+    Whatever fn prints (e.g. "Appended N records") is swallowed.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        with redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def run(args, workdir):
+    corpus_dir = os.path.join(workdir, "corpus")
+    t0 = time.perf_counter()
+    corpus = make_corpus(corpus_dir, args.files, args.items, args.seed)
+    generate = time.perf_counter() - t0
+    paths = sorted(corpus)
+    items = sum(corpus.values())
+
+    timings = {}
+
+    # 1) Per-file reader, end to end and by phase
+    timings["extract_invoice_data"], _ = best_of(args.repeat, lambda: [
+        pdf_reader.extract_invoice_data(p) for p in paths
+    ])
+    timings["extract_text"], texts = best_of(args.repeat, lambda: [
+        pdf_reader.extract_text(p) for p in paths
+    ])
+    timings["parse_invoice_text"], parsed = best_of(args.repeat, lambda: [
+        pdf_reader.parse_invoice_text(t) for t in texts
+    ])
+
+    # Timings of a parser that drops items are meaningless
+    found = sum(len(r) for r in parsed)
+    if found != items:
+        sys.exit(f"Parser found {found} items, corpus has {items}")
+
+    # 2) Whole folder, as the CLI runs it (no extraction cache)
+    timings["process_folder"], records = best_of(args.repeat, lambda:
+        process_folder(corpus_dir, workers=args.workers, cache=None)
+    )
+
+    # 3) Workbook: create store and workbook, then upsert the same
+    #    records again into the existing ones
+    wb_path = os.path.join(workdir, "bench.xlsx")
+    def append_new():
+        for path in (wb_path, store_path_for(wb_path)):
+            if os.path.exists(path):
+                os.remove(path)
+        append_to_workbook(records, wb_path, corpus_dir)
+    timings["append_new"], _ = best_of(args.repeat, append_new)
+    def append_existing():
+        append_to_workbook(records, wb_path, corpus_dir)
+    timings["append_existing"], _ = best_of(args.repeat, append_existing)
+
+    return {
+        "params": {
+            "files": args.files, "items": args.items, "seed": args.seed,
+            "workers": args.workers, "repeat": args.repeat,
+        },
+        "corpus": {"files": len(paths), "items": items, "generate_s": generate},
+        "timings": timings,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+    }
+
+def regressions(result, baseline, threshold):
+    """[(phase, baseline s, current s)] for phases past the threshold."""
+    if baseline["params"] != result["params"]:
+        sys.exit(f"Baseline was run with {baseline['params']}, "
+                 f"not {result['params']}; nothing to compare")
+    slow = []
+    for phase, base in baseline["timings"].items():
+        now = result["timings"].get(phase)
+        if now is not None and now > base * (1 + threshold):
+            slow.append((phase, base, now))
+    return slow
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the invoice readers.")
+    parser.add_argument("--files", type=int, default=200, help="invoices in the corpus (1-10000)")
+    parser.add_argument("--items", type=int, default=20, help="max line items per invoice (1-200)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="process_folder workers (default: one per CPU)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per phase; the fastest counts")
+    parser.add_argument("--json", default="bench_readers.json", help="where to write results")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown per phase vs the baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="tetco-bench-") as workdir:
+        result = run(args, workdir)
+
+    with open(args.json, "w") as f:
+        json.dump(result, f, indent=2)
+
+    corpus = result["corpus"]
+    print(f"\n{corpus['files']} files, {corpus['items']} items "
+          f"(generated in {corpus['generate_s']:.2f}s)")
+    for phase, secs in result["timings"].items():
+        print(f"  {phase:<22} {secs:8.3f} s  {secs / corpus['files'] * 1e3:8.2f} ms/file")
+    print(f"Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        slow = regressions(result, baseline, args.threshold)
+        for phase, base, now in slow:
+            print(f"REGRESSION {phase}: {base:.3f}s -> {now:.3f}s "
+                  f"(+{(now / base - 1) * 100:.0f}%)")
+        if slow:
+            sys.exit(1)
+        print(f"No phase slower than baseline by more than {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
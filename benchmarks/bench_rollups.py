@@ -0,0 +1,139 @@
+# benchmarks/bench_rollups.py
+#
+# Benchmark for the rollup tables of invoices.store on a synthetic
+# history: times the report queries answered from the rollups against
+# adding up every row (in SQL, and the pandas read_excel way reports were
+# made before the store), times what keeping the rollups current adds to
+# an upsert, and checks the rollups agree with the full recount first.
+#
+#   python -m benchmarks.bench_rollups [--rows 200000] [--clients 300] [--seed S]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import timeit
+
+import pandas as pd
+
+from invoices.store import InvoiceStore, _YEAR
+
+LOCATIONS = ["Salt Lake City, UT", "Ogden, UT", "Provo, UT", "Moab, UT",
+             "Elko, NV", "Ely, NV", "Rock Springs, WY", "Gillette, WY",
+             "Pocatello, ID", "Farmington, NM", None]
+
+# Everything added up from the rows; mobilizations once per invoice
+_RECOUNT = f"""
+    SELECT client_name, year, location, total(revenue),
+           count(DISTINCT nullif(invoice_key, '')), sum(line_items),
+           ifnull(sum(mobilizations), 0)
+    FROM (
+        SELECT client_name, {_YEAR} AS year, ifnull(location, '') AS location,
+               invoice_key, total(invoice_amount) AS revenue,
+               count(*) AS line_items, max(mobilization_count) AS mobilizations
+        FROM invoices
+        GROUP BY 1, 2, 3, 4, CASE WHEN invoice_key = '' THEN source_file END
+    )
+    GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+"""
+
+def history(rng, rows, clients, first=1995, last=2024):
+    """
+    Record dicts shaped like extracted line items, a few per invoice;
+    each client's jobs are at one to three sites of its own.
+    """
+    sites = {f"Client {n:03d}": rng.sample(LOCATIONS, rng.randint(1, 3))
+             for n in range(clients)}
+    names = list(sites)
+    number = 8000000
+    out = []
+    while len(out) < rows:
+        number += 1
+        client = rng.choice(names)
+        year = rng.randint(first, last)
+        date = f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{year}"
+        location = rng.choice(sites[client])
+        mobilizations = rng.randint(1, 3)  # the invoice's, on every item
+        for _ in range(rng.randint(1, 8)):
+            out.append({
+                "client_name": client,
+                "project_description": "Emissions testing on Boiler 1.",
+                "test_date_start": date,
+                "test_date_end": date,
+                "mobilization_count": mobilizations,
+                "invoice_amount": round(rng.uniform(500, 20000), 2),
+                "invoice_date": date,
+                "invoice_number": f"{number:08d}",
+                "location": location,
+                "source_file": f"{year}/{number}.pdf",
+            })
+    return out[:rows]
+
+def best(fn, repeat=5):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+def legacy_report(workbook_path):
+    """Revenue by client and year, reloading the whole sheet each time."""
+    df = pd.read_excel(workbook_path)
+    year = pd.to_datetime(df["invoice_date"], errors="coerce").dt.year
+    return df.groupby(["client_name", year])["invoice_amount"].sum()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark report queries on the store's rollups."
+    )
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--batch", type=int, default=200,
+                        help="rows in the timed upserts")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = InvoiceStore(os.path.join(tmp, "bench.sqlite"))
+        t = time.perf_counter()
+        store.upsert(history(rng, args.rows, args.clients), tmp)
+        print(f"{args.rows} rows loaded in {time.perf_counter() - t:.2f}s")
+
+        # Both must agree before the timings mean anything
+        rollups = store._db.execute("SELECT * FROM rollups ORDER BY 1, 2, 3").fetchall()
+        recount = store._db.execute(_RECOUNT).fetchall()
+        assert [r[:3] + (round(r[3], 2),) + r[4:] for r in rollups] == \
+               [r[:3] + (round(r[3], 2),) + r[4:] for r in recount]
+
+        workbook = os.path.join(tmp, "bench.xlsx")
+        store.export(workbook)
+
+        recount = lambda: store._db.execute(_RECOUNT).fetchall()
+        print(f"{'query':<30}{'baseline':<12}{'rollups ms':>12}{'base ms':>10}{'speedup':>9}")
+        for name, new, baseline, old, repeat in (
+            ("revenue by client and year", lambda: store.totals(("client_name", "year")),
+             "recount", recount, 5),
+            ("repeat customers", store.customers, "recount", recount, 5),
+            ("jobs by location", lambda: store.totals(("location",)),
+             "recount", recount, 5),
+            ("revenue by client and year", lambda: store.totals(("client_name", "year")),
+             "read_excel", lambda: legacy_report(workbook), 1),
+        ):
+            t_new = best(new)
+            t_old = best(old, repeat)
+            print(f"{name:<30}{baseline:<12}{t_new * 1e3:>12.2f}{t_old * 1e3:>10.1f}"
+                  f"{t_old / t_new:>8.0f}x")
+
+        # Upkeep: a rerun of existing files (all their rows) and a batch
+        # of new ones
+        rows = store.find()
+        files = {r["source_file"] for r in rows[:args.batch]}
+        rerun = [dict(r, invoice_amount=r["invoice_amount"] + 1)
+                 for r in rows if r["source_file"] in files]
+        fresh = history(random.Random(args.seed + 1), args.batch, args.clients,
+                        first=2025, last=2025)
+        for name, rows in (("rerun", rerun), ("new rows", fresh)):
+            t = best(lambda: store.upsert(rows, tmp))
+            print(f"upsert {len(rows)} ({name}): {t * 1e3:.2f} ms")
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_startup.py
+#
+# Startup benchmark for the command lines: times `--help` of each
+# tetco.py command (parsing its arguments and everything imported to get
+# there) and of the interactive scripts, over a bare interpreter, and
+# lists the heavy modules each one loads. Exits 1 if a tetco.py command
+# starts more than --cap ms slower than the bare interpreter, or loads
+# any of HEAVY, so it can run as a check.
+#
+#   python -m benchmarks.bench_startup [--repeat 5] [--cap 200]
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules no command may load before it has work for them
+HEAVY = ("tkinter", "openpyxl", "fitz", "pymupdf", "pandas", "dateutil")
+
+CASES = [
+    ("tetco.py", ["tetco.py", "--help"]),
+    ("tetco.py extract", ["tetco.py", "extract", "--help"]),
+    ("tetco.py locate", ["tetco.py", "locate", "--help"]),
+    ("tetco.py export", ["tetco.py", "export", "--help"]),
+    ("extract_invoice_data.py", ["extract_invoice_data.py", "--help"]),
+    ("find_locations_for_specific_clients.py",
+     ["find_locations_for_specific_clients.py", "--help"]),
+]
+
+def best(argv, repeat):
+    """Fastest wall time of `python argv` in seconds, over repeat runs."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, *argv], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+def heavy_imports(argv):
+    """The HEAVY modules `python argv` imports, from -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", *argv], cwd=ROOT,
+                          check=True, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, text=True)
+    names = {line.rsplit("|", 1)[-1].strip().split(".")[0]
+             for line in proc.stderr.splitlines()
+             if line.startswith("import time:")}
+    return [name for name in HEAVY if name in names]
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark command line startup and check it stays light."
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cap", type=float, default=200,
+                        help="most ms a tetco.py command may add to a bare "
+                             "interpreter's startup (default: %(default)s)")
+    args = parser.parse_args()
+
+    bare = best(["-c", "pass"], args.repeat)
+    print(f"bare interpreter: {bare * 1e3:.0f} ms\n")
+    print(f"{'command --help':<42}{'ms':>7}{'+ms':>7}  heavy imports")
+    failed = []
+    for name, argv in CASES:
+        t = best(argv, args.repeat)
+        heavy = heavy_imports(argv)
+        over = (t - bare) * 1e3
+        print(f"{name:<42}{t * 1e3:>7.0f}{over:>7.0f}  {', '.join(heavy) or '-'}")
+        if argv[0] == "tetco.py" and (over > args.cap or heavy):
+            failed.append(name)
+
+    if failed:
+        print(f"\nOver the {args.cap:g} ms cap or importing heavy modules: "
+              + ", ".join(failed))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
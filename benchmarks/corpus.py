@@ -0,0 +1,140 @@
+# benchmarks/corpus.py
+#
+# Synthetic invoice PDFs shaped like the real ones pdf_reader parses:
+# header with invoice number and date, numbered item blocks, "$" amounts
+# (inline, split over two lines, or bare) and every date-range style
+# invoices.dates understands.
+#
+#   python -m benchmarks.corpus OUT_DIR [--files N] [--items MAX] [--seed S]
+
+import argparse
+import os
+import random
+import textwrap
+
+import fitz               # PyMuPDF
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+ABBREVS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sept",
+           "Oct", "Nov", "Dec"]
+
+WORK = [
+    "Emissions testing on Boiler {n}.",
+    "Stack test Unit {n}",
+    "RATA testing on Kiln {n}",
+    "Particulate and opacity testing, Dryer {n}",
+    "Compliance testing for NOx and CO on Turbine {n}",
+    "Mobilization and testing of Unit {n}",
+    "Additional mobilization for retest of Stack {n}",
+]
+
+# Lines per page; keeps every line well inside a US Letter page
+PAGE_LINES = 52
+
+def _month(rng):
+    m = rng.randrange(12)
+    return m, rng.choice((MONTHS, ABBREVS))[m]
+
+def date_phrase(rng, year):
+    """One dated phrase in a randomly chosen style from invoices.dates."""
+    m, mo = _month(rng)
+    d = rng.randint(1, 20)
+    style = rng.randrange(7)
+    if style == 0:      # cross-month hyphen
+        m2 = (m + 1) % 12
+        return f"{mo} {d + 7}- {MONTHS[m2]} {rng.randint(1, 5)}, {year}"
+    if style == 1:      # same-month range, sometimes two of them
+        s = f"{mo} {d}-{d + 3}, {year}"
+        if rng.random() < 0.3:
+            s += f" and {mo} {d + 5}-{d + 7}, {year}"
+        return s
+    if style == 2:      # "Project Dates: X to Y"
+        if rng.random() < 0.5:
+            return f"Project Dates: {mo} {d} to {d + 3}, {year}"
+        return f"Project Dates: {mo} {d + 7} to {MONTHS[(m + 1) % 12]} {d}, {year}"
+    if style == 3:      # "Project Dates:" comma list
+        return f"Project Dates: {mo} {d}, {d + 2}-{d + 4}, {d + 7}, {year}"
+    if style == 4:
+        return f"Test date: {mo} {d}, {year}"
+    if style == 5:      # bare "Month D, YYYY"
+        return f"performed on {mo} {d}, {year}"
+    return "no dates given"
+
+def amount_lines(rng):
+    """Amount as one of the three layouts the parser accepts."""
+    amt = f"{rng.randint(100, 99999):,}.{rng.randint(0, 99):02d}"
+    style = rng.randrange(3)
+    if style == 0:
+        return [f"${amt}"]
+    if style == 1:
+        return ["$", amt]
+    return [amt]
+
+def description_lines(text):
+    """Wrap a description like a real invoice column, without ever leaving
+    a digits-only line that would read as an item number."""
+    lines = textwrap.wrap(text, 48)
+    if any(ln.strip().isdigit() for ln in lines):
+        return [text]
+    return lines
+
+def invoice_lines(rng, invoice_number, items):
+    year = rng.randint(1995, 2022)
+    lines = [
+        "TETCO",
+        "Invoice Number: " + invoice_number,
+        f"Date: {rng.choice(MONTHS)} {rng.randint(1, 28)}, {year}",
+        "Bill To:",
+        "Synthetic Client Co.",
+        "Item",
+        "Description",
+        "Amount",
+    ]
+    for i in range(1, items + 1):
+        work = rng.choice(WORK).format(n=rng.randint(1, 9))
+        lines.append(str(i))
+        lines += description_lines(f"{work} {date_phrase(rng, year)}")
+        lines += amount_lines(rng)
+    lines += ["Total Due", "Thank you for your business."]
+    return lines
+
+def write_invoice(path, lines):
+    """Write lines to a PDF, PAGE_LINES per page."""
+    doc = fitz.open()
+    for start in range(0, len(lines), PAGE_LINES):
+        page = doc.new_page()
+        page.insert_text((50, 40), lines[start:start + PAGE_LINES], fontsize=10)
+    doc.save(path)
+    doc.close()
+
+def make_corpus(folder, files=100, items=20, seed=0):
+    """
+    Write `files` invoices to folder with 1..items line items each and
+    return {path: item count}. The same seed always gives the same corpus.
+    """
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    corpus = {}
+    for n in range(files):
+        number = f"{8100000 + n:08d}"
+        count = rng.randint(1, items)
+        # Spread files over a few subfolders, as the real archive is
+        path = os.path.join(folder, f"{1995 + n % 28}", f"Client INVOICE {number}.pdf")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_invoice(path, invoice_lines(rng, number, count))
+        corpus[path] = count
+    return corpus
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic invoice corpus.")
+    parser.add_argument("out", help="folder to write the PDFs into")
+    parser.add_argument("--files", type=int, default=100, help="number of invoices (1-10000)")
+    parser.add_argument("--items", type=int, default=20, help="max line items per invoice (1-200)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    corpus = make_corpus(args.out, args.files, args.items, args.seed)
+    print(f"Wrote {len(corpus)} invoices ({sum(corpus.values())} items) to {args.out}")
+
+if __name__ == "__main__":
+    main()
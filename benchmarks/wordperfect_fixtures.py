@@ -0,0 +1,178 @@
+# benchmarks/wordperfect_fixtures.py
+#
+# Fixtures for the native WordPerfect reader (invoices.wordperfect):
+# synthetic invoices (see benchmarks/corpus.py), accented client names
+# and sites included, saved as PDF and encoded as WordPerfect 5.1 and 6.x
+# documents with the same text among the formatting codes those carry.
+# The check decodes every WPD natively and exits 1 unless its lines and
+# its parsed items match those pdf_reader gets from the PDF. The
+# fixtures are kept under benchmarks/fixtures/wordperfect; --write
+# makes them afresh.
+#
+#   python -m benchmarks.wordperfect_fixtures [--dir DIR]
+#   python -m benchmarks.wordperfect_fixtures --write [--files N] [--seed S]
+
+import argparse
+import os
+import random
+import struct
+import sys
+
+from benchmarks.corpus import invoice_lines, write_invoice
+from invoices import wordperfect
+from invoices.pdf_reader import extract_text, parse_invoice_text
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "fixtures", "wordperfect")
+
+# (folder, major version, minor version) of each encoding
+VERSIONS = [("wp51", 0, 1), ("wp6", 2, 0)]
+
+CLIENTS = ["Société Générale Énergie", "Müller Gößnitz Kraftwerk",
+           "Ñuñoa Eléctrica", "Årslev Æble Varme", "Façade Frères Inc.",
+           "Açúcar Guaraní", "Synthetic Client Co."]
+SITES = [" at the Gößnitz plant", " for Ñuñoa Energía", " at the Rhône façade",
+         " at Åkersberga", ""]
+
+# Extended characters by text, as (character set, number)
+_EXTENDED = {ch: (charset, number)
+             for charset, chars in wordperfect._CHARSETS.items()
+             for number, ch in chars.items()}
+_WP6_SINGLE = {ch: code
+               for code, ch in enumerate(wordperfect._WP6_INTERNATIONAL, start=0x01)}
+
+def _group5(code, sub, payload):
+    """A WP5 variable-length function: code, subcode, length, body, code."""
+    body = payload + struct.pack("<H", len(payload) + 4) + bytes([sub, code])
+    return bytes([code, sub]) + struct.pack("<H", len(body)) + body
+
+def _group6(code, sub, payload):
+    """A WP6 variable-length function, its length counting every byte."""
+    return (bytes([code, sub]) + struct.pack("<H", len(payload) + 6) + b"\0"
+            + payload + bytes([code]))
+
+# Per major version: codes that end a line, codes that add nothing (to
+# scatter through the text), the extended character function, and the
+# single-byte hard space
+_CODES = {
+    0: ([b"\x0a", b"\x0d", b"\x8c", b"\xc1" + bytes(7) + b"\xc1",
+         b"\xc2" + bytes(9) + b"\xc2", _group5(0xdc, 1, b"\x01\x02\x03")],
+        [b"\xc3\x0c\xc3", b"\xc4\x0c\xc4", b"\xc5\x00\x00\x00\xc5", b"\x81",
+         _group5(0xd0, 2, b"xyzzy\x0a"),
+         _group5(0xd5, 0, b"HEADER INVOICE NO. 999 text")],
+        0xc0, b"\xa0"),
+    2: ([b"\xcc", b"\x87", b"\xc7", _group6(0xe0, 0x11, b"\x00\x10"),
+         _group6(0xd0, 0x04, b"ab")],
+        [b"\xf2\x0c\xf2", b"\xf3\x0c\xf3", b"\xf1\x00\x00\x00\xf1", b"\x82",
+         _group6(0xd4, 0x1b, bytes(5)), _group6(0xd6, 0, b"HEADER text")],
+        0xf0, b"\x81"),
+}
+
+def encode(text, major, minor, rng):
+    """
+    text as a WordPerfect document of the given version: the 16-byte
+    prefix, a packet area of filler, then the text stream, with line ends
+    as assorted line-ending codes, codes that add nothing scattered
+    between characters, and accented letters as the version stores them.
+    """
+    breaks, noise, extended, hard_space = _CODES[major]
+    out = bytearray()
+    for ch in text:
+        if rng.random() < 0.05:
+            out += rng.choice(noise)
+        if ch == "\n":
+            out += rng.choice(breaks)
+        elif major == 2 and ch in _WP6_SINGLE:
+            out.append(_WP6_SINGLE[ch])
+        elif ch in _EXTENDED:
+            charset, number = _EXTENDED[ch]
+            out += bytes([extended, number, charset, extended])
+        elif ch == " " and rng.random() < 0.05:
+            out += hard_space
+        elif " " < ch <= "~" and rng.random() < 0.02:
+            out += bytes([extended, ord(ch), 0, extended])  # ASCII, the long way
+        elif " " <= ch <= "~":
+            out += ch.encode("ascii")
+        else:
+            raise ValueError(f"{ch!r} has no code in this WordPerfect version")
+    packets = bytes(rng.randrange(256) for _ in range(rng.randrange(600)))
+    prefix = struct.pack("<4sIBBBBHH", b"\xffWPC", 16 + len(packets),
+                         1, 10, major, minor, 0, 0)
+    return prefix + packets + bytes(out)
+
+def write_fixtures(folder, files=4, items=8, seed=0):
+    """
+    Write `files` invoices to folder as pdf/NAME.pdf plus one NAME.wpd per
+    VERSIONS folder; return the PDF paths.
+    """
+    rng = random.Random(seed)
+    pdfs = []
+    for n in range(files):
+        number = f"{8200000 + n:08d}"
+        lines = invoice_lines(rng, number, rng.randint(1, items))
+        lines[lines.index("Synthetic Client Co.")] = CLIENTS[n % len(CLIENTS)]
+        lines = [line + rng.choice(SITES) if line.startswith(("Emissions", "Stack"))
+                 else line for line in lines]
+        name = f"INVOICE {number}"
+        pdf = os.path.join(folder, "pdf", name + ".pdf")
+        os.makedirs(os.path.dirname(pdf), exist_ok=True)
+        write_invoice(pdf, lines)
+        text = extract_text(pdf)
+        for sub, major, minor in VERSIONS:
+            os.makedirs(os.path.join(folder, sub), exist_ok=True)
+            with open(os.path.join(folder, sub, name + ".wpd"), "wb") as f:
+                f.write(encode(text, major, minor, rng))
+        pdfs.append(pdf)
+    return pdfs
+
+def _lines(text):
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def check(folder):
+    """Compare every fixture WPD with its PDF; return the mismatches."""
+    failed = []
+    pdf_dir = os.path.join(folder, "pdf")
+    for name in sorted(os.listdir(pdf_dir)):
+        text = extract_text(os.path.join(pdf_dir, name))
+        expected = (_lines(text), parse_invoice_text(text))
+        for sub, _, _ in VERSIONS:
+            wpd = os.path.join(folder, sub, os.path.splitext(name)[0] + ".wpd")
+            try:
+                decoded = wordperfect.extract_text(wpd)
+            except wordperfect.WordPerfectError as e:
+                failed.append((wpd, str(e)))
+                continue
+            lines = _lines(decoded)
+            if lines != expected[0]:
+                diff = next((a, b) for a, b in zip(lines + [None], expected[0] + [None])
+                            if a != b)
+                failed.append((wpd, f"line {diff[0]!r}, PDF has {diff[1]!r}"))
+            elif parse_invoice_text(decoded) != expected[1]:
+                failed.append((wpd, "parses differently from the PDF"))
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check (or write) the WordPerfect reader's fixtures."
+    )
+    parser.add_argument("--dir", default=FIXTURES,
+                        help="fixtures folder (default: %(default)s)")
+    parser.add_argument("--write", action="store_true",
+                        help="write the fixtures afresh, then check them")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.write:
+        pdfs = write_fixtures(args.dir, args.files, seed=args.seed)
+        print(f"Wrote {len(pdfs)} invoices as PDF, WP5.1 and WP6 to {args.dir}")
+    failed = check(args.dir)
+    for path, reason in failed:
+        print(f"{path}: {reason}")
+    count = len(os.listdir(os.path.join(args.dir, "pdf"))) * len(VERSIONS)
+    print(f"{count - len(failed)} of {count} WordPerfect fixtures match their PDF")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
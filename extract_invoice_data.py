@@ -1,147 +1,551 @@
+import argparse
+import itertools
 import os
+import shutil
 import sys
-import tkinter as tk
-from tkinter import filedialog, simpledialog
-
-import openpyxl
-
-from invoices.pdf_reader import extract_invoice_data as extract_pdf
-from invoices.wpd_reader import extract_invoice_data as extract_wpd
-
-# Path to your fixed Excel workbook
-WORKBOOK_PATH = r"C:\Users\akitc\OneDrive\Desktop\Data project\Tetco_invoices.xlsx"
-
-# Map file extensions to reader functions
-READERS = {
-    '.pdf': extract_pdf,
-    '.wpd': extract_wpd,
-}
-
-def process_folder(folder_path):
-    """Recursively parse all supported invoices in folder_path."""
-    rows = []
-    for dirpath, _, filenames in os.walk(folder_path):
-        for fname in filenames:
-            ext = os.path.splitext(fname)[1].lower()
-            reader = READERS.get(ext)
-            if not reader:
-                continue
-            full = os.path.join(dirpath, fname)
-            try:
-                data = reader(full)
-                items = data if isinstance(data, list) else [data]
-                for rec in items:
-                    rec['source_file'] = os.path.relpath(full, folder_path)
-                    rows.append(rec)
-            except Exception as e:
-                print(f"Error processing {full}: {e}")
-    return rows
-
-def append_to_workbook(rows):
-    """Append rows into the fixed Excel workbook with formatting."""
-    cols = [
-        "client_name",
-        "project_description",
-        "test_date_start",
-        "test_date_end",
-        "mobilization_count",
-        "invoice_amount",
-        "invoice_date",
-        "invoice_number",
-        "location",
-    ]
-    wb = openpyxl.load_workbook(WORKBOOK_PATH)
-    ws = wb.active
-    start_row = ws.max_row + 1
-
-    for rec in rows:
-        for col_idx, key in enumerate(cols, start=1):
-            cell = ws.cell(row=start_row, column=col_idx, value=rec.get(key))
-
-            # Wrap only the description column
-            if key == "project_description":
-                cell.alignment = openpyxl.styles.Alignment(wrap_text=True)
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+
+from invoices import archive, config, timing
+from invoices.cache import ExtractionCache, file_digest
+from invoices.dedupe import dedupe as dedupe_paths, print_skipped
+from invoices.records import to_dicts
+from invoices.soffice import ConversionService
+from invoices.store import CHECKPOINT_FILES, InvoiceStore, RunCheckpoint
+from invoices.supervisor import (FILE_TIMEOUT, FILES_PER_WORKER, MEMORY_LIMIT,
+                                 SupervisedPool, WorkerError, WorkerLimits)
+from invoices.watch import STATE_PATH, IngestState, watch
+from invoices.wordperfect import WordPerfectError
+
+# File extensions read as invoices; invoices.document picks the reader
+READERS = {'.pdf', '.wpd'}
+
+# Watch mode also picks up zip/tar archives of invoices
+WATCHED = READERS | archive.EXTENSIONS
+
+def iter_invoice_paths(folder_path):
+    """Every supported invoice under folder_path; archived ones as archive.Members."""
+    return archive.walk(folder_path, READERS)
+
+# Concurrent soffice conversions in the parallel pipeline, for the WPD
+# files the native reader can't decode
+CONVERTERS = 2
+
+# Heavy imports of the parsers, loaded once in the fork server rather
+# than by each parser worker as it starts
+WORKER_PRELOAD = ("fitz", "dateutil.parser")
+
+def _parse_file(path, timed=False, pdf_path=None, convert_s=None, convert=True):
+    """
+    (text, items, error, stats) for one file; never raises. None*4 if
+    convert is off and a WPD needs converting.
+    """
+    # The readers (PyMuPDF and all) load on the first file to parse, so
+    # a run that parses nothing here (all cached, or in a pool) skips them
+    from invoices.document import ExtractedDocument
+    if timed:
+        timing.enable()
+    with timing.timed_file(path) as stats:
+        doc = ExtractedDocument(pdf_path or path, convert=convert)
+        try:
+            text, items, error = doc.text, doc.items, None
+        except WordPerfectError:
+            return None, None, None, None
+        except Exception as e:
+            text, items, error = None, None, str(e) or type(e).__name__
+    if stats is not None and convert_s is not None:
+        stats["stages"]["convert"] = convert_s
+        stats["total_s"] += convert_s
+    return text, items, error, stats
+
+def _relay(done):
+    """Callback settling Future done the way the future it gets was."""
+    def relay(f):
+        try:
+            done.set_result(f.result())
+        except Exception as e:
+            done.set_exception(e)
+    return relay
+
+def _convert_then_parse(full, service, converter, pool, tmpdir, timed):
+    """Future of _parse_file's result for full, converted to PDF first."""
+    done = Future()
+
+    def convert():
+        t0 = time.perf_counter()
+        outdir = tempfile.mkdtemp(dir=tmpdir)
+        try:
+            # An archive member is the one thing written out, for soffice
+            pdf = service.convert(archive.spill(full, outdir), outdir)
+        except BaseException:
+            shutil.rmtree(outdir, ignore_errors=True)
+            raise
+        return pdf, time.perf_counter() - t0
+
+    def converted(f):
+        try:
+            pdf, secs = f.result()
+            parsed = pool.submit(_parse_file, full, timed, pdf, secs)
+        except Exception as e:
+            done.set_exception(e)
+            return
+
+        def finished(g):
+            shutil.rmtree(os.path.dirname(pdf), ignore_errors=True)
+            _relay(done)(g)
+        parsed.add_done_callback(finished)
+
+    converter.submit(convert).add_done_callback(converted)
+    return done
+
+def _parse_natively(full, pool, convert, timed):
+    """Future of _parse_file's result for a WPD, converted only if need be."""
+    done = Future()
+
+    def parsed(f):
+        try:
+            result = f.result()
+            if result[1] is None and result[2] is None:
+                convert(full).add_done_callback(_relay(done))
+                return
+        except Exception as e:
+            done.set_exception(e)
+            return
+        done.set_result(result)
+
+    pool.submit(_parse_file, full, timed, convert=False).add_done_callback(parsed)
+    return done
+
+def iter_folder(folder_path, workers=None, cache=None, window=None,
+                converters=CONVERTERS, dedupe=False, skip=(), on_file_done=None,
+                limits=None, in_process=False):
+    """
+    LineItems of every invoice under folder_path (see iter_files), less
+    duplicate copies if dedupe and relative paths in skip.
+    """
+    paths = iter_invoice_paths(folder_path)
+    if dedupe:
+        paths, skipped = dedupe_paths(
+            paths, digest=cache.digest if cache is not None else file_digest
+        )
+        print_skipped(skipped)
+    if skip:
+        paths = (p for p in paths if os.path.relpath(p, folder_path) not in skip)
+    return iter_files(paths, folder_path,
+                      workers=workers, cache=cache, window=window,
+                      converters=converters, on_file_done=on_file_done,
+                      limits=limits, in_process=in_process)
+
+def iter_files(paths, folder_path, workers=None, cache=None, window=None,
+               converters=CONVERTERS, on_file_done=None, limits=None,
+               in_process=False):
+    """
+    Parse paths in a supervised pool, yielding LineItems in path order;
+    on_file_done(source_file, error) follows each file's items.
+    """
+    workers = workers or os.cpu_count() or 1
+    limits = limits or WorkerLimits()
+    timed = timing.enabled()
+    window = window or 4 * workers  # in flight; a slow consumer stalls the walk
+    pool = None if in_process else SupervisedPool(workers, limits, WORKER_PRELOAD)
+    pending = deque()
+    # Conversion stage, set up (from a pool callback) on the first WPD the
+    # native reader can't decode
+    service = converter = tmpdir = None
+    stage_lock = threading.Lock()
+    closed = False
+
+    def convert(full):
+        nonlocal service, converter, tmpdir
+        with stage_lock:
+            if closed:
+                raise RuntimeError("run stopped before conversion")
+            if service is None:
+                # Pool workers are never forked from this process (see
+                # invoices.supervisor), so none can inherit a converter
+                # thread's half-made Popen pipes
+                service = ConversionService(instances=converters,
+                                            timeout=limits.timeout)
+                converter = ThreadPoolExecutor(max_workers=converters)
+                tmpdir = tempfile.mkdtemp(prefix="tetco-convert-")
+        return _convert_then_parse(full, service, converter, pool,
+                                   tmpdir, timed)
+
+    def finish(full, digest, job, quarantined=False):
+        hung = False
+        try:
+            text, items, error, stats = job.result() if isinstance(job, Future) else job
+        except WorkerError as e:  # hung, crashed, out of memory
+            text, items, error, stats = None, None, str(e), None
+            hung = True
+        except Exception as e:
+            text, items, error, stats = None, None, str(e) or type(e).__name__, None
+        timing.add(stats)
+        source = os.path.relpath(full, folder_path)
+        if error is not None:
+            print(f"Error processing {full}: {error}")
+            if digest is not None and hung and not quarantined:
+                cache.quarantine(digest, full, error)
+            items = []
+        else:
+            if digest is not None and text is not None:
+                cache.put(digest, text, items)
+            for item in items:
+                item.invoice.source_file = source
+        if isinstance(full, archive.Member):
+            full.data = None  # done with; don't hold it for the rest of the run
+        yield from items
+        if on_file_done is not None:
+            on_file_done(source, error)
+
+    try:
+        for full in paths:
+            # Serve unchanged files from the cache, skip those that failed
+            # before, parse the rest
+            digest = hit = reason = None
+            if cache is not None:
+                try:
+                    with timing.stage("cache"):
+                        # A member hashed here is read once, for the
+                        # parse too if it misses
+                        digest = cache.digest(full, keep=True)
+                        hit = cache.get(digest)
+                        if hit is None:
+                            reason = cache.quarantined(digest)
+                except OSError:
+                    pass  # let the reader report it
+            if pool is not None and hit is None and isinstance(full, archive.Member):
+                # Read in walk order here, and shipped to the worker with
+                # the path, rather than looked up in the archive there
+                try:
+                    full.read()
+                except OSError:
+                    pass  # let the reader report it
+            if hit is not None:
+                job = (None, hit[1], None, None)
+            elif reason is not None:
+                job = (None, None, f"quarantined: {reason}", None)
+            elif pool is not None and os.path.splitext(full)[1].lower() == '.wpd':
+                job = _parse_natively(full, pool, convert, timed)
+            elif pool is not None:
+                job = pool.submit(_parse_file, full, timed)
             else:
-                cell.alignment = openpyxl.styles.Alignment(
-                    horizontal="center", vertical="center"
-                )
+                job = _parse_file(full, timed)
+            pending.append((full, digest, job, reason is not None))
 
-            if key == "invoice_amount":
-                cell.number_format = '"$"#,##0.00'
-            elif key in ("test_date_start", "test_date_end", "invoice_date"):
-                cell.number_format = "MM/DD/YYYY"
+            while len(pending) >= window:
+                yield from finish(*pending.popleft())
+        while pending:
+            yield from finish(*pending.popleft())
+    finally:
+        with stage_lock:
+            closed = True
+        if converter is not None:
+            converter.shutdown(cancel_futures=True)
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if service is not None:
+            service.close()
+            shutil.rmtree(tmpdir, ignore_errors=True)
 
-        start_row += 1
+def process_folder(folder_path, workers=None, cache=None):
+    """Recursively parse all supported invoices in folder_path, as dicts."""
+    return to_dicts(iter_folder(folder_path, workers=workers, cache=cache))
 
-    wb.save(WORKBOOK_PATH)
-    print(f"\nAppended {len(rows)} records to:\n  {WORKBOOK_PATH}")
+def stamp_client(items, client_name, location):
+    """Yield items stamped with the client info typed in by the user."""
+    for item in items:
+        # Shared per invoice, so this is a no-op after an invoice's first item
+        item.invoice.client_name = client_name
+        item.invoice.location    = location
+        yield item
 
-def cli_mode(argv):
-    # 1) Prompt for client info
+def preview(records, n=20):
+    """Print the first n records as they pass through; yield them all."""
+    print(f"=== Previewing first {n} records ===")
+    for i, rec in enumerate(records):
+        if i < n:
+            print(", ".join(f"{k}={v}" for k, v in rec.to_dict().items()))
+        yield rec
+
+def _peek(records):
+    """Return an equivalent iterator, or None if records is empty."""
+    records = iter(records)
+    first = next(records, None)
+    return None if first is None else itertools.chain([first], records)
+
+def append_to_workbook(rows, workbook_path=None, folder=None):
+    """Upsert rows into the workbook's store, then export the workbook."""
+    workbook_path = config.workbook_path(workbook_path)
+    with InvoiceStore.for_workbook(workbook_path) as store:
+        count = store.upsert(rows, folder)
+        store.export(workbook_path)
+    print(f"\nAppended {count} records to:\n  {workbook_path}")
+
+def append_folder(folder, client_name, location, store, run_id,
+                  workbook_path=None, checkpoint=CHECKPOINT_FILES,
+                  **options):
+    """Parse folder into store as journaled run run_id, then export."""
+    workbook_path = config.workbook_path(workbook_path)
+    done = store.run_files(run_id)
+    if done:
+        print(f"Resuming: {len(done)} file(s) already written, skipping them.\n")
+    writer = RunCheckpoint(store, run_id, every=checkpoint)
+    rows = _peek(iter_folder(folder, skip=done, on_file_done=writer.file_done,
+                             **options))
+    if rows is not None:
+        rows = preview(stamp_client(rows, client_name, location))
+    try:
+        writer.write(rows or ())
+    except KeyboardInterrupt:
+        writer.commit()
+        print(f"\nInterrupted: {len(done) + writer.files} file(s) saved; "
+              f"run again with --resume to finish.")
+        raise
+    store.finish_run(run_id)
+
+    if not writer.rows and not done:
+        print("No records found.")
+        return
+    store.export(workbook_path)
+    print(f"\nAppended {writer.rows} records to:\n  {workbook_path}")
+
+def watch_mode(folder, client_name, location, args, cache=None,
+               workbook_path=None):
+    """Ingest new or changed files under folder until interrupted."""
+    workbook_path = config.workbook_path(workbook_path)
+    def handle_batch(paths):
+        failed = set()
+        def file_done(source, error):
+            if error is not None:
+                failed.add(source)
+        rows = _peek(iter_files(archive.expand(paths, READERS), folder,
+                                workers=args.workers, cache=cache,
+                                window=args.window, converters=args.converters,
+                                on_file_done=file_done, limits=_limits(args),
+                                in_process=args.in_process))
+        if rows is not None:
+            append_to_workbook(stamp_client(rows, client_name, location),
+                               workbook_path, folder)
+        return [p for p in paths if not _failed(os.path.relpath(p, folder), failed)]
+
+    with IngestState(args.state) as state:
+        if args.mark_existing:
+            state.mark(os.path.join(dirpath, fname)
+                       for dirpath, _, filenames in os.walk(folder)
+                       for fname in filenames
+                       if os.path.splitext(fname)[1].lower() in WATCHED)
+        watch(folder, WATCHED, handle_batch, state,
+              debounce=args.debounce, batch_size=args.batch_size,
+              poll_interval=args.poll_interval, polling=args.polling)
+
+def _failed(source, failed):
+    """Whether source, or a member of it if it is an archive, is in failed."""
+    return source in failed or any(f.startswith(source + archive.SEP) for f in failed)
+
+def _limits(args):
+    """The WorkerLimits cli_mode's arguments ask for."""
+    return WorkerLimits(timeout=args.file_timeout,
+                        memory=args.memory_limit * 1024 ** 2,
+                        files=args.recycle_after)
+
+def add_run_arguments(parser):
+    """Add cli_mode's options (all but the folder) to parser."""
+    parser.add_argument("--client",
+                        help="client name for a new run (default: from the "
+                             f"folder's {config.MANIFEST})")
+    parser.add_argument("--location",
+                        help="location for a new run (default: from the "
+                             f"folder's {config.MANIFEST})")
+    parser.add_argument("--workbook",
+                        help="workbook to export to (default: $TETCO_WORKBOOK or "
+                             f"the workbook setting in {config.CONFIG_PATH})")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="parser processes (default: one per core)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="parse every file, bypassing the extraction cache")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="re-parse every file and overwrite its cache entry")
+    parser.add_argument("--window", type=int, default=None,
+                        help="files in flight at once (default: 4 per worker)")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="parse every copy instead of one source per invoice")
+    parser.add_argument("--converters", type=int, default=CONVERTERS,
+                        help="WPD conversions to run at once (default: %(default)s)")
+    parser.add_argument("--file-timeout", type=float, default=FILE_TIMEOUT,
+                        help="seconds a file may take before its worker is killed "
+                             "(default: %(default)s; 0: no limit)")
+    parser.add_argument("--memory-limit", type=int, default=MEMORY_LIMIT // 1024 ** 2,
+                        help="MB of address space per worker "
+                             "(default: %(default)s; 0: no limit)")
+    parser.add_argument("--recycle-after", type=int, default=FILES_PER_WORKER,
+                        help="files a worker parses before it is replaced "
+                             "(default: %(default)s; 0: never)")
+    parser.add_argument("--in-process", action="store_true",
+                        help="parse in this process, one file at a time, with no "
+                             "timeout or memory limit (for debugging)")
+    parser.add_argument("--quarantined", action="store_true",
+                        help="list the files that hung or crashed in earlier runs, then exit")
+    parser.add_argument("--resume", action="store_true",
+                        help="finish the last interrupted run over this folder")
+    parser.add_argument("--checkpoint", type=int, default=CHECKPOINT_FILES,
+                        help="files per saved checkpoint (default: %(default)s)")
+    parser.add_argument("--timings", metavar="REPORT",
+                        help="time every stage; write REPORT.json and REPORT.csv")
+    parser.add_argument("--timings-top", type=int, default=20,
+                        help="slowest files to list in the timing report")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and ingest new or changed files as they appear")
+    parser.add_argument("--debounce", type=float, default=2.0,
+                        help="seconds a file must be quiet before it is ingested")
+    parser.add_argument("--batch-size", type=int, default=50,
+                        help="most files per workbook append in watch mode")
+    parser.add_argument("--polling", action="store_true",
+                        help="rescan the folder instead of using inotify")
+    parser.add_argument("--poll-interval", type=float, default=5.0,
+                        help="seconds between rescans when polling")
+    parser.add_argument("--state", default=STATE_PATH,
+                        help="record of files already ingested in watch mode")
+    parser.add_argument("--mark-existing", action="store_true",
+                        help="with --watch, treat files already there as ingested")
+
+def client_info(args, folder, ask):
+    """(client_name, location) from the arguments, the manifest, or ask()."""
+    if args.client:
+        return args.client, args.location
+    client_name, location = config.read_manifest(folder)
+    if client_name is None:
+        return ask()
+    return client_name, args.location or location
+
+def _prompt_client():
     client_name = input("Enter client name: ").strip()
     location    = input("Enter location: ").strip()
+    return client_name, location
 
-    # 2) Determine folder and process
-    folder = argv[1] if len(argv) > 1 else 'invoices'
-    print(f"\nProcessing invoices in folder:\n  {folder}\n")
-    rows = process_folder(folder)
-    if not rows:
-        print("No records found. Exiting.")
+def extract(folder, args, ask):
+    """Run cli_mode's parsed arguments: quarantine list, watch, or a run."""
+    if args.timings:
+        timing.enable()
+    if args.quarantined:
+        with ExtractionCache() as cache:
+            quarantine = cache.quarantine_list()
+        for path, reason, added in quarantine:
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(added))}  "
+                  f"{path}\n    {reason}")
+        print(f"{len(quarantine)} file(s) quarantined; --rebuild-cache retries them.")
         return
 
-    # 3) Stamp every record with client info
-    for rec in rows:
-        rec['client_name'] = client_name
-        rec['location']    = location
+    workbook_path = config.workbook_path(args.workbook)
+
+    if args.watch:
+        # 1) Client info, from the arguments or the folder's manifest
+        #    if they give it
+        client_name, location = client_info(args, folder, ask)
 
-    # 4) Preview first 20
-    preview = rows[:20]
-    print(f"=== Previewing {len(preview)} of {len(rows)} records ===")
-    for rec in preview:
-        print(", ".join(f"{k}={v}" for k, v in rec.items()))
+        # 2) Watch the folder; each batch goes through steps 3-5
+        print(f"\nProcessing invoices in folder:\n  {folder}\n")
+        cache = None if args.no_cache else ExtractionCache(refresh=args.rebuild_cache)
+        with cache or nullcontext():
+            watch_mode(folder, client_name, location, args, cache,
+                       workbook_path)
+        return
+
+    with InvoiceStore.for_workbook(workbook_path) as store:
+        # 1) Client info, unless resuming an interrupted run
+        run = store.unfinished_run(folder) if args.resume else None
+        if run is not None:
+            run_id, client_name, location = run
+            print(f"Resuming the interrupted run for {client_name} ({location})")
+        else:
+            if args.resume:
+                print("No interrupted run over this folder; starting a new one.")
+            client_name, location = client_info(args, folder, ask)
+            run_id = store.start_run(folder, client_name, location)
 
-    # 5) Append to workbook
-    append_to_workbook(rows)
+        # 2) Determine folder and process; records stream through steps 3-5
+        #    (stamp, preview, checkpointed append) in append_folder
+        print(f"\nProcessing invoices in folder:\n  {folder}\n")
+        cache = None if args.no_cache else ExtractionCache(refresh=args.rebuild_cache)
+        with cache or nullcontext():
+            try:
+                append_folder(folder, client_name, location, store, run_id,
+                              workbook_path, checkpoint=args.checkpoint,
+                              workers=args.workers, cache=cache,
+                              window=args.window, converters=args.converters,
+                              dedupe=not args.keep_duplicates,
+                              limits=_limits(args),
+                              in_process=args.in_process)
+            except KeyboardInterrupt:
+                sys.exit(130)
+
+    # 6) Timing report
+    if args.timings:
+        summary = timing.write_report(args.timings, top=args.timings_top)
+        timing.print_summary(summary)
+        base = os.path.splitext(args.timings)[0]
+        print(f"Timing report written to {base}.json and {base}.csv")
+
+def cli_mode(argv):
+    parser = argparse.ArgumentParser(
+        description="Extract invoice data into the Tetco workbook."
+    )
+    parser.add_argument("folder", nargs="?", default="invoices")
+    add_run_arguments(parser)
+    args = parser.parse_args(argv[1:])
+    try:
+        extract(args.folder, args, _prompt_client)
+    except config.ConfigError as e:
+        parser.error(str(e))
 
 def gui_mode():
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, simpledialog
+
     root = tk.Tk()
     root.withdraw()
 
+    try:
+        workbook_path = config.workbook_path(default=config.DEFAULT_WORKBOOK)
+    except config.ConfigError as e:
+        messagebox.showerror("Settings", str(e))
+        return
+
     # 1) Pick invoices folder
     folder = filedialog.askdirectory(title="Select Invoices Folder")
     if not folder:
         print("No folder selected. Exiting.")
         return
 
-    # 2) Ask for client info via dialog
-    client_name = simpledialog.askstring("Client Name", "Enter client name:")
-    if not client_name:
-        print("No client name entered. Exiting.")
-        return
-    location = simpledialog.askstring("Location", "Enter location:")
-    if not location:
-        print("No location entered. Exiting.")
-        return
-
-    # 3) Process folder
-    rows = process_folder(folder)
-    if not rows:
-        print("No invoices found in that folder. Exiting.")
-        return
-
-    # 4) Stamp client info
-    for rec in rows:
-        rec['client_name'] = client_name
-        rec['location']    = location
-
-    # 5) Preview
-    preview = rows[:20]
-    print(f"=== Previewing {len(preview)} of {len(rows)} records ===")
-    for rec in preview:
-        print(", ".join(f"{k}={v}" for k, v in rec.items()))
+    with InvoiceStore.for_workbook(workbook_path) as store:
+        # 2) Offer to resume an interrupted run, else ask for client info
+        run = store.unfinished_run(folder)
+        if run is not None and messagebox.askyesno(
+            "Resume",
+            f"A run over this folder for {run[1]} ({run[2]}) was interrupted.\n"
+            "Resume it?"
+        ):
+            run_id, client_name, location = run
+        else:
+            client_name = simpledialog.askstring("Client Name", "Enter client name:")
+            if not client_name:
+                print("No client name entered. Exiting.")
+                return
+            location = simpledialog.askstring("Location", "Enter location:")
+            if not location:
+                print("No location entered. Exiting.")
+                return
+            run_id = store.start_run(folder, client_name, location)
 
-    # 6) Append to workbook
-    append_to_workbook(rows)
+        # 3) Process folder; records are stamped, previewed and appended
+        #    a checkpoint at a time
+        with ExtractionCache() as cache:
+            append_folder(folder, client_name, location, store, run_id,
+                          workbook_path, cache=cache, dedupe=True)
 
 if __name__ == "__main__":
     # CLI if any args, otherwise GUI
@@ -1,21 +1,16 @@
 #!/usr/bin/env python3
+import argparse
 import os
 import re
 import sys
-import tempfile
-import subprocess
-import tkinter as tk
-from tkinter import filedialog
-
-import pandas as pd
-import fitz  # PyMuPDF
-from openpyxl import load_workbook
+from functools import lru_cache
 
 # ─── Ensure we can import your readers/ folder as a package ─────────────────
 root_dir = os.path.dirname(__file__)
 sys.path.insert(0, os.path.join(root_dir, "readers"))
-from invoices.pdf_reader import extract_invoice_data
-from invoices.wpd_reader import extract_invoice_data as extract_wpd_data
+from invoices import archive, config
+from invoices.cache import ExtractionCache
+from invoices.store import InvoiceStore
 
 # ─── All clients & their candidate locations ─────────────────────────────────
 ALL_LOCATIONS = {
@@ -24,119 +19,180 @@ ALL_LOCATIONS = {
     'Lamb Weston Inc':  ['Twin Falls, ID', 'American Falls, ID', 'Qincy, WA'],
 }
 
-def find_location_in_text(text, location_list):
-    for loc in location_list:
-        city = loc.split(',')[0]
-        if re.search(rf'\b{re.escape(city)}\b', text, re.IGNORECASE):
-            return loc
-    return None
-
-def extract_raw_text(path):
-    doc = fitz.open(path)
-    return "\n".join(page.get_text() or "" for page in doc)
-
-def extract_text_from_wpd(path):
-    with tempfile.TemporaryDirectory() as tmpdir:
-        subprocess.run([
-            "soffice", "--headless", "--convert-to", "pdf",
-            "--outdir", tmpdir, path
-        ], check=True)
-        name, _ = os.path.splitext(os.path.basename(path))
-        return extract_raw_text(os.path.join(tmpdir, name + ".pdf"))
+class LocationMatcher:
+    """
+    Every candidate city of every client compiled into one pattern, so a
+    document is scanned once however many clients and sites there are.
+    """
+
+    def __init__(self, locations=ALL_LOCATIONS):
+        self.locations = locations
+        # lower-case city -> every (client, location) with that city
+        self._sites = {}
+        for client, locs in locations.items():
+            for loc in locs:
+                city = loc.split(',')[0]
+                self._sites.setdefault(city.lower(), []).append((client, loc))
+
+        # Longest first, so "Twin Falls" wins over a bare "Falls" at the
+        # same spot; the lookahead lets matches overlap
+        cities = sorted(self._sites, key=len, reverse=True)
+        self._re = re.compile(
+            r'(?=\b(' + '|'.join(re.escape(c) for c in cities) + r')\b)',
+            re.IGNORECASE
+        )
+        # Shorter cities that also match wherever a longer one starts
+        self._nested = {
+            city: [c for c in cities
+                   if c != city and city.startswith(c)
+                   and not (city[len(c)].isalnum() or city[len(c)] == '_')]
+            for city in cities
+        }
+
+    def find_all(self, text):
+        """Return every (client, location) whose city appears in text."""
+        hits = {}
+        for m in self._re.finditer(text):
+            city = m.group(1).lower()
+            for c in (city, *self._nested[city]):
+                for site in self._sites[c]:
+                    hits[site] = None
+        return list(hits)
+
+    def match(self, text, clients=None):
+        """
+        Return {client: location} for the clients (default: all) with a
+        city in text, picking the first match in each client's list order.
+        """
+        found = {}
+        for client, loc in self.find_all(text):
+            if clients is None or client in clients:
+                found.setdefault(client, set()).add(loc)
+        return {
+            client: next(loc for loc in self.locations[client] if loc in locs)
+            for client, locs in found.items()
+        }
+
+@lru_cache(maxsize=None)
+def _single_client_matcher(location_list):
+    return LocationMatcher({None: list(location_list)})
 
-def main():
-    # 1) Pick folder with invoices
-    root = tk.Tk(); root.withdraw()
-    folder = filedialog.askdirectory(title="Select folder with invoice files")
-    if not folder:
-        print("No folder selected. Exiting."); sys.exit(1)
-
-    # 2) Hard-coded Excel path
-    wb_path = r"C:\Users\akitc\OneDrive\Desktop\Data project\Tetco_invoices.xlsx"
-
-    # 3) Load your full invoice sheet into pandas (for filtering only)
-    df = pd.read_excel(wb_path)
-
-    # 4) Choose which client to process
-    clients = list(ALL_LOCATIONS.keys())
-    print("Which client do you want to search for?")
-    for i, name in enumerate(clients, start=1):
-        print(f"  {i}. {name}")
-    choice = input("Enter number: ").strip()
-    try:
-        sel = clients[int(choice)-1]
-    except Exception:
-        print("Invalid choice. Exiting."); sys.exit(1)
-    loc_list = ALL_LOCATIONS[sel]
-    df_sub = df[df['client_name'] == sel].copy()
-
-    # 5) Build regex and results dict
+def find_location_in_text(text, location_list):
+    return _single_client_matcher(tuple(location_list)).match(text).get(None)
+
+def locate(folder, store, clients, cache=None):
+    """
+    Steps 5-6 of main: {(client, invoice number): location} for clients'
+    invoices in store, found by looking for each client's candidate
+    locations (ALL_LOCATIONS) in the name, then the parsed descriptions,
+    then the text of the invoice's file under folder.
+    """
+    # The readers load PyMuPDF, so only once there are files to read
+    from invoices.document import ExtractedDocument
+
+    # 5) Build regex, matcher, invoice index and results dict
     pattern = re.compile(r'INVOICE\D*(\d+)', re.IGNORECASE)
+    matcher = LocationMatcher({c: ALL_LOCATIONS[c] for c in clients})
+    index = store.invoice_clients(clients)
     invoice_to_loc = {}
 
-    # 6) Walk and infer
-    for root_dir, _, files in os.walk(folder):
-        for fn in files:
-            ext = os.path.splitext(fn)[1].lower()
-            if ext not in ('.pdf', '.wpd', '.wps'): continue
-
-            m = pattern.search(fn)
-            if not m: continue
-            inv = m.group(1).lstrip('0')
-            if not any(str(x).lstrip('0') == inv for x in df_sub['invoice_number']):
-                continue
-
-            path = os.path.join(root_dir, fn)
-
-            # a) filename
-            loc = find_location_in_text(fn, loc_list)
-
-            # b) parsed descriptions
-            if not loc:
-                try:
-                    recs = (extract_invoice_data(path)
-                            if ext=='.pdf'
-                            else extract_wpd_data(path))
-                    blob = " ".join(r.get('project_description','') for r in recs)
-                except Exception:
-                    blob = ""
-                loc = find_location_in_text(blob, loc_list)
-
-            # c) full-text fallback
-            if not loc:
-                text = (extract_raw_text(path)
-                        if ext=='.pdf'
-                        else extract_text_from_wpd(path))
-                loc = find_location_in_text(text, loc_list)
-
-            if loc:
-                invoice_to_loc[inv] = loc
-
+    # 6) Walk and infer, for every selected client at once (invoices in
+    #    zip/tar archives are read in place)
+    for path in archive.walk(folder, ('.pdf', '.wpd', '.wps')):
+        fn = os.path.basename(path)
+        m = pattern.search(fn)
+        if not m: continue
+        inv = m.group(1).lstrip('0')
+        if inv not in index:
+            continue
+        wanted = index[inv]
+
+        # Converted and read at most once, shared by b) and c)
+        doc = ExtractedDocument(path, cache)
+
+        # a) filename
+        found = matcher.match(fn, wanted)
+
+        # b) parsed descriptions
+        if len(found) < len(wanted):
+            try:
+                blob = " ".join(i.project_description for i in doc.items)
+            except Exception:
+                blob = ""
+            found = {**matcher.match(blob, wanted - found.keys()), **found}
+
+        # c) full-text fallback
+        if len(found) < len(wanted):
+            found = {**matcher.match(doc.text, wanted - found.keys()), **found}
+
+        for client, loc in found.items():
+            invoice_to_loc[(client, inv)] = loc
+    return invoice_to_loc
+
+def save_locations(store, invoice_to_loc, wb_path):
+    """Steps 7-8 of main: report the locations found and write them out."""
     # 7) Report
     print("\nInferred locations:")
-    for inv, l in invoice_to_loc.items():
-        print(f"  • {sel} Invoice {inv}: {l}")
+    for (client, inv), l in invoice_to_loc.items():
+        print(f"  • {client} Invoice {inv}: {l}")
     if not invoice_to_loc:
         print("  (none found)")
 
-    # 8) Update workbook in place
-    wb = load_workbook(wb_path)
-    ws = wb.active  # or wb['SheetName'] if you need a specific sheet
+    # 8) Update the store, then re-export the workbook from it
+    store.set_locations(invoice_to_loc)
+    store.export(wb_path)
+    print(f"\nUpdated workbook in place → {wb_path}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Infer job locations for invoices already in the workbook."
+    )
+    parser.add_argument("--no-cache", action="store_true",
+                        help="re-read every file, bypassing the extraction cache")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="re-read every file and overwrite its cache entry")
+    parser.add_argument("--all-clients", action="store_true",
+                        help="search for every client in ALL_LOCATIONS in one walk")
+    args = parser.parse_args()
+    cache = None if args.no_cache else ExtractionCache(refresh=args.rebuild_cache)
+
+    # 1) Pick folder with invoices
+    import tkinter as tk
+    from tkinter import filedialog
+    root = tk.Tk(); root.withdraw()
+    folder = filedialog.askdirectory(title="Select folder with invoice files")
+    if not folder:
+        print("No folder selected. Exiting."); sys.exit(1)
 
-    # Map headers to column indices
-    header_row = next(ws.iter_rows(min_row=1, max_row=1))
-    col_map = {cell.value: idx for idx, cell in enumerate(header_row, start=1)}
-    inv_col = col_map['invoice_number']
-    loc_col = col_map['location']
+    # 2) Excel path, from configuration (see invoices.config)
+    wb_path = config.workbook_path(default=config.DEFAULT_WORKBOOK)
 
-    for row in ws.iter_rows(min_row=2):
-        inv_cell = row[inv_col-1]
-        key = str(inv_cell.value).lstrip('0')
-        if key in invoice_to_loc:
-            row[loc_col-1].value = invoice_to_loc[key]
+    # 3) Open the invoice store behind the workbook (seeded from it once)
+    store = InvoiceStore.for_workbook(wb_path)
 
-    wb.save(wb_path)
-    print(f"\nUpdated workbook in place → {wb_path}")
+    # 4) Choose which client(s) to process
+    clients = list(ALL_LOCATIONS.keys())
+    if args.all_clients:
+        selected = clients
+    else:
+        print("Which client do you want to search for?")
+        print("  0. All clients")
+        for i, name in enumerate(clients, start=1):
+            print(f"  {i}. {name}")
+        choice = input("Enter number: ").strip()
+        try:
+            selected = clients if choice == "0" else [clients[int(choice)-1]]
+        except Exception:
+            print("Invalid choice. Exiting."); sys.exit(1)
+
+    # 5-6) Walk the folder and infer locations
+    invoice_to_loc = locate(folder, store, selected, cache)
+    if cache:
+        cache.close()
+
+    # 7-8) Report, update the store and re-export the workbook
+    with store:
+        save_locations(store, invoice_to_loc, wb_path)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,203 @@
+# invoices/archive.py
+
+import io
+import lzma
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Separates an archive's path from a member's path inside it
+SEP = "!"
+
+# Archive suffixes as os.path.splitext sees them (".tar.gz" ends ".gz")
+EXTENSIONS = {".zip", ".tar", ".tgz", ".tbz2", ".txz", ".gz", ".bz2", ".xz"}
+_COMPRESSED_TAR = (".tar.gz", ".tar.bz2", ".tar.xz")
+
+def is_archive(path):
+    """True if path names a zip or (maybe compressed) tar archive."""
+    lower = path.lower()
+    ext = os.path.splitext(lower)[1]
+    if ext in (".gz", ".bz2", ".xz"):
+        return lower.endswith(_COMPRESSED_TAR)
+    return ext in EXTENSIONS
+
+class Member(str):
+    """
+    Path of a file inside an archive, "archive!member/path", usable
+    wherever a file path is: os.path functions see the member's name and
+    extension, and archive.stat / read stand in for os.stat and open.
+
+    The contents are read through the archive when first needed and kept
+    in `data`, which travels with the path when it is pickled to a worker
+    process. Whoever walks the archive drops data once the member is
+    done, so only the members in flight are ever held in memory. open()
+    streams them instead, keeping nothing.
+    """
+
+    def __new__(cls, archive, name, size, mtime, data=None):
+        self = super().__new__(cls, archive + SEP + name)
+        self.archive = archive
+        self.name = name
+        self.st_size = size
+        self.st_mtime_ns = mtime
+        self.data = data
+        return self
+
+    def __reduce__(self):
+        return Member, (self.archive, self.name, self.st_size,
+                        self.st_mtime_ns, self.data)
+
+    def read(self):
+        """The member's contents; OSError if they can't be read."""
+        if self.data is None:
+            try:
+                self.data = _open(self.archive).read(self.name)
+            except _ERRORS as e:
+                raise OSError(f"can't read {self.name} from {self.archive}: {e}") from e
+        return self.data
+
+    @contextmanager
+    def open(self):
+        """
+        The member's contents as a binary stream, from data if it is held,
+        else through the archive (which is locked meanwhile, so read it
+        and close it); OSError if they can't be read.
+        """
+        if self.data is not None:
+            yield io.BytesIO(self.data)
+            return
+        try:
+            with _open(self.archive).open(self.name) as f:
+                yield f
+        except _ERRORS as e:
+            raise OSError(f"can't read {self.name} from {self.archive}: {e}") from e
+
+# What reading a damaged archive raises
+_ERRORS = (EOFError, KeyError, lzma.LZMAError, tarfile.TarError,
+           zipfile.BadZipFile, zlib.error)
+
+class _Zip:
+    def __init__(self, path):
+        self._zf = zipfile.ZipFile(path)
+        self._lock = threading.Lock()
+
+    def members(self):
+        for info in self._zf.infolist():
+            if not info.is_dir():
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+                yield info.filename, info.file_size, int(mtime * 1e9)
+
+    def read(self, name):
+        with self._lock:
+            return self._zf.read(name)
+
+    @contextmanager
+    def open(self, name):
+        with self._lock, self._zf.open(name) as f:
+            yield f
+
+class _Tar:
+    """
+    Tar archives are read in order: members are found by their offset,
+    so reading them in the order they were listed never seeks backwards,
+    which for a compressed tar would mean decompressing from the start.
+    """
+
+    def __init__(self, path):
+        self._tf = tarfile.open(path, "r:*")
+        self._infos = {}
+        self._lock = threading.Lock()
+
+    def members(self):
+        for info in self._tf:
+            if info.isfile():
+                self._infos[info.name] = info
+                yield info.name, info.size, int(info.mtime * 1e9)
+
+    def read(self, name):
+        with self._lock:
+            info = self._infos.get(name) or self._tf.getmember(name)
+            with self._tf.extractfile(info) as f:
+                return f.read()
+
+    @contextmanager
+    def open(self, name):
+        with self._lock:
+            info = self._infos.get(name) or self._tf.getmember(name)
+            with self._tf.extractfile(info) as f:
+                yield f
+
+def _open(path):
+    # Kept open between calls, and reopened once the archive changes
+    st = os.stat(path)
+    return _opened(path, st.st_size, st.st_mtime_ns)
+
+@lru_cache(maxsize=4)
+def _opened(path, size, mtime):
+    return _Zip(path) if path.lower().endswith(".zip") else _Tar(path)
+
+def iter_members(path, extensions):
+    """Yield a Member for every file in archive path with one of extensions."""
+    archive = _open(path)
+    for name, size, mtime in archive.members():
+        if os.path.splitext(name)[1].lower() in extensions:
+            yield Member(path, name, size, mtime)
+
+def expand(paths, extensions):
+    """
+    Yield the paths with one of extensions, each archive among paths
+    replaced by its members with one of them. Unreadable archives are
+    reported and skipped.
+    """
+    for path in paths:
+        if is_archive(path):
+            try:
+                yield from iter_members(path, extensions)
+            except Exception as e:
+                print(f"Error reading archive {path}: {e}")
+        elif os.path.splitext(path)[1].lower() in extensions:
+            yield path
+
+def walk(folder, extensions):
+    """
+    Yield every file under folder with one of extensions, in os.walk
+    order, looking inside zip and tar archives as if they were folders.
+    """
+    return expand((os.path.join(dirpath, fname)
+                   for dirpath, _, filenames in os.walk(folder)
+                   for fname in filenames), extensions)
+
+def stat(path):
+    """os.stat(path), or for a Member its size and mtime from the archive."""
+    return path if isinstance(path, Member) else os.stat(path)
+
+def spill(path, folder):
+    """
+    A real file with path's contents: path itself, or a Member written
+    into folder under its own base name (e.g. for LibreOffice).
+    """
+    if not isinstance(path, Member):
+        return path
+    out = os.path.join(folder, os.path.basename(path.name))
+    with open(out, "wb") as f:
+        f.write(path.read())
+    return out
+
+@contextmanager
+def spilled(path):
+    """spill() into a temporary folder that is removed afterwards."""
+    if not isinstance(path, Member):
+        yield path
+        return
+    folder = tempfile.mkdtemp(prefix="tetco-member-")
+    try:
+        yield spill(path, folder)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
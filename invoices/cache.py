@@ -0,0 +1,221 @@
+# invoices/cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from functools import lru_cache
+
+from . import archive
+from .records import pack, unpack
+
+# Default location: .invoice_cache/ next to the invoices package
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         ".invoice_cache")
+
+# Evict least-recently-used entries once the stored text/records pass this
+MAX_BYTES = 512 * 1024 * 1024
+
+# Seconds to wait for another process's write to the cache to finish
+BUSY_TIMEOUT = 30
+
+# Modules whose source decides what the parsed records look like
+_PARSER_MODULES = ("pdf_reader.py", "wordperfect.py", "dates.py", "records.py",
+                   "utils.py")
+
+@lru_cache(maxsize=None)
+def parser_version():
+    """Hash of the parser source, so any edit to pdf_reader invalidates entries."""
+    h = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in _PARSER_MODULES:
+        with open(os.path.join(here, name), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+def file_digest(path, keep=False):
+    """
+    SHA-256 of the file's (or archive Member's) contents, read in chunks.
+    A Member's contents are read into its data first if keep (for a
+    caller about to parse it), else streamed and not kept.
+    """
+    member = isinstance(path, archive.Member)
+    if member and keep:
+        path.read()
+    h = hashlib.sha256()
+    with path.open() if member else open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class ExtractionCache:
+    """
+    SQLite cache of (raw text, parsed LineItems) keyed by file content
+    hash and parser_version(). Items are stored packed (see
+    invoices.records.pack), invoice-level fields once per invoice.
+
+    refresh=True ignores existing entries and overwrites them as files are
+    re-extracted, which rebuilds the cache in place. Digests are memoized
+    per (path, size, mtime) so unchanged files are not even re-read.
+
+    Each entry is committed as it is stored (in WAL mode, so that costs
+    no fsync), so a killed run keeps what it had extracted, and runs in
+    other processes can share the cache, waiting up to BUSY_TIMEOUT for
+    each other's writes.
+
+    Files that hung or crashed whoever read them are quarantined with the
+    reason, by content hash and parser_version() like entries, so later
+    runs skip them instead of hanging on the same file again; refresh
+    retries them too.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES, refresh=False):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.version = parser_version()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "extract.sqlite"),
+                                   timeout=BUSY_TIMEOUT)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                digest    TEXT NOT NULL,
+                version   TEXT NOT NULL,
+                text      TEXT NOT NULL,
+                records   TEXT NOT NULL,
+                size      INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (digest, version)
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used);
+            CREATE TABLE IF NOT EXISTS files (
+                path     TEXT PRIMARY KEY,
+                size     INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest   TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS quarantine (
+                digest  TEXT NOT NULL,
+                version TEXT NOT NULL,
+                path    TEXT NOT NULL,
+                reason  TEXT NOT NULL,
+                added   REAL NOT NULL,
+                PRIMARY KEY (digest, version)
+            );
+        """)
+        # Entries from older parsers can never hit again, and a new parser
+        # deserves another go at the files the old one failed on
+        self._db.execute("DELETE FROM entries WHERE version != ?", (self.version,))
+        self._db.execute("DELETE FROM quarantine WHERE version != ?", (self.version,))
+        if self._db.execute("PRAGMA user_version").fetchone()[0] < 1:
+            # Quarantined before only hangs and crashes were: failures
+            # such as a missing soffice deserve another go
+            self._db.execute("DELETE FROM quarantine")
+            self._db.execute("PRAGMA user_version = 1")
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def digest(self, path, keep=False):
+        """
+        Content hash of path, reusing the last one if size/mtime match;
+        keep as for file_digest.
+        """
+        st = archive.stat(path)
+        key = os.path.abspath(path)
+        row = self._db.execute(
+            "SELECT size, mtime_ns, digest FROM files WHERE path = ?", (key,)
+        ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        digest = file_digest(path, keep)
+        self._db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+            (key, st.st_size, st.st_mtime_ns, digest)
+        )
+        return digest
+
+    def get(self, digest):
+        """Return (text, items) for digest, or None on a miss."""
+        if self.refresh:
+            return None
+        row = self._db.execute(
+            "SELECT text, records FROM entries WHERE digest = ? AND version = ?",
+            (digest, self.version)
+        ).fetchone()
+        if row is None:
+            return None
+        self._db.execute(
+            "UPDATE entries SET last_used = ? WHERE digest = ? AND version = ?",
+            (time.time(), digest, self.version)
+        )
+        self._db.commit()
+        return row[0], unpack(json.loads(row[1]))
+
+    def put(self, digest, text, items):
+        blob = json.dumps(pack(items))
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+            (digest, self.version, text, blob, len(text) + len(blob), time.time())
+        )
+        self._db.execute(
+            "DELETE FROM quarantine WHERE digest = ? AND version = ?",
+            (digest, self.version)
+        )
+        self._db.commit()
+
+    def quarantined(self, digest):
+        """Why digest's file failed before, or None if it hasn't."""
+        if self.refresh:
+            return None
+        row = self._db.execute(
+            "SELECT reason FROM quarantine WHERE digest = ? AND version = ?",
+            (digest, self.version)
+        ).fetchone()
+        return row[0] if row else None
+
+    def quarantine(self, digest, path, reason):
+        """Record that path (with contents digest) failed, and why."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO quarantine VALUES (?, ?, ?, ?, ?)",
+            (digest, self.version, os.path.abspath(path), reason, time.time())
+        )
+        self._db.commit()
+
+    def quarantine_list(self):
+        """(path, reason, time added) of every quarantined file, oldest first."""
+        return self._db.execute(
+            "SELECT path, reason, added FROM quarantine WHERE version = ? "
+            "ORDER BY added", (self.version,)
+        ).fetchall()
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits max_bytes."""
+        total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT digest, version, size FROM entries ORDER BY last_used"
+        )
+        doomed = []
+        for digest, version, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((digest, version))
+            total -= size
+        self._db.executemany(
+            "DELETE FROM entries WHERE digest = ? AND version = ?", doomed
+        )
+
+    def close(self):
+        self.evict()
+        self._db.commit()
+        self._db.close()
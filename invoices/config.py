@@ -0,0 +1,68 @@
+# invoices/config.py
+
+import configparser
+import os
+
+# The workbook the desktop (tkinter) tools fall back on when nothing
+# names another; the command line insists on being told
+DEFAULT_WORKBOOK = r"C:\Users\akitc\OneDrive\Desktop\Data project\Tetco_invoices.xlsx"
+
+# Settings file, read if it exists; TETCO_CONFIG names another. Holds
+#   [tetco]
+#   workbook = path/to/Tetco_invoices.xlsx
+CONFIG_PATH = os.path.join(os.path.expanduser("~"), ".tetco.ini")
+
+# File in an invoices folder naming the client (and location) they are
+# for, so batch runs over it need no prompts:
+#   [client]
+#   name = JR Simplot
+#   location = Pocatello, ID
+MANIFEST = "client.ini"
+
+class ConfigError(ValueError):
+    """A settings file or manifest that can't be used; says which and why."""
+
+def _read(path):
+    parser = configparser.ConfigParser(interpolation=None)
+    try:
+        parser.read(path, encoding="utf-8")
+    except configparser.Error as e:
+        raise ConfigError(f"{path}: {e}") from e
+    return parser
+
+def workbook_path(path=None, default=None):
+    """
+    The workbook to use: path if given, else $TETCO_WORKBOOK, else the
+    config file's workbook setting (relative to the file), else default;
+    ConfigError if none of them names one.
+    """
+    path = path or os.environ.get("TETCO_WORKBOOK")
+    if path:
+        return os.path.expanduser(path)
+    config_path = os.environ.get("TETCO_CONFIG", CONFIG_PATH)
+    if os.path.exists(config_path):
+        path = _read(config_path).get("tetco", "workbook", fallback=None)
+        if path:
+            return os.path.join(os.path.dirname(os.path.abspath(config_path)),
+                                os.path.expanduser(path))
+    if default is None:
+        raise ConfigError(
+            f"no workbook: pass --workbook, set TETCO_WORKBOOK, or put "
+            f"[tetco] workbook = ... in {config_path}"
+        )
+    return default
+
+def read_manifest(folder):
+    """
+    (client name, location) from folder's MANIFEST, location None if it
+    gives none; (None, None) if folder has no manifest.
+    """
+    path = os.path.join(folder, MANIFEST)
+    if not os.path.exists(path):
+        return None, None
+    client = _read(path)
+    name = client.get("client", "name", fallback="").strip()
+    if not name:
+        raise ConfigError(f"{path}: no client name ([client] name = ...)")
+    location = client.get("client", "location", fallback="").strip()
+    return name, location or None
@@ -0,0 +1,139 @@
+# invoices/dates.py
+
+import datetime
+import re
+from functools import lru_cache
+
+from dateutil import parser as dateparser
+
+# Month names and the abbreviations dateutil accepts, lower-cased
+MONTHS = {}
+for _num, _name in enumerate([
+    "january", "february", "march", "april", "may", "june", "july",
+    "august", "september", "october", "november", "december",
+], start=1):
+    MONTHS[_name] = MONTHS[_name[:3]] = _num
+MONTHS["sept"] = 9
+
+# "Month D, YYYY" as a whole string (header, "Test date:", final fallback)
+_MDY_RE = re.compile(r"([A-Za-z]+)\.?\s*(\d{1,2}),\s*(\d{4})")
+
+# Range styles found in item descriptions
+_CROSS_MONTH_RE = re.compile(
+    r"([A-Za-z]+)\s+(\d{1,2})-(?:\s*)([A-Za-z]+)\s+(\d{1,2}),\s*(\d{4})"
+)
+_SAME_MONTH_RE = re.compile(r"([A-Za-z]+)\s+(\d{1,2})-(\d{1,2}),\s*(\d{4})")
+_PROJECT_DATES_RE = re.compile(r"Project\s+Dates?:\s*(.*?),\s*(\d{4})", re.IGNORECASE)
+_TO_RANGE_RE = re.compile(
+    r"([A-Za-z]+)\s+(\d{1,2})\s+to\s+(?:([A-Za-z]+)\s+)?(\d{1,2})", re.IGNORECASE
+)
+_TEST_DATE_RE = re.compile(
+    r"Test\s*date[s]?:\s*([A-Za-z]+\s+\d{1,2},\s*\d{4})", re.IGNORECASE
+)
+_ANY_DATE_RE = re.compile(r"([A-Za-z]+\s+\d{1,2},\s*\d{4})")
+
+def _dateutil(s):
+    try:
+        return dateparser.parse(s).date()
+    except Exception:
+        return None
+
+@lru_cache(maxsize=4096)
+def _fast(month, day, year):
+    """
+    date for a plain (month name, day, year) triple, or None when it isn't
+    that simple shape and dateutil has to decide.
+    """
+    num = MONTHS.get(month.lower())
+    day = day.strip()
+    if num is None or not (day.isascii() and day.isdigit()):
+        return None
+    try:
+        return datetime.date(int(year), num, int(day))
+    except ValueError:
+        return None
+
+def month_day_year(month, day, year):
+    """date for "{month} {day}, {year}", or None if it doesn't parse."""
+    return _fast(month, day, year) or _dateutil(f"{month} {day}, {year}")
+
+def parse_date(s):
+    """date for a "Month D, YYYY" string, or None if it doesn't parse."""
+    if m := _MDY_RE.fullmatch(s):
+        if d := _fast(*m.groups()):
+            return d
+    return _dateutil(s)
+
+class DateRangeParser:
+    """
+    Pulls (start, end) date pairs out of item descriptions, trying the same
+    styles in the same order as pdf_reader always has, with dateutil left
+    only for strings that aren't a plain "Month D, YYYY".
+
+    Use one instance per invoice: a "Project Dates:" list part without a
+    month inherits the last one seen, including from earlier items.
+    """
+
+    def __init__(self):
+        self.prev_month = None
+
+    def parse(self, description):
+        date_ranges = []
+
+        # (i) Cross-month hyphen
+        for mo1, d1, mo2, d2, yr in _CROSS_MONTH_RE.findall(description):
+            s = month_day_year(mo1, d1, yr)
+            e = month_day_year(mo2, d2, yr)
+            if s and e:
+                date_ranges.append((s, e))
+
+        # (ii) Same-month ranges
+        for mo, d1, d2, yr in _SAME_MONTH_RE.findall(description):
+            s = month_day_year(mo, d1, yr)
+            e = month_day_year(mo, d2, yr)
+            if s and e:
+                date_ranges.append((s, e))
+
+        # (iii) Fallback "to" / comma-list
+        if len(date_ranges) <= 1:
+            if m := _PROJECT_DATES_RE.search(description):
+                raw, yr = m.groups()
+                if m_to := _TO_RANGE_RE.match(raw):
+                    mo1, d1, mo2, d2 = m_to.groups()
+                    mo2 = mo2 or mo1
+                    s = month_day_year(mo1, d1, yr)
+                    e = month_day_year(mo2, d2, yr)
+                    date_ranges = [(s, e)] if s and e else []
+                else:
+                    for part in raw.split(","):
+                        part = part.strip()
+                        if " " in part:
+                            self.prev_month, days = part.split(" ", 1)
+                        elif self.prev_month is None:
+                            # As before, a list opening without a month
+                            # fails the whole invoice
+                            raise ValueError(f"no month for project dates {raw!r}")
+                        else:
+                            days = part
+                        if "-" in days:
+                            d1, d2 = days.split("-", 1)
+                        else:
+                            d1 = d2 = days
+                        s = month_day_year(self.prev_month, d1, yr)
+                        e = month_day_year(self.prev_month, d2, yr)
+                        if s and e:
+                            date_ranges.append((s, e))
+
+        # (iv) "Test date:" fallback
+        if not date_ranges:
+            if m := _TEST_DATE_RE.search(description):
+                if dt := parse_date(m.group(1)):
+                    date_ranges.append((dt, dt))
+
+        # FINAL fallback: any standalone "Month D, YYYY"
+        if not date_ranges:
+            if m := _ANY_DATE_RE.search(description):
+                if dt := parse_date(m.group(1)):
+                    date_ranges.append((dt, dt))
+
+        return date_ranges
@@ -0,0 +1,97 @@
+# invoices/dedupe.py
+
+import os
+import re
+from collections import defaultdict
+
+from . import archive
+from .cache import file_digest
+
+# Invoice number in a file name, as the location backfill reads it
+INVOICE_NO_RE = re.compile(r'INVOICE\D*(\d+)', re.IGNORECASE)
+
+# Lower wins: a PDF beats its WordPerfect or Works original
+PREFERENCE = {'.pdf': 0, '.wpd': 1, '.wps': 2}
+
+def _ext(path):
+    return os.path.splitext(path)[1].lower()
+
+def filename_invoice_number(path):
+    """Invoice number from the file name, leading zeros stripped, or None."""
+    m = INVOICE_NO_RE.search(os.path.basename(path))
+    return m.group(1).lstrip('0') if m else None
+
+def dedupe(paths, digest=file_digest):
+    """
+    Pick one source per invoice from paths before anything is converted
+    or parsed. Returns (keep, skipped): keep in the original order,
+    skipped as (path, kept path, reason) tuples.
+
+    Two files are the same invoice if
+      1) their contents are identical (only files of equal size are
+         hashed, with `digest`, so this stays cheap), or
+      2) one is a PDF and the other a WPD/WPS with the same invoice number
+         in its file name, in the same folder, i.e. an original and its
+         PDF export.
+    The native PDF is kept, otherwise the first file in walk order. Files
+    that merely share a number (of the same format, or in different
+    folders) are all kept, as they may be different clients' invoices.
+    """
+    paths = list(paths)
+    order = {p: i for i, p in enumerate(paths)}
+    skipped = []
+    dropped = set()
+
+    # 1) Identical contents
+    by_size = defaultdict(list)
+    for p in paths:
+        try:
+            by_size[archive.stat(p).st_size].append(p)
+        except OSError:
+            pass  # let the reader report it
+    for group in by_size.values():
+        if len(group) < 2:
+            continue
+        by_digest = defaultdict(list)
+        for p in group:
+            try:
+                by_digest[digest(p)].append(p)
+            except OSError:
+                pass
+        for same in by_digest.values():
+            best = min(same, key=lambda p: (PREFERENCE.get(_ext(p), 9), order[p]))
+            for p in same:
+                if p != best:
+                    dropped.add(p)
+                    skipped.append((p, best, "identical contents"))
+
+    # 2) Original plus PDF export of the same invoice number
+    by_number = defaultdict(list)
+    for p in paths:
+        if p not in dropped and (number := filename_invoice_number(p)):
+            by_number[number].append(p)
+    for number, group in by_number.items():
+        pdfs = [p for p in group if _ext(p) == '.pdf']
+        if not pdfs:
+            continue
+        for p in group:
+            if _ext(p) == '.pdf':
+                continue
+            # Only the export sitting next to the original counts
+            folder = os.path.dirname(p)
+            best = next((q for q in pdfs if os.path.dirname(q) == folder), None)
+            if best is None:
+                continue
+            dropped.add(p)
+            skipped.append((p, best, f"invoice {number} also as PDF"))
+
+    keep = [p for p in paths if p not in dropped]
+    return keep, skipped
+
+def print_skipped(skipped):
+    """Report what dedupe() skipped."""
+    if not skipped:
+        return
+    print(f"Skipped {len(skipped)} duplicate file(s) before parsing:")
+    for path, kept, reason in skipped:
+        print(f"  {path}\n    {reason}; using {kept}")
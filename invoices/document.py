@@ -0,0 +1,83 @@
+# invoices/document.py
+
+import os
+
+from invoices import pdf_reader, timing, wordperfect, wpd_reader
+from invoices.records import to_dicts
+
+# Map file extensions to text extractors; the text is always parsed by
+# pdf_reader (.wps files are tried as WordPerfect, then converted)
+TEXT_READERS = {
+    '.pdf': pdf_reader.extract_text,
+    '.wpd': wpd_reader.extract_text,
+    '.wps': wpd_reader.extract_text,
+}
+
+# The same without the LibreOffice fallback, for convert=False
+NATIVE_READERS = {
+    '.pdf': pdf_reader.extract_text,
+    '.wpd': wordperfect.extract_text,
+    '.wps': wordperfect.extract_text,
+}
+
+class ExtractedDocument:
+    """
+    One invoice file, converted and read at most once.
+
+    `text` does the conversion and page.get_text() on first use; `items`
+    parses that same text into LineItems (`records` gives them as dicts).
+    Consumers that need both (the record parser and
+    the location fallback) share the one pass. With an ExtractionCache,
+    files seen before are served from it without being opened. A failed
+    extraction is remembered and re-raised rather than retried.
+
+    convert=False never starts LibreOffice: a WordPerfect file the native
+    reader can't decode raises WordPerfectError instead, for callers that
+    run conversions themselves.
+    """
+
+    def __init__(self, path, cache=None, convert=True):
+        self.path = path
+        self.ext = os.path.splitext(path)[1].lower()
+        self._cache = cache
+        self._readers = TEXT_READERS if convert else NATIVE_READERS
+        self._digest = None
+        self._text = None
+        self._items = None
+        self._error = None
+
+    def _from_cache(self):
+        if self._cache is None or self._digest is not None:
+            return
+        self._digest = self._cache.digest(self.path)
+        hit = self._cache.get(self._digest)
+        if hit is not None:
+            self._text, self._items = hit
+
+    @property
+    def text(self):
+        self._from_cache()
+        if self._text is None:
+            if self._error is not None:
+                raise self._error
+            try:
+                self._text = self._readers[self.ext](self.path)
+            except Exception as e:
+                self._error = e
+                raise
+        return self._text
+
+    @property
+    def items(self):
+        self._from_cache()
+        if self._items is None:
+            text = self.text
+            with timing.stage("parse"):
+                self._items = pdf_reader.parse_invoice_items(text)
+            if self._cache is not None:
+                self._cache.put(self._digest, self._text, self._items)
+        return self._items
+
+    @property
+    def records(self):
+        return to_dicts(self.items)
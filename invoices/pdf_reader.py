@@ -1,174 +1,211 @@
 import fitz               # PyMuPDF
 import re
-from dateutil import parser as dateparser
+from . import timing
+from .archive import Member
+from .dates import DateRangeParser, parse_date
+from .records import Invoice, LineItem, to_dicts
 from .utils import parse_amount
 
-def _fmt_date(dt):
-    return dt.strftime("%m/%d/%Y")
-
-def extract_invoice_data(path):
+# The header is "Invoice No ... Date Mon D, YYYY"; _HEADER_RE is the
+# whole pattern, only run when the two-step search in _find_header
+# (number, then the first date after it) comes up empty
+_INVOICE_NO_RE = re.compile(r"Invoice\s*(?:Number|No\.?)[:\s]*([\w-]+)",
+                            re.IGNORECASE)
+_DATE_RE = re.compile(r"Date[:\s]*([A-Za-z]{3,}\.?\s*\d{1,2},\s*\d{4})",
+                      re.IGNORECASE)
+_HEADER_RE = re.compile(_INVOICE_NO_RE.pattern + ".*?" + _DATE_RE.pattern,
+                        re.DOTALL|re.IGNORECASE)
+_DATE_WORD_RE = re.compile("date", re.IGNORECASE)
+_AMT_RE1 = re.compile(r"^\$\s?([\d,]+(?:\.\d+)?)$")
+_AMT_RE2 = re.compile(r"^[\d,]+(?:\.\d+)?$")
+_MOBILIZATION_RE = re.compile(r"\bmobilization\b", re.IGNORECASE)
+# Line breaks str.splitlines() honours besides \n; rare in PDF text
+_BREAKS_RE = re.compile("[\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
+
+def extract_text(path):
+    """
+    Return the text of every page of the PDF at path. An archive Member
+    is opened from memory.
+    """
+    with timing.stage("open"):
+        if isinstance(path, Member):
+            doc = fitz.open(stream=path.read(), filetype="pdf")
+        else:
+            doc = fitz.open(path)
+    with doc:
+        timing.note(pages=doc.page_count)
+        with timing.stage("get_text"):
+            return "\n".join(page.get_text() or "" for page in doc)
+
+def extract_invoice_data(path=None, text=None):
+    """
+    Parse an invoice into line-item records. Pass `text` when the document
+    has already been read (e.g. by an ExtractedDocument) to skip opening it.
+    """
     # 1) Load text
-    doc = fitz.open(path)
-    text = "\n".join(page.get_text() or "" for page in doc)
-
+    if text is None:
+        text = extract_text(path)
+    return parse_invoice_text(text)
+
+def parse_invoice_text(text):
+    """Parse the line items out of an invoice's extracted text, as dicts."""
+    return to_dicts(parse_invoice_items(text))
+
+def _find_header(text):
+    """
+    (invoice number, date text) of the first header in text, or None:
+    what _HEADER_RE.search(text) finds, without its DOTALL .*? rescanning
+    the rest of the document from every candidate.
+
+    For each "Invoice No" the regex first tries the longest number, then
+    the nearest date after it, so searching for the date from the end of
+    that match gives the same answer. When no date follows, the regex can
+    only still match by backtracking to a shorter number with "Date"
+    right inside the longer one (e.g. "No: 123Date: May 1, 2001"); just
+    then is the whole pattern run.
+    """
+    no_date_from = len(text) + 1    # no date starts at or after this
+    pos = 0
+    while m := _INVOICE_NO_RE.search(text, pos):
+        if m.end() < no_date_from:
+            if d := _DATE_RE.search(text, m.end()):
+                return m.group(1), d.group(1)
+            no_date_from = m.end()
+        if _DATE_WORD_RE.search(text, m.start(), m.end() + 3):
+            if full := _HEADER_RE.match(text, m.start()):
+                return full.group(1), full.group(2)
+        pos = m.start() + 1
+    return None
+
+def _scan_items(text):
+    """
+    One walk over the lines of text, yielding (item number, description,
+    amount) per line item, with the items, descriptions and amounts the
+    old split-filter-rescan parser found:
+
+      - a line holding only digits starts an item, unless it is the last
+        line; so does the text's first non-blank line if it is digits
+      - the item's amount is on its first later line reading "$1,234.56",
+        "$" then "1,234.56" on the next line, or a bare "1,234.56"; lines
+        before that are the description, lines after it are ignored
+      - lines are stripped and blank ones skipped; "\n" ends a line, and
+        so does anything else str.splitlines() splits on
+    """
+    physical = text.split("\n")
+    last = len(physical) - 1
+    odd_breaks = _BREAKS_RE.search(text) is not None
+    amt_re1, amt_re2 = _AMT_RE1, _AMT_RE2
+
+    number = None       # item number of the open item, if any
+    started = False     # past the text's first non-blank line
+    desc = []
+    amount = None
+    found = False       # amount found; the rest of the item is ignored
+    dollar = False      # last line was a lone "$"
+
+    for u, raw in enumerate(physical):
+        line = raw.strip()
+        if not line:
+            continue
+
+        # 1) Item number on a line of its own: close the open item
+        if line.isdecimal() and u < last:
+            if number is not None:
+                if dollar:
+                    desc.append("$")
+                yield int(number), " ".join(desc), amount
+            number, started = line, True
+            desc, amount, found, dollar = [], None, False, False
+            continue
+
+        if odd_breaks and _BREAKS_RE.search(line):
+            lines = [ln.strip() for ln in raw.splitlines() if ln.strip()]
+        else:
+            lines = (line,)
+        for line in lines:
+            # 2) Text before the first item
+            if number is None:
+                if not started:
+                    started = True
+                    if line.isdecimal():
+                        number = line
+                continue
+            if found:
+                continue
+
+            # 3) Amount, or another description line
+            if dollar:
+                dollar = False
+                if amt_re2.match(line):
+                    amount, found = parse_amount(line), True
+                    continue
+                desc.append("$")
+            first = line[0]
+            if first == "$":
+                if m := amt_re1.match(line):
+                    amount, found = parse_amount(m.group(1)), True
+                elif line == "$":
+                    dollar = True
+                else:
+                    desc.append(line)
+            elif (first == "," or first.isdecimal()) and amt_re2.match(line):
+                amount, found = parse_amount(line), True
+            else:
+                desc.append(line)
+
+    if number is not None:
+        if dollar:
+            desc.append("$")
+        yield int(number), " ".join(desc), amount
+
+def parse_invoice_items(text):
+    """
+    Parse the line items out of an invoice's extracted text, as LineItems
+    sharing one Invoice (see invoices.records).
+    """
     # 2) Header
-    header = re.search(
-        r"Invoice\s*(?:Number|No\.?)[:\s]*([\w-]+).*?"
-        r"Date[:\s]*([A-Za-z]{3,}\.?\s*\d{1,2},\s*\d{4})",
-        text, re.DOTALL|re.IGNORECASE
-    )
-    if header:
-        invoice_number = header.group(1)
-        try:
-            inv_dt = dateparser.parse(header.group(2)).date()
-            invoice_date = _fmt_date(inv_dt)
-        except:
-            invoice_date = None
-    else:
-        invoice_number = invoice_date = None
-
-    # 3) Split on item numbers
-    blocks = re.split(r"\r?\n(?=\s*\d+\s*\r?\n)", text)
-
-    # 4) Filter to real item blocks
-    item_blocks = []
-    for b in blocks:
-        lines = [ln.strip() for ln in b.splitlines() if ln.strip()]
-        if lines and re.fullmatch(r"\d+", lines[0]):
-            item_blocks.append(lines)
-
-    records = []
-    amt_re1 = re.compile(r"^\$\s?([\d,]+(?:\.\d+)?)$")
-    amt_re2 = re.compile(r"^[\d,]+(?:\.\d+)?$")
-
-    for lines in item_blocks:
-        item_idx = int(lines[0])
-
-        # 5a) Amount
-        invoice_amount = None
-        amt_idx = len(lines)
-        for idx, ln in enumerate(lines):
-            ln_str = ln.strip()
-            if m1 := amt_re1.match(ln_str):
-                invoice_amount = parse_amount(m1.group(1)); amt_idx = idx; break
-            if ln_str == "$" and idx+1 < len(lines):
-                if m2 := amt_re2.match(lines[idx+1].strip()):
-                    invoice_amount = parse_amount(m2.group(0)); amt_idx = idx; break
-            if idx and (m3 := amt_re2.match(ln_str)):
-                invoice_amount = parse_amount(m3.group(0)); amt_idx = idx; break
-
-        # 5b) Description
-        description = " ".join(lines[1:amt_idx]).strip()
+    with timing.stage("header"):
+        header = _find_header(text)
+        if header:
+            invoice_number = header[0]
+            inv_dt = parse_date(header[1])
+            invoice_date = inv_dt.toordinal() if inv_dt else None
+        else:
+            invoice_number = invoice_date = None
+        invoice = Invoice(invoice_number, invoice_date)
+
+    # 3) Item numbers, descriptions and amounts, in one pass
+    with timing.stage("split"):
+        scanned = list(_scan_items(text))
+
+    items = []
+    # One per invoice: date lists carry their month across items
+    dates = DateRangeParser()
+
+    for item_idx, description, invoice_amount in scanned:
+        # 4a) Description
         description = f"{description}\nItem {item_idx}"
 
-        # 5c) Date ranges
-        date_ranges = []
-
-        # (i) Cross‐month hyphen
-        for mo1,d1,mo2,d2,yr in re.findall(
-            r"([A-Za-z]+)\s+(\d{1,2})-(?:\s*)([A-Za-z]+)\s+(\d{1,2}),\s*(\d{4})",
-            description
-        ):
-            try:
-                s = dateparser.parse(f"{mo1} {d1}, {yr}").date()
-                e = dateparser.parse(f"{mo2} {d2}, {yr}").date()
-                date_ranges.append((s,e))
-            except: pass
-
-        # (ii) Same‐month ranges
-        for mo,d1,d2,yr in re.findall(
-            r"([A-Za-z]+)\s+(\d{1,2})-(\d{1,2}),\s*(\d{4})",
-            description
-        ):
-            try:
-                s = dateparser.parse(f"{mo} {d1}, {yr}").date()
-                e = dateparser.parse(f"{mo} {d2}, {yr}").date()
-                date_ranges.append((s,e))
-            except: pass
-
-        # (iii) Fallback “to” / comma‐list
-        if len(date_ranges) <= 1:
-            if m := re.search(
-                r"Project\s+Dates?:\s*(.*?),\s*(\d{4})",
-                description, re.IGNORECASE
-            ):
-                raw, yr = m.groups()
-                if m_to := re.match(
-                    r"([A-Za-z]+)\s+(\d{1,2})\s+to\s+(?:([A-Za-z]+)\s+)?(\d{1,2})",
-                    raw, re.IGNORECASE
-                ):
-                    mo1,d1,mo2,d2 = m_to.groups(); mo2=mo2 or mo1
-                    try:
-                        s = dateparser.parse(f"{mo1} {d1}, {yr}").date()
-                        e = dateparser.parse(f"{mo2} {d2}, {yr}").date()
-                        date_ranges = [(s,e)]
-                    except: date_ranges=[]
-                else:
-                    parts = [p.strip() for p in raw.split(",")]
-                    prev=None
-                    for part in parts:
-                        if " " in part:
-                            prev_month,days = part.split(" ",1)
-                        else:
-                            days = part; prev_month = prev_month
-                        if "-" in days:
-                            d1,d2 = days.split("-",1)
-                        else:
-                            d1=d2=days
-                        try:
-                            s = dateparser.parse(f"{prev_month} {d1}, {yr}").date()
-                            e = dateparser.parse(f"{prev_month} {d2}, {yr}").date()
-                            date_ranges.append((s,e))
-                        except: pass
-
-        # (iv) “Test date:” fallback
-        if not date_ranges:
-            if m_s := re.search(
-                r"Test\s*date[s]?:\s*([A-Za-z]+\s+\d{1,2},\s*\d{4})",
-                description, re.IGNORECASE
-            ):
-                try:
-                    dt = dateparser.parse(m_s.group(1)).date()
-                    date_ranges.append((dt,dt))
-                except: pass
-
-        # ✱ FINAL fallback: any standalone “Month D, YYYY” ✱
-        if not date_ranges:
-            if m_any := re.search(
-                r"([A-Za-z]+\s+\d{1,2},\s*\d{4})",
-                description
-            ):
-                try:
-                    dt = dateparser.parse(m_any.group(1)).date()
-                    date_ranges.append((dt,dt))
-                except: pass
-
-        # 5d) Collapse to overall dates
+        # 4b) Date ranges
+        with timing.stage("dates"):
+            date_ranges = dates.parse(description)
+
+        # 4c) Collapse to overall dates
         if date_ranges:
-            test_date_start = _fmt_date(min(s for s,_ in date_ranges))
-            test_date_end   = _fmt_date(max(e for _,e in date_ranges))
+            test_date_start = min(s for s,_ in date_ranges).toordinal()
+            test_date_end   = max(e for _,e in date_ranges).toordinal()
         else:
             test_date_start = test_date_end = None
 
-        # 5e) Build record
-        records.append({
-            "client_name":         "client_name",
-            "location":            "location",
-            "invoice_number":      invoice_number,
-            "invoice_date":        invoice_date,
-            "project_description": description,
-            "invoice_amount":      invoice_amount,
-            "test_date_start":     test_date_start,
-            "test_date_end":       test_date_end,
-        })
-
-    # 6) Invoice‐level mobilization_count
+        # 4d) Build record
+        items.append(LineItem(invoice, description, invoice_amount,
+                              test_date_start, test_date_end))
+
+    # 5) Invoice‐level mobilization_count, set once on the shared invoice
     extra = sum(
-        1 for rec in records
-        if re.search(r"\bmobilization\b", rec["project_description"], re.IGNORECASE)
+        1 for item in items
+        if _MOBILIZATION_RE.search(item.project_description)
     )
-    count = 1 + extra
-    for rec in records:
-        rec["mobilization_count"] = count
+    invoice.mobilization_count = 1 + extra
 
-    return records
+    return items
@@ -0,0 +1,114 @@
+# invoices/records.py
+
+import datetime
+from dataclasses import dataclass
+from typing import Optional
+
+# Column layout of the invoices sheet (invoices.workbook, invoices.store)
+COLUMNS = [
+    "client_name",
+    "project_description",
+    "test_date_start",
+    "test_date_end",
+    "mobilization_count",
+    "invoice_amount",
+    "invoice_date",
+    "invoice_number",
+    "location",
+]
+
+# Date fields are held as date.toordinal() and shown as MM/DD/YYYY
+_DATE_FIELDS = {"invoice_date", "test_date_start", "test_date_end"}
+_INVOICE_FIELDS = {"invoice_number", "invoice_date", "mobilization_count",
+                   "client_name", "location", "source_file"}
+_ITEM_FIELDS = {"project_description", "invoice_amount",
+                "test_date_start", "test_date_end"}
+
+def _fmt_ordinal(ordinal):
+    if ordinal is None:
+        return None
+    return datetime.date.fromordinal(ordinal).strftime("%m/%d/%Y")
+
+@dataclass(slots=True, eq=False)
+class Invoice:
+    """Fields shared by every line item of one invoice, stored once."""
+    invoice_number: Optional[str] = None
+    invoice_date: Optional[int] = None
+    mobilization_count: int = 1
+    client_name: str = "client_name"
+    location: str = "location"
+    source_file: Optional[str] = None
+
+@dataclass(slots=True, eq=False)
+class LineItem:
+    """
+    One line item, pointing at its shared Invoice. Reads like the dicts
+    pdf_reader used to build: item["invoice_date"], item.get(...) and
+    to_dict() give the same keys and MM/DD/YYYY date strings.
+    """
+    invoice: Invoice
+    project_description: str
+    invoice_amount: Optional[float] = None
+    test_date_start: Optional[int] = None
+    test_date_end: Optional[int] = None
+
+    def __getitem__(self, key):
+        if key in _ITEM_FIELDS:
+            value = getattr(self, key)
+        elif key in _INVOICE_FIELDS:
+            value = getattr(self.invoice, key)
+        else:
+            raise KeyError(key)
+        return _fmt_ordinal(value) if key in _DATE_FIELDS else value
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None and key == "source_file" else value
+
+    def to_dict(self):
+        """The item as the plain dict extract_invoice_data returns."""
+        inv = self.invoice
+        rec = {
+            "client_name":         inv.client_name,
+            "location":            inv.location,
+            "invoice_number":      inv.invoice_number,
+            "invoice_date":        _fmt_ordinal(inv.invoice_date),
+            "project_description": self.project_description,
+            "invoice_amount":      self.invoice_amount,
+            "test_date_start":     _fmt_ordinal(self.test_date_start),
+            "test_date_end":       _fmt_ordinal(self.test_date_end),
+            "mobilization_count":  inv.mobilization_count,
+        }
+        if inv.source_file is not None:
+            rec["source_file"] = inv.source_file
+        return rec
+
+def to_dicts(items):
+    return [item.to_dict() for item in items]
+
+def pack(items):
+    """
+    JSON-ready form of items: one entry per invoice, its shared fields
+    once, then [description, amount, start, end] per item.
+    """
+    packed = []
+    last = None
+    for item in items:
+        if item.invoice is not last:
+            last = item.invoice
+            packed.append([last.invoice_number, last.invoice_date,
+                           last.mobilization_count, []])
+        packed[-1][3].append([item.project_description, item.invoice_amount,
+                              item.test_date_start, item.test_date_end])
+    return packed
+
+def unpack(packed):
+    """Inverse of pack()."""
+    items = []
+    for number, date, mobilizations, rows in packed:
+        invoice = Invoice(number, date, mobilizations)
+        items += [LineItem(invoice, *row) for row in rows]
+    return items
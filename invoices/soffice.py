@@ -0,0 +1,226 @@
+# invoices/soffice.py
+
+import atexit
+import os
+import pathlib
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from multiprocessing.util import Finalize
+
+from . import timing
+from .supervisor import WorkerError
+
+# Binary to run; override with the SOFFICE environment variable
+SOFFICE = os.environ.get("SOFFICE", "soffice")
+
+# Seconds to wait for a fresh instance to start listening
+STARTUP_TIMEOUT = 60
+
+# Seconds one conversion call may take before soffice is killed
+CONVERT_TIMEOUT = 120
+
+# soffice is a launcher that starts soffice.bin (and oosplash) under it;
+# each call gets its own process group so the whole tree can be killed
+_SESSION = {"start_new_session": True} if os.name == "posix" else {}
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _kill_tree(proc):
+    """Kill proc and every process it started, then reap it."""
+    if os.name == "posix":
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    else:
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    proc.wait()
+
+class ConversionService:
+    """
+    Pool of warm headless LibreOffice instances, each on its own profile.
+
+    A `soffice --convert-to` call made with the same profile as a running
+    instance is handed to that instance, so each conversion skips the
+    multi-second cold start. Instances are started lazily, restarted if
+    they die, and shut down (profiles removed) on close or at exit. A
+    call still running after `timeout` seconds is killed along with the
+    instance it was handed to, which is restarted for the next file, and
+    fails with a WorkerError as a hung parse would.
+    """
+
+    def __init__(self, instances=1, soffice=SOFFICE, timeout=CONVERT_TIMEOUT):
+        self.soffice = soffice
+        self.timeout = timeout or None
+        self._profiles = [
+            tempfile.mkdtemp(prefix="tetco-soffice-") for _ in range(instances)
+        ]
+        self._procs = [None] * instances
+        self._idle = queue.Queue()
+        for i in range(instances):
+            self._idle.put(i)
+        self._closed = False
+        atexit.register(self.close)
+        # Pool workers leave via os._exit, which skips atexit
+        Finalize(None, self.close, exitpriority=10)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _env_arg(self, i):
+        return "-env:UserInstallation=" + pathlib.Path(self._profiles[i]).as_uri()
+
+    def _start(self, i):
+        """Start instance i (if needed) and wait until it is listening."""
+        proc = self._procs[i]
+        if proc is not None and proc.poll() is None:
+            return
+        port = _free_port()
+        self._procs[i] = subprocess.Popen([
+            self.soffice, self._env_arg(i),
+            "--headless", "--invisible", "--nologo",
+            "--norestore", "--nodefault",
+            f"--accept=socket,host=127.0.0.1,port={port};urp;",
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **_SESSION)
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self._procs[i].poll() is not None:
+                raise RuntimeError("LibreOffice exited during startup")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        self._stop(i)
+        raise RuntimeError("LibreOffice did not start listening in time")
+
+    def _stop(self, i):
+        proc, self._procs[i] = self._procs[i], None
+        if proc is None or proc.poll() is not None:
+            return
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            pass
+        _kill_tree(proc)  # and anything it left running
+
+    def _run(self, i, paths, outdir):
+        args = [
+            self.soffice, self._env_arg(i),
+            "--headless", "--convert-to", "pdf",
+            "--outdir", outdir, *paths
+        ]
+        proc = subprocess.Popen(args, **_SESSION)
+        try:
+            proc.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            # The call hangs because the instance does: kill both
+            _kill_tree(proc)
+            instance = self._procs[i]
+            self._procs[i] = None
+            if instance is not None:
+                _kill_tree(instance)
+            raise WorkerError(
+                f"LibreOffice timed out after {self.timeout:g}s converting "
+                f"{', '.join(os.path.basename(p) for p in paths)}"
+            ) from None
+        except BaseException:
+            _kill_tree(proc)
+            raise
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, args)
+
+    def convert_batch(self, paths, outdir):
+        """
+        Convert every file in paths to PDF inside outdir using as few
+        soffice calls as possible. Returns {source path: pdf path}.
+        """
+        # One call (and subfolder) per group of distinct basenames,
+        # so outputs can't overwrite each other
+        batches = []
+        for path in paths:
+            name = os.path.splitext(os.path.basename(path))[0] + ".pdf"
+            for batch in batches:
+                if name not in batch:
+                    batch[name] = path
+                    break
+            else:
+                batches.append({name: path})
+
+        i = self._idle.get()
+        try:
+            out = {}
+            for k, batch in enumerate(batches):
+                batch_dir = os.path.join(outdir, str(k)) if k else outdir
+                os.makedirs(batch_dir, exist_ok=True)
+                for attempt in range(2):
+                    self._start(i)
+                    self._run(i, list(batch.values()), batch_dir)
+                    missing = [n for n in batch
+                               if not os.path.exists(os.path.join(batch_dir, n))]
+                    if not missing:
+                        break
+                    # Instance wedged: restart it and try once more
+                    self._stop(i)
+                else:
+                    raise RuntimeError(
+                        f"LibreOffice did not produce {', '.join(missing)}"
+                    )
+                for name, path in batch.items():
+                    out[path] = os.path.join(batch_dir, name)
+            return out
+        finally:
+            self._idle.put(i)
+
+    def convert(self, path, outdir):
+        """Convert one file to PDF inside outdir and return the PDF path."""
+        return self.convert_batch([path], outdir)[path]
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for i in range(len(self._procs)):
+            self._stop(i)
+        for profile in self._profiles:
+            shutil.rmtree(profile, ignore_errors=True)
+
+_service = None
+
+def get_service():
+    """Return the process-wide conversion service, starting it on first use."""
+    global _service
+    if _service is None or _service._closed:
+        _service = ConversionService()
+    return _service
+
+@contextmanager
+def converted_pdf(path):
+    """Convert path with the shared service and yield the temporary PDF."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with timing.stage("convert"):
+            pdf_path = get_service().convert(path, tmpdir)
+        yield pdf_path
+
+@contextmanager
+def converted_pdfs(paths):
+    """Batch version of converted_pdf: yields {source path: pdf path}."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with timing.stage("convert"):
+            pdfs = get_service().convert_batch(paths, tmpdir)
+        yield pdfs
@@ -0,0 +1,896 @@
+# invoices/store.py
+
+import datetime
+import difflib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from .records import COLUMNS
+
+# Rows per upsert transaction
+BATCH = 1000
+
+# Source files per checkpoint in a journaled run
+CHECKPOINT_FILES = 25
+
+# Year an invoice is counted under: the year of its invoice date, or ""
+# when it has none (or one that isn't a date)
+_YEAR = """CASE WHEN invoice_date GLOB '[0-9][0-9][0-9][0-9]-*'
+            THEN substr(invoice_date, 1, 4) ELSE '' END"""
+
+# Dates are stored as YYYY-MM-DD so they index and compare; client_name
+# lookups use invoices_rollup, which leads with it; invoice_number is
+# untyped so numbers typed into the workbook stay numbers. A row read
+# from a file has that file's folder (absolute), its path in the folder
+# and its line in it; rows seeded from the workbook, or stored before
+# files were tracked, have folder "" and no line. exported lists the rows
+# of the workbook as last written, in sheet order, by id and a digest of
+# their cells, so edits made to it since can be found
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS invoices (
+        id                  INTEGER PRIMARY KEY,
+        client_name         TEXT NOT NULL,
+        project_description TEXT,
+        test_date_start     TEXT,
+        test_date_end       TEXT,
+        mobilization_count  INTEGER,
+        invoice_amount      REAL,
+        invoice_date        TEXT,
+        invoice_number,
+        location            TEXT,
+        folder              TEXT NOT NULL DEFAULT '',
+        source_file         TEXT NOT NULL,
+        invoice_key         TEXT NOT NULL,
+        line                INTEGER,
+        extra               TEXT,
+        invoice_year        TEXT GENERATED ALWAYS AS (""" + _YEAR + """) VIRTUAL,
+        UNIQUE (folder, source_file, line)
+    );
+    CREATE INDEX IF NOT EXISTS invoices_invoice_key ON invoices(invoice_key);
+    CREATE INDEX IF NOT EXISTS invoices_test_dates
+        ON invoices(test_date_start, test_date_end);
+    CREATE TABLE IF NOT EXISTS meta (
+        key   TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE TABLE IF NOT EXISTS exported (
+        row    INTEGER PRIMARY KEY,
+        id     INTEGER NOT NULL,
+        digest TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS runs (
+        id          INTEGER PRIMARY KEY,
+        folder      TEXT NOT NULL,
+        client_name TEXT,
+        location    TEXT,
+        started     REAL NOT NULL,
+        finished    REAL
+    );
+    CREATE TABLE IF NOT EXISTS run_files (
+        run_id      INTEGER NOT NULL,
+        source_file TEXT NOT NULL,
+        PRIMARY KEY (run_id, source_file)
+    );
+"""
+
+# Totals per (client, invoice year, location), location "" when unknown.
+# Triggers note every key a write touches in rollups_dirty, and the
+# writer recomputes just those keys before it commits, so the totals
+# never go stale and no query has to add up the whole history
+_ROLLUPS = """
+    CREATE TABLE IF NOT EXISTS rollups (
+        client_name   TEXT NOT NULL,
+        year          TEXT NOT NULL,
+        location      TEXT NOT NULL,
+        revenue       REAL NOT NULL,
+        invoices      INTEGER NOT NULL,
+        line_items    INTEGER NOT NULL,
+        mobilizations INTEGER NOT NULL,
+        PRIMARY KEY (client_name, year, location)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS rollups_dirty (
+        client_name TEXT NOT NULL,
+        year        TEXT NOT NULL,
+        location    TEXT NOT NULL,
+        PRIMARY KEY (client_name, year, location)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS invoices_rollup
+        ON invoices(client_name, invoice_year);
+    CREATE TRIGGER IF NOT EXISTS invoices_rollup_insert
+    AFTER INSERT ON invoices BEGIN
+        INSERT INTO rollups_dirty
+        VALUES (NEW.client_name, NEW.invoice_year, ifnull(NEW.location, ''))
+        ON CONFLICT DO NOTHING;
+    END;
+    CREATE TRIGGER IF NOT EXISTS invoices_rollup_update
+    AFTER UPDATE OF client_name, mobilization_count, invoice_amount,
+        invoice_date, location, invoice_key ON invoices BEGIN
+        INSERT INTO rollups_dirty
+        VALUES (OLD.client_name, OLD.invoice_year, ifnull(OLD.location, ''))
+        ON CONFLICT DO NOTHING;
+        INSERT INTO rollups_dirty
+        VALUES (NEW.client_name, NEW.invoice_year, ifnull(NEW.location, ''))
+        ON CONFLICT DO NOTHING;
+    END;
+    CREATE TRIGGER IF NOT EXISTS invoices_rollup_delete
+    AFTER DELETE ON invoices BEGIN
+        INSERT INTO rollups_dirty
+        VALUES (OLD.client_name, OLD.invoice_year, ifnull(OLD.location, ''))
+        ON CONFLICT DO NOTHING;
+    END;
+"""
+
+# Recomputes the dirty keys from their rows, found through invoices_rollup
+# (CROSS JOIN keeps the few dirty keys as the outer loop). Rows are first
+# summed per invoice, as mobilization_count is the invoice's and repeats
+# on each of its line items; an invoice without a number is its file's
+_REFRESH_ROLLUPS = """
+    INSERT INTO rollups
+    SELECT client_name, year, location, total(revenue),
+           count(DISTINCT nullif(invoice_key, '')), sum(line_items),
+           ifnull(sum(mobilizations), 0)
+    FROM (
+        SELECT i.client_name, i.invoice_year AS year,
+               ifnull(i.location, '') AS location, i.invoice_key,
+               total(i.invoice_amount) AS revenue, count(*) AS line_items,
+               max(i.mobilization_count) AS mobilizations
+        FROM rollups_dirty AS d
+        CROSS JOIN invoices AS i
+          ON i.client_name = d.client_name AND i.invoice_year = d.year
+         AND ifnull(i.location, '') = d.location
+        GROUP BY i.client_name, i.invoice_year, ifnull(i.location, ''),
+                 i.invoice_key,
+                 CASE WHEN i.invoice_key = '' THEN i.source_file END
+    )
+    GROUP BY client_name, year, location
+"""
+
+# Rebuilds a store made before rows were tied to the file they came from,
+# without its (client, invoice, file, line) key. The folder of a row's
+# file is taken from the run journal when only one journaled folder has
+# a file by that name; other rows are left untied
+_TIE_TO_FILES = """
+    BEGIN;
+    ALTER TABLE invoices RENAME TO invoices_old;
+    DROP INDEX IF EXISTS invoices_invoice_key;
+    DROP INDEX IF EXISTS invoices_test_dates;
+    DROP INDEX IF EXISTS invoices_rollup;
+""" + _SCHEMA + """
+    INSERT INTO invoices (id, client_name, project_description, test_date_start,
+        test_date_end, mobilization_count, invoice_amount, invoice_date,
+        invoice_number, location, folder, source_file, invoice_key, line, extra)
+    SELECT id, client_name, project_description, test_date_start,
+           test_date_end, mobilization_count, invoice_amount, invoice_date,
+           invoice_number, location, folder, source_file, invoice_key,
+           CASE WHEN folder != '' THEN row_number()
+               OVER (PARTITION BY folder, source_file ORDER BY id) END,
+           extra
+    FROM (
+        SELECT o.*, ifnull((
+            SELECT max(r.folder) FROM run_files AS f JOIN runs AS r ON r.id = f.run_id
+            WHERE f.source_file = o.source_file
+            HAVING count(DISTINCT r.folder) = 1
+        ), '') AS folder
+        FROM invoices_old AS o
+    );
+    DROP TABLE invoices_old;
+    COMMIT;
+"""
+
+ROLLUP_KEYS = ("client_name", "year", "location")
+
+_TOTALS = ("revenue", "invoices", "line_items", "mobilizations")
+
+# Bumped whenever the rollups are summed differently, so existing stores
+# are rolled up again when next opened
+ROLLUPS_VERSION = "2"
+
+_INSERT = """
+    INSERT INTO invoices (client_name, project_description, test_date_start,
+        test_date_end, mobilization_count, invoice_amount, invoice_date,
+        invoice_number, location, folder, source_file, invoice_key, line, extra)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Positions in _INSERT's parameters
+_FOLDER, _SOURCE, _KEY, _LINE, _EXTRA = 9, 10, 11, 12, 13
+
+# A file's rows, up to the id where the writing call started, so that
+# rows it has just written are never replaced by it
+_FILE_ROWS = "FROM invoices WHERE folder = ? AND source_file = ? AND id <= ?"
+
+# Rows that aren't from a known file (seeded from the workbook, or stored
+# before files were tracked) holding the same invoice as a row read from
+# a file: same number, invoice date and amount
+_SAME_INVOICE = """
+    FROM invoices WHERE folder = '' AND invoice_key = ? AND invoice_date IS ?
+    AND round(invoice_amount, 2) IS round(?, 2) AND id <= ?
+"""
+
+_DATES = ("test_date_start", "test_date_end", "invoice_date")
+
+def store_path_for(workbook_path):
+    """Default store location: beside the workbook, same name, .sqlite."""
+    return os.path.splitext(workbook_path)[0] + ".sqlite"
+
+def invoice_key(number):
+    """Invoice number as matched everywhere: text without leading zeros."""
+    return "" if number is None else str(number).lstrip("0")
+
+def _iso(value):
+    """MM/DD/YYYY (or a date) as YYYY-MM-DD, so dates index and sort."""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, str) and len(value) == 10 and value[2] == value[5] == "/":
+        return f"{value[6:]}-{value[:2]}-{value[3:5]}"
+    return value
+
+def _mdy(value):
+    """Inverse of _iso for record dicts; anything else passes through."""
+    if isinstance(value, str) and len(value) == 10 and value[4] == value[7] == "-":
+        return f"{value[5:7]}/{value[8:]}/{value[:4]}"
+    return value
+
+def _date(value):
+    """
+    YYYY-MM-DD as a date for the workbook, so its cells stay Excel dates
+    (shown MM/DD/YYYY by the column format); anything else passes through.
+    """
+    if isinstance(value, str) and len(value) == 10 and value[4] == value[7] == "-":
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            pass
+    return value
+
+class Formula(str):
+    """A cell's formula, "=..." as Excel shows it, as opposed to text."""
+
+# Cells to the right of COLUMNS in an imported workbook are kept as JSON;
+# formulas, dates and times are tagged so they come back as such
+_TIME_TYPES = {"datetime": datetime.datetime, "date": datetime.date,
+               "time": datetime.time}
+
+def _dump_extra(values):
+    values = list(values)
+    while values and values[-1] is None:
+        values.pop()
+    if not values:
+        return None
+    def tag(v):
+        if isinstance(v, Formula):
+            return {"formula": str(v)}
+        for name, cls in _TIME_TYPES.items():
+            if isinstance(v, cls):
+                return {name: v.isoformat()}
+        if v is None or isinstance(v, (str, int, float)):
+            return v
+        return str(v)
+    return json.dumps([tag(v) for v in values])
+
+def _load_extra(text):
+    if text is None:
+        return []
+    def untag(v):
+        if not isinstance(v, dict):
+            return v
+        (name, value), = v.items()
+        if name == "formula":
+            return Formula(value)
+        return _TIME_TYPES[name].fromisoformat(value)
+    return [untag(v) for v in json.loads(text)]
+
+def _cell_value(cell):
+    """A read-only openpyxl cell's value, a formula as a Formula."""
+    if cell.data_type == "f":
+        # Array and data table formulas keep just their text
+        return Formula(getattr(cell.value, "text", cell.value))
+    return cell.value
+
+def _fingerprint(columns, extra):
+    """
+    Digest of a row's cells (COLUMNS as stored, extra as JSON), the same
+    for a row read back from the workbook as for the row it was written
+    from: numbers compare as floats, date cells as dates.
+    """
+    def norm(v):
+        if isinstance(v, Formula):
+            return ("=", str(v))
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            if isinstance(v, datetime.datetime) and v.time() == datetime.time():
+                return v.date().isoformat()
+            if isinstance(v, (datetime.date, datetime.time)):
+                return v.isoformat()[:19]
+            return v
+        return float(v)
+    cells = [norm(v) for v in (*columns, *_load_extra(extra))]
+    return hashlib.sha1(repr(cells).encode("utf-8")).hexdigest()[:16]
+
+def _file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class InvoiceStore:
+    """
+    SQLite home of every invoice line item, indexed by client, invoice
+    number and test dates; the Excel workbook is an export of it.
+
+    A row read from a file belongs to that file (its folder and path), so
+    re-ingesting a file replaces all of its rows, whatever client name it
+    was stamped with or invoice number the parser found, rather than
+    adding them again. Rows seeded from the workbook belong to no file;
+    a file's row replaces any of them holding the same invoice (number,
+    date and amount). Use for_workbook() to get the store that sits
+    beside a workbook, seeded from it on first use; edits made to the
+    workbook since the store last wrote it are merged back in.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+        # Stores made before extra cells were kept
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(invoices)")}
+        if "extra" not in columns:
+            self._db.execute("ALTER TABLE invoices ADD COLUMN extra TEXT")
+        # ...and before the rollups
+        columns = {row[1] for row in self._db.execute("PRAGMA table_xinfo(invoices)")}
+        if "invoice_year" not in columns:
+            self._db.execute("ALTER TABLE invoices ADD COLUMN invoice_year TEXT "
+                             f"GENERATED ALWAYS AS ({_YEAR}) VIRTUAL")
+        # ...and before rows were tied to their files
+        if "folder" not in columns:
+            self._db.executescript(_TIE_TO_FILES)
+        self._db.executescript(_ROLLUPS)
+        built = self._db.execute(
+            "SELECT value FROM meta WHERE key = 'rollups_version'"
+        ).fetchone()
+        if built is None or built[0] != ROLLUPS_VERSION:
+            # New store, or rollups summed the way an older version did
+            with self._db:
+                self._db.execute("DELETE FROM rollups")
+                self._db.execute(
+                    "INSERT OR IGNORE INTO rollups_dirty "
+                    "SELECT DISTINCT client_name, invoice_year, ifnull(location, '') "
+                    "FROM invoices"
+                )
+                self._refresh_rollups()
+                self._db.execute("DELETE FROM meta WHERE key = 'rollups_built'")
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES "
+                                 "('rollups_version', ?)", (ROLLUPS_VERSION,))
+        # The workbook this store is the home of, if it has one
+        self.workbook = self._meta("seeded_from")
+
+    @classmethod
+    def for_workbook(cls, workbook_path, path=None):
+        """
+        Open the store for workbook_path. The first time, the rows already
+        in the workbook are imported, so the history carries over; after
+        that, edits made to the workbook since it was last written are
+        merged in (see merge_workbook).
+        """
+        store = cls(path or store_path_for(workbook_path))
+        if store.workbook is None:
+            store.workbook = os.path.abspath(workbook_path)
+            if os.path.exists(workbook_path):
+                store.import_workbook(workbook_path)
+            with store._db:
+                store._db.execute("INSERT INTO meta VALUES ('seeded_from', ?)",
+                                  (store.workbook,))
+                store._snapshot()
+        else:
+            store.merge_workbook()
+        return store
+
+    def _meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _workbook_state(self):
+        """
+        The workbook's [size, mtime_ns, sha256], or None if it is gone; the
+        hash is only recomputed if the size or mtime differ from the last
+        saved state.
+        """
+        try:
+            st = os.stat(self.workbook)
+        except OSError:
+            return None
+        saved = json.loads(self._meta("workbook_state") or "null")
+        if saved and saved[:2] == [st.st_size, st.st_mtime_ns]:
+            return saved
+        return [st.st_size, st.st_mtime_ns, _file_hash(self.workbook)]
+
+    def _snapshot(self, rows=None):
+        """
+        Record the workbook as it now is: its state, and as exported the
+        (id, digest) of each of its rows, by default the store's rows.
+        Called inside the writing transaction.
+        """
+        if rows is None:
+            rows = ((id, _fingerprint(row[:-1], row[-1])) for id, *row in self._db.execute(
+                f"SELECT id, {', '.join(COLUMNS)}, extra FROM invoices ORDER BY id"
+            ).fetchall())
+        self._db.execute("DELETE FROM exported")
+        self._db.executemany("INSERT INTO exported (id, digest) VALUES (?, ?)", rows)
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('workbook_state', ?)",
+                         (json.dumps(self._workbook_state()),))
+
+    def merge_workbook(self):
+        """
+        Bring edits made to the workbook since it was last written into
+        the store, and say so: a changed row is updated in place, a row
+        added by hand is kept (as a row of no file), a row deleted by hand
+        is deleted. Edits to rows the store has changed too since (read
+        again from their file) are left out, and reported. Does nothing if
+        the workbook is unchanged or gone.
+        """
+        state = self._workbook_state()
+        if state is None:
+            return
+        saved = json.loads(self._meta("workbook_state") or "null")
+        if saved == state:
+            return
+        if saved and saved[2] == state[2]:
+            with self._db:  # touched, not changed
+                self._db.execute("UPDATE meta SET value = ? WHERE key = 'workbook_state'",
+                                 (json.dumps(state),))
+            return
+
+        if saved is None:
+            # Last written before the store kept track: take the store's
+            # rows as what it was written with
+            with self._db:
+                self._snapshot()
+        old = self._db.execute("SELECT id, digest FROM exported ORDER BY row").fetchall()
+        new = [_fingerprint(p[:_FOLDER], p[_EXTRA])
+               for p in self._params(self._workbook_records(self.workbook))]
+        opcodes = difflib.SequenceMatcher(
+            None, [digest for _, digest in old], new, autojunk=False
+        ).get_opcodes()
+        if all(tag == "equal" for tag, *_ in opcodes):
+            with self._db:
+                self._snapshot(old)
+            return
+
+        # Line the workbook's rows up with those it was written with: a
+        # changed row in place of one, an added row in place of none
+        changed, added, deleted = {}, set(), []
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag != "equal":
+                pairs = min(i2 - i1, j2 - j1)
+                changed.update((j1 + k, old[i1 + k]) for k in range(pairs))
+                added.update(range(j1 + pairs, j2))
+                deleted += old[i1 + pairs:i2]
+
+        ids = {}   # changed or added workbook row -> store row id
+        left_out = 0
+        with self._db:
+            db = self._db
+            for id, digest in deleted:
+                if self._digest(id) == digest:
+                    db.execute("DELETE FROM invoices WHERE id = ?", (id,))
+                else:
+                    left_out += 1
+            records = self._params(self._workbook_records(self.workbook))
+            for j, p in enumerate(records):
+                if j in added:
+                    ids[j] = db.execute(_INSERT, p).lastrowid
+                elif j in changed:
+                    id, digest = changed[j]
+                    if self._digest(id) != digest:
+                        left_out += 1
+                        continue
+                    db.execute(
+                        f"UPDATE invoices SET ({', '.join(COLUMNS)}, invoice_key, extra) "
+                        f"= ({', '.join('?' * (len(COLUMNS) + 2))}) WHERE id = ?",
+                        (*p[:_FOLDER], p[_KEY], p[_EXTRA], id)
+                    )
+                    ids[j] = id
+            self._refresh_rollups()
+            # The workbook as it now is, less the rows left out
+            rows = []
+            for tag, i1, i2, j1, j2 in opcodes:
+                for j in range(j1, j2):
+                    id = old[i1 + j - j1][0] if tag == "equal" else ids.get(j)
+                    if id is not None:
+                        rows.append((id, new[j]))
+            self._snapshot(rows)
+
+        print(f"{self.workbook} was edited since it was last written; merged "
+              f"into the store: {len(changed) + len(deleted) - left_out} row(s) "
+              f"changed or deleted, {len(added)} added.")
+        if left_out:
+            print(f"  {left_out} edited row(s) were left out, as their files have "
+                  f"been read again since; the next export writes them over.")
+
+    def _digest(self, id):
+        """_fingerprint of the store's row id, None if there is none."""
+        row = self._db.execute(
+            f"SELECT {', '.join(COLUMNS)}, extra FROM invoices WHERE id = ?", (id,)
+        ).fetchone()
+        return None if row is None else _fingerprint(row[:-1], row[-1])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def upsert(self, rows, folder=None):
+        """
+        Write rows (record dicts or LineItems), about BATCH to a
+        transaction; return how many were written. Rows with a source_file
+        are taken as read from that file under folder and replace what the
+        store held for it, each file in one transaction; rows without one
+        are added. A file's rows must all come in the same call, in a run,
+        as their line numbers count up from 1 in each.
+        """
+        last = self._last_id()
+        count = 0
+        batch = []
+        for row in self._params(rows, folder):
+            # Cut between files, never through one
+            if len(batch) >= BATCH and (not row[_FOLDER] or
+                                        row[_FOLDER:_SOURCE + 1] !=
+                                        batch[-1][_FOLDER:_SOURCE + 1]):
+                count += self._write(batch, last)
+                batch = []
+            batch.append(row)
+        if batch:
+            count += self._write(batch, last)
+        return count
+
+    def _last_id(self):
+        return self._db.execute("SELECT ifnull(max(id), 0) FROM invoices").fetchone()[0]
+
+    def _write(self, params, last):
+        """Write params in one transaction; return how many."""
+        with self._db:
+            self._replace(params, last)
+            self._refresh_rollups()
+        return len(params)
+
+    def _replace(self, params, last, files=()):
+        """
+        Insert params in place of the rows, up to id last, of their files
+        and of files (more (folder, source_file) pairs, e.g. files that no
+        longer hold any), and of the untied rows holding the same
+        invoices. A replaced row's extra cells go to the new row in its
+        place (same line, or same invoice) unless that has its own.
+        """
+        db = self._db
+        extras = {}
+        for place in dict.fromkeys([*files, *((p[_FOLDER], p[_SOURCE])
+                                              for p in params if p[_FOLDER])]):
+            for line, extra in db.execute(
+                f"SELECT line, extra {_FILE_ROWS} AND extra IS NOT NULL",
+                (*place, last)
+            ):
+                extras[place + (line,)] = extra
+            db.execute(f"DELETE {_FILE_ROWS}", (*place, last))
+        untied = db.execute("SELECT 1 FROM invoices WHERE folder = '' AND id <= ?",
+                            (last,)).fetchone()
+        rows = []
+        for p in params:
+            extra = p[_EXTRA] or extras.get((p[_FOLDER], p[_SOURCE], p[_LINE]))
+            if untied and p[_SOURCE] and p[_KEY]:
+                invoice = (p[_KEY], p[6], p[5], last)
+                for (found,) in db.execute(f"SELECT extra {_SAME_INVOICE}", invoice):
+                    extra = extra or found
+                db.execute(f"DELETE {_SAME_INVOICE}", invoice)
+            rows.append(p[:_EXTRA] + (extra,))
+        db.executemany(_INSERT, rows)
+
+    @staticmethod
+    def _params(rows, folder=None):
+        folder = os.path.abspath(folder) if folder else ""
+        lines = {}
+        for rec in rows:
+            source = rec.get("source_file") or ""
+            place = folder if source else ""
+            n = None
+            if place:
+                n = lines[source] = lines.get(source, 0) + 1
+            yield (
+                rec.get("client_name") or "",
+                rec.get("project_description"),
+                _iso(rec.get("test_date_start")),
+                _iso(rec.get("test_date_end")),
+                rec.get("mobilization_count"),
+                rec.get("invoice_amount"),
+                _iso(rec.get("invoice_date")),
+                rec.get("invoice_number"),
+                rec.get("location"),
+                place, source, invoice_key(rec.get("invoice_number")), n,
+                rec.get("extra"),
+            )
+
+    def import_workbook(self, workbook_path):
+        """
+        Add the data rows of a workbook's active sheet, read by position
+        in COLUMNS order, as rows of no file; any cells further right,
+        formulas included, are kept with the row.
+        """
+        return self.upsert(self._workbook_records(workbook_path))
+
+    @staticmethod
+    def _workbook_records(workbook_path):
+        """The data rows of a workbook's active sheet as record dicts."""
+        import openpyxl  # here, so opening a store doesn't load it
+        wb = openpyxl.load_workbook(workbook_path, read_only=True)
+        try:
+            for row in wb.active.iter_rows(min_row=2):
+                values = [_cell_value(cell) for cell in row]
+                if any(v is not None for v in values):
+                    yield {**dict(zip(COLUMNS, values)),
+                           "extra": _dump_extra(values[len(COLUMNS):])}
+        finally:
+            wb.close()
+
+    def set_locations(self, locations):
+        """Set location for {(client, invoice number): location}."""
+        with self._db:
+            self._db.executemany(
+                "UPDATE invoices SET location = ? "
+                "WHERE client_name = ? AND invoice_key = ?",
+                [(loc, client, invoice_key(inv))
+                 for (client, inv), loc in locations.items()]
+            )
+            self._refresh_rollups()
+
+    def invoice_clients(self, clients):
+        """{invoice key: set of clients} for the given clients' invoices."""
+        index = {}
+        for client in clients:
+            for (key,) in self._db.execute(
+                "SELECT DISTINCT invoice_key FROM invoices WHERE client_name = ?",
+                (client,)
+            ):
+                index.setdefault(key, set()).add(client)
+        return index
+
+    def find(self, client=None, invoice_number=None, start=None, end=None):
+        """
+        Rows as dicts, filtered by client, invoice number and/or test dates
+        overlapping start..end (dates or MM/DD/YYYY), in export order.
+        """
+        where, args = [], []
+        if client is not None:
+            where.append("client_name = ?"); args.append(client)
+        if invoice_number is not None:
+            where.append("invoice_key = ?"); args.append(invoice_key(invoice_number))
+        if start is not None:
+            where.append("test_date_end >= ?"); args.append(_iso(start))
+        if end is not None:
+            where.append("test_date_start <= ?"); args.append(_iso(end))
+        sql = f"SELECT {', '.join(COLUMNS)}, source_file FROM invoices"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        cur = self._db.execute(sql + " ORDER BY id", args)
+        names = COLUMNS + ["source_file"]
+        return [self._export_row(dict(zip(names, row))) for row in cur]
+
+    @staticmethod
+    def _export_row(rec):
+        for key in _DATES:
+            rec[key] = _mdy(rec[key])
+        rec["client_name"] = rec["client_name"] or None
+        return rec
+
+    def rows(self):
+        """
+        Every row as a value list in COLUMNS order, dates as dates,
+        followed by any extra cells it was imported with, in export order.
+        """
+        return self._rows()
+
+    def _rows(self, written=None):
+        """rows(), appending (id, digest) of each to written if given."""
+        cur = self._db.execute(
+            f"SELECT id, {', '.join(COLUMNS)}, extra FROM invoices ORDER BY id"
+        )
+        dates = [COLUMNS.index(key) for key in _DATES]
+        for id, *row in cur:
+            extra = row.pop()
+            if written is not None:
+                written.append((id, _fingerprint(row, extra)))
+            for i in dates:
+                row[i] = _date(row[i])
+            row[0] = row[0] or None
+            yield row + _load_extra(extra)
+
+    def export(self, workbook_path):
+        """
+        Write the whole store out as workbook_path; return the row count.
+        Edits made to the store's own workbook since it was last written
+        are merged in first, not written over.
+        """
+        from .workbook import write_workbook
+        if not self._is_home(workbook_path):
+            return write_workbook(self.rows(), workbook_path)
+        self.merge_workbook()
+        written = []
+        count = write_workbook(self._rows(written), workbook_path)
+        with self._db:
+            self._snapshot(written)
+        return count
+
+    def _is_home(self, workbook_path):
+        """Whether workbook_path is the workbook this store is the home of."""
+        if self.workbook is None:
+            return False
+        if os.path.abspath(workbook_path) == self.workbook:
+            return True
+        try:
+            return os.path.samefile(workbook_path, self.workbook)
+        except OSError:
+            return False
+
+    # Rollups: revenue, invoice, line item and mobilization totals by
+    # client, year and location, for reports that would otherwise add up
+    # every row
+
+    def _refresh_rollups(self):
+        # Called inside the writing transaction, so the totals commit
+        # with the rows they count
+        self._db.execute(
+            "DELETE FROM rollups WHERE (client_name, year, location) IN "
+            "(SELECT client_name, year, location FROM rollups_dirty)"
+        )
+        self._db.execute(_REFRESH_ROLLUPS)
+        self._db.execute("DELETE FROM rollups_dirty")
+
+    def totals(self, by=ROLLUP_KEYS, client=None, year=None, location=None):
+        """
+        Rollup totals as dicts, grouped by the ROLLUP_KEYS in `by` and
+        filtered by client, year and/or location, in key order; e.g.
+        by=("client_name", "year") is revenue by client and year. year is
+        an int, or None for undated invoices; location None if unknown.
+        An invoice is counted once per key it falls under.
+        """
+        if not by or not set(by) <= set(ROLLUP_KEYS):
+            raise ValueError(f"by must name some of {ROLLUP_KEYS}")
+        where, args = [], []
+        for key, value in (("client_name", client), ("year", year),
+                           ("location", location)):
+            if value is not None:
+                where.append(f"{key} = ?"); args.append(str(value))
+        keys = ", ".join(by)
+        sql = f"SELECT {keys}, {', '.join(f'sum({t})' for t in _TOTALS)} FROM rollups"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        cur = self._db.execute(f"{sql} GROUP BY {keys} ORDER BY {keys}", args)
+        return [self._rollup_row(dict(zip(list(by) + list(_TOTALS), row)))
+                for row in cur]
+
+    def customers(self):
+        """
+        One dict per client, by revenue: totals, the years they were
+        invoiced in (years_active), and their first and last year.
+        """
+        cur = self._db.execute(
+            f"SELECT client_name, {', '.join(f'sum({t})' for t in _TOTALS)}, "
+            "count(DISTINCT nullif(year, '')), min(nullif(year, '')), "
+            "max(nullif(year, '')) "
+            "FROM rollups GROUP BY client_name ORDER BY sum(revenue) DESC"
+        )
+        names = ["client_name", *_TOTALS, "years_active", "first_year", "last_year"]
+        return [self._rollup_row(dict(zip(names, row))) for row in cur]
+
+    @staticmethod
+    def _rollup_row(rec):
+        for key in ("year", "first_year", "last_year"):
+            if key in rec:
+                rec[key] = int(rec[key]) if rec[key] else None
+        if "location" in rec:
+            rec["location"] = rec["location"] or None
+        if "client_name" in rec:
+            rec["client_name"] = rec["client_name"] or None
+        return rec
+
+    # Run journal: which source files of a batch run are in the store,
+    # so an interrupted run can pick up where it stopped
+
+    def start_run(self, folder, client_name, location):
+        """Journal a new run over folder; return its id."""
+        with self._db:
+            cur = self._db.execute(
+                "INSERT INTO runs (folder, client_name, location, started) "
+                "VALUES (?, ?, ?, ?)",
+                (os.path.abspath(folder), client_name, location, time.time())
+            )
+        return cur.lastrowid
+
+    def unfinished_run(self, folder):
+        """(id, client_name, location) of folder's latest unfinished run, or None."""
+        return self._db.execute(
+            "SELECT id, client_name, location FROM runs "
+            "WHERE folder = ? AND finished IS NULL ORDER BY id DESC LIMIT 1",
+            (os.path.abspath(folder),)
+        ).fetchone()
+
+    def run_files(self, run_id):
+        """Source files (relative to the run's folder) already written."""
+        return {path for (path,) in self._db.execute(
+            "SELECT source_file FROM run_files WHERE run_id = ?", (run_id,)
+        )}
+
+    def checkpoint(self, run_id, rows, sources):
+        """
+        Write rows in place of what the store held for sources (files
+        of the run's folder) and journal them as done, in one transaction,
+        so a crash leaves either both or neither. rows must be all the rows
+        of those sources.
+        """
+        (folder,) = self._db.execute("SELECT folder FROM runs WHERE id = ?",
+                                     (run_id,)).fetchone()
+        params = list(self._params(rows, folder))
+        last = self._last_id()
+        with self._db:
+            self._replace(params, last, [(folder, s) for s in sources])
+            self._db.executemany(
+                "INSERT OR IGNORE INTO run_files VALUES (?, ?)",
+                [(run_id, source) for source in sources]
+            )
+            self._refresh_rollups()
+
+    def finish_run(self, run_id):
+        with self._db:
+            self._db.execute("UPDATE runs SET finished = ? WHERE id = ?",
+                             (time.time(), run_id))
+
+    def close(self):
+        self._db.close()
+
+class RunCheckpoint:
+    """
+    Writes a journaled run's rows into an InvoiceStore `every` source
+    files at a time. Pass file_done as iter_files' on_file_done and feed
+    the rows to write(): a file's rows are committed, with its journal
+    entry, only once all of them have arrived. Files that failed aren't
+    journaled, so a resumed run tries them again.
+    """
+
+    def __init__(self, store, run_id, every=CHECKPOINT_FILES):
+        self.store = store
+        self.run_id = run_id
+        self.every = every
+        self.files = 0
+        self.rows = 0
+        self._rows = []
+        self._sources = []
+        self._complete = 0    # rows in _rows whose files are all done
+
+    def file_done(self, source, error=None):
+        if error is not None:
+            return
+        self._sources.append(source)
+        self._complete = len(self._rows)
+        if len(self._sources) >= self.every:
+            self.commit()
+
+    def write(self, rows):
+        """Consume rows, committing as files complete; return the row count."""
+        for rec in rows:
+            self._rows.append(rec)
+        self.commit()
+        return self.rows
+
+    def commit(self):
+        """Commit every complete file received so far."""
+        if not self._sources:
+            return
+        rows = self._rows[:self._complete]
+        self.store.checkpoint(self.run_id, rows, self._sources)
+        self.files += len(self._sources)
+        self.rows += len(rows)
+        del self._rows[:self._complete]
+        self._sources = []
+        self._complete = 0
@@ -0,0 +1,207 @@
+# invoices/supervisor.py
+
+import multiprocessing
+import queue
+import signal
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+try:
+    import resource
+except ImportError:  # Windows: no address-space limit
+    resource = None
+
+# Wall-clock seconds one file may take to parse (or convert)
+FILE_TIMEOUT = 120
+
+# Address space a worker may map, in bytes
+MEMORY_LIMIT = 2 * 1024 ** 3
+
+# Files a worker parses before it is replaced by a fresh one
+FILES_PER_WORKER = 200
+
+class WorkerError(RuntimeError):
+    """A file killed, hung or outgrew its worker; the message says which."""
+
+@dataclass(frozen=True)
+class WorkerLimits:
+    """Limits every supervised worker runs under; 0 turns one off."""
+    timeout: float = FILE_TIMEOUT   # seconds per file
+    memory: int = MEMORY_LIMIT      # bytes of address space (POSIX only)
+    files: int = FILES_PER_WORKER   # files per worker process
+
+def _context(preload):
+    # Workers never fork from this (threaded) process: they come from a
+    # fork server where there is one, else they are spawned. Either way
+    # each re-imports __main__; modules preloaded in the server make that
+    # quick
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(list(preload))
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+def _serve(conn, memory):
+    """Worker loop: run (fn, args, kwargs) tasks from conn until told to stop."""
+    # Ctrl+C is the parent's to handle; it stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if memory and resource is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            memory = min(memory, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (memory, hard))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        fn, args, kwargs = task
+        try:
+            result = (True, fn(*args, **kwargs))
+        except MemoryError:
+            result = (False, WorkerError("out of memory"))
+        except BaseException as e:
+            result = (False, e)
+        try:
+            conn.send(result)
+        except Exception as e:  # result or exception won't pickle
+            conn.send((False, WorkerError(f"{type(e).__name__}: {e}")))
+
+class SupervisedPool:
+    """
+    Process pool for files that may hang or crash whoever reads them.
+
+    A drop-in for the submit/shutdown side of ProcessPoolExecutor, but
+    each of the `workers` processes is watched by its own thread: a task
+    that runs past limits.timeout gets its worker killed, one that
+    crashes its worker (a segfault in a C library, say) or runs it out of
+    memory fails with a WorkerError naming the cause, and either way a
+    fresh worker takes the next task, so one bad file costs one file.
+    Workers are also replaced every limits.files tasks, so whatever a
+    long run leaks or fragments is handed back. preload names modules
+    (importable from anywhere, e.g. installed packages) for the fork
+    server to import once on behalf of every worker.
+    """
+
+    def __init__(self, workers, limits=None, preload=()):
+        self.limits = limits or WorkerLimits()
+        self._ctx = _context(preload)
+        self._tasks = queue.SimpleQueue()
+        self._procs = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._supervise, daemon=True,
+                             name=f"supervisor-{n}")
+            for n in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) for a worker; return its Future."""
+        if self._closed:
+            raise RuntimeError("cannot submit after shutdown")
+        future = Future()
+        self._tasks.put((future, (fn, args, kwargs)))
+        return future
+
+    def _start(self):
+        conn, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_serve, args=(child, self.limits.memory),
+                                 daemon=True)
+        proc.start()
+        child.close()
+        with self._lock:
+            self._procs.add(proc)
+        return proc, conn
+
+    def _stop(self, proc, conn, kill=False):
+        if not kill:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            proc.join(5)
+        if proc.is_alive():
+            proc.kill()
+        proc.join()
+        conn.close()
+        with self._lock:
+            self._procs.discard(proc)
+
+    def _run(self, proc, conn, task):
+        """Run task on proc; return (ok, value), or None if the worker was lost."""
+        try:
+            conn.send(task)
+            if conn.poll(self.limits.timeout or None):
+                return conn.recv()
+        except (EOFError, OSError):
+            return None
+        if not proc.is_alive():
+            return None
+        proc.kill()
+        return False, WorkerError(f"timed out after {self.limits.timeout:g}s")
+
+    def _supervise(self):
+        proc = conn = None
+        done = 0
+        try:
+            while (item := self._tasks.get()) is not None:
+                future, task = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if proc is None:
+                    proc, conn = self._start()
+                    done = 0
+
+                result = self._run(proc, conn, task)
+                done += 1
+                if result is None:
+                    self._stop(proc, conn, kill=True)
+                    code = proc.exitcode
+                    cause = (f"signal {signal.Signals(-code).name}"
+                             if code is not None and code < 0 else f"exit code {code}")
+                    result = False, WorkerError(f"worker died ({cause})")
+                    proc = None
+                ok, value = result
+                if proc is not None and (isinstance(value, WorkerError)
+                                         or done == self.limits.files):
+                    # Lost its way, or due for recycling
+                    self._stop(proc, conn, kill=isinstance(value, WorkerError))
+                    proc = None
+
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+        finally:
+            if proc is not None:
+                self._stop(proc, conn)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """
+        Stop the workers once the queued tasks are done. cancel_futures
+        drops the queued ones instead and kills the workers mid-task.
+        """
+        self._closed = True
+        if cancel_futures:
+            while True:
+                try:
+                    item = self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[0].cancel()
+            with self._lock:
+                for proc in self._procs:
+                    proc.kill()
+        for _ in self._threads:
+            self._tasks.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
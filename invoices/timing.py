@@ -0,0 +1,187 @@
+# invoices/timing.py
+
+import csv
+import json
+import math
+import os
+import time
+
+from .archive import stat
+
+# Recorder while timing is enabled; None (the default) turns every hook
+# below into a no-op
+_recorder = None
+
+# Stats of the file currently being extracted in this process, if any
+_file = None
+
+class _Off:
+    """Shared do-nothing context manager handed out while disabled."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_OFF = _Off()
+
+class _Stage:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = time.perf_counter() - self.t0
+        # Inside a file: charge that file; otherwise the run as a whole
+        stages = _file["stages"] if _file is not None else _recorder.run_stages
+        stages[self.name] = stages.get(self.name, 0.0) + dt
+        return False
+
+class Recorder:
+    """Per-file stage timings collected over one run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.files = []
+        self.run_stages = {}
+
+    def summary(self, top=20):
+        """
+        Percentiles per stage over the files that went through it, totals
+        for run-level stages, and the `top` slowest files.
+        """
+        per_stage = {"file": [f["total_s"] for f in self.files]}
+        for f in self.files:
+            for name, secs in f["stages"].items():
+                per_stage.setdefault(name, []).append(secs)
+        return {
+            "wall_s": time.perf_counter() - self.started,
+            "files": len(self.files),
+            "bytes": sum(f["bytes"] or 0 for f in self.files),
+            "pages": sum(f["pages"] or 0 for f in self.files),
+            "stages": {name: _describe(v) for name, v in per_stage.items()},
+            "run_stages": dict(self.run_stages),
+            "slowest": sorted(self.files, key=lambda f: f["total_s"],
+                              reverse=True)[:top],
+        }
+
+def _percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    k = math.ceil(q / 100 * len(ordered)) - 1
+    return ordered[max(0, min(len(ordered) - 1, k))]
+
+def _describe(values):
+    ordered = sorted(values)
+    return {
+        "files":   len(ordered),
+        "total_s": sum(ordered),
+        "p50_s":   _percentile(ordered, 50),
+        "p90_s":   _percentile(ordered, 90),
+        "p99_s":   _percentile(ordered, 99),
+        "max_s":   ordered[-1],
+    }
+
+def enable():
+    """Start recording in this process (a no-op if already recording)."""
+    global _recorder
+    if _recorder is None:
+        _recorder = Recorder()
+    return _recorder
+
+def enabled():
+    return _recorder is not None
+
+def stage(name):
+    """
+    Context manager timing one stage. Stages may nest (e.g. "parse"
+    includes "header", "split" and "dates"); each is reported on its own.
+    """
+    if _recorder is None:
+        return _OFF
+    return _Stage(name)
+
+def note(**fields):
+    """Attach facts such as pages=... to the file being timed."""
+    if _file is not None:
+        _file.update(fields)
+
+class timed_file:
+    """
+    Context manager collecting the stages run for one file. The `as`
+    target is the file's stats dict (None while disabled), which is plain
+    data so pool workers can return it; pass it to add() in the parent.
+    """
+
+    __slots__ = ("path", "stats", "t0")
+
+    def __init__(self, path):
+        self.path = path
+        self.stats = None
+
+    def __enter__(self):
+        global _file
+        if _recorder is None:
+            return None
+        try:
+            size = stat(self.path).st_size
+        except OSError:
+            size = None
+        self.stats = _file = {
+            "path": str(self.path), "bytes": size, "pages": None,
+            "total_s": 0.0, "stages": {},
+        }
+        self.t0 = time.perf_counter()
+        return self.stats
+
+    def __exit__(self, *exc):
+        global _file
+        if self.stats is not None:
+            self.stats["total_s"] = time.perf_counter() - self.t0
+            _file = None
+        return False
+
+def add(stats):
+    """Record one file's stats (from timed_file, possibly in a worker)."""
+    if _recorder is not None and stats is not None:
+        _recorder.files.append(stats)
+
+def write_report(path, top=20):
+    """
+    Write the run summary to <path minus extension>.json and one row per
+    file to the matching .csv; return the summary.
+    """
+    base = os.path.splitext(path)[0]
+    summary = _recorder.summary(top)
+    with open(base + ".json", "w") as f:
+        json.dump(summary, f, indent=2)
+
+    names = sorted({n for f in _recorder.files for n in f["stages"]})
+    with open(base + ".csv", "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["path", "bytes", "pages", "total_s", *names])
+        for stats in _recorder.files:
+            w.writerow([stats["path"], stats["bytes"], stats["pages"],
+                        f"{stats['total_s']:.6f}",
+                        *(f"{stats['stages'][n]:.6f}" if n in stats["stages"] else ""
+                          for n in names)])
+    return summary
+
+def print_summary(summary, top=5):
+    """Short console version of a summary."""
+    print(f"\n=== Timings: {summary['files']} files, "
+          f"{summary['pages']} pages in {summary['wall_s']:.1f}s ===")
+    for name, s in summary["stages"].items():
+        print(f"  {name:<14} total {s['total_s']:8.2f}s   p50 {s['p50_s'] * 1e3:8.1f}ms"
+              f"   p90 {s['p90_s'] * 1e3:8.1f}ms   max {s['max_s'] * 1e3:8.1f}ms")
+    for name, secs in summary["run_stages"].items():
+        print(f"  {name:<14} total {secs:8.2f}s")
+    print("Slowest files:")
+    for f in summary["slowest"][:top]:
+        print(f"  {f['total_s']:7.2f}s  {f['path']}")
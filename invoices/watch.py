@@ -0,0 +1,281 @@
+# invoices/watch.py
+
+import ctypes
+import ctypes.util
+import os
+import select
+import sqlite3
+import struct
+import sys
+import time
+
+from .cache import CACHE_DIR, file_digest
+
+# Where the record of already-ingested files lives by default
+STATE_PATH = os.path.join(CACHE_DIR, "ingested.sqlite")
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ISDIR       = 0x40000000
+
+_EVENT = struct.Struct("iIII")
+
+class IngestState:
+    """
+    SQLite record of which files have been ingested, by path, size, mtime
+    and content hash, so a restarted watcher skips what it already did.
+    A file counts as new again only if its contents change.
+    """
+
+    def __init__(self, path=STATE_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS ingested (
+                path     TEXT PRIMARY KEY,
+                size     INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest   TEXT NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def is_new(self, path):
+        """True if path hasn't been ingested in its current form."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False  # gone again
+        key = os.path.abspath(path)
+        row = self._db.execute(
+            "SELECT size, mtime_ns, digest FROM ingested WHERE path = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return True
+        if row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return False
+        # Touched but maybe not changed (copied back, re-saved as is)
+        digest = file_digest(path)
+        if digest != row[2]:
+            return True
+        self._db.execute(
+            "UPDATE ingested SET size = ?, mtime_ns = ? WHERE path = ?",
+            (st.st_size, st.st_mtime_ns, key)
+        )
+        self._db.commit()
+        return False
+
+    def mark(self, paths):
+        """Record paths as ingested in their current form."""
+        rows = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                rows.append((os.path.abspath(path), st.st_size,
+                             st.st_mtime_ns, file_digest(path)))
+            except OSError:
+                pass
+        self._db.executemany("INSERT OR REPLACE INTO ingested VALUES (?, ?, ?, ?)", rows)
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+class PollingWatcher:
+    """
+    Portable watcher: rescans the tree every `interval` seconds and
+    reports files whose size or mtime changed since the last scan. A file
+    still being copied shows up on consecutive scans, so it must go a full
+    scan unchanged (`settle` seconds) before it is trusted.
+    """
+
+    def __init__(self, root, extensions, interval=5.0):
+        self.root = root
+        self.extensions = extensions
+        self.interval = interval
+        self.settle = interval + 1.0
+        self._seen = self._scan()
+        self._next = time.monotonic() + interval
+
+    def _scan(self):
+        seen = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for fname in filenames:
+                if os.path.splitext(fname)[1].lower() in self.extensions:
+                    full = os.path.join(dirpath, fname)
+                    try:
+                        st = os.stat(full)
+                    except OSError:
+                        continue
+                    seen[full] = (st.st_size, st.st_mtime_ns)
+        return seen
+
+    def changes(self, timeout):
+        """Wait up to timeout seconds; return paths changed meanwhile."""
+        wait = self._next - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0.0, wait))
+        self._next = time.monotonic() + self.interval
+        seen, old = self._scan(), self._seen
+        self._seen = seen
+        return [p for p, sig in seen.items() if old.get(p) != sig]
+
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    """
+    Linux watcher on inotify(7) via libc: one watch per directory, added
+    as directories appear. Reports files once they are closed after
+    writing or moved in, so half-copied files aren't picked up.
+    """
+
+    settle = 0.0
+
+    def __init__(self, root, extensions):
+        self.root = root
+        self.extensions = extensions
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        self._add_tree(root)
+
+    def _add_dir(self, path):
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"cannot watch {path}")
+        self._dirs[wd] = path
+
+    def _add_tree(self, top, strict=True):
+        """
+        Watch top and everything under it; return the files found there.
+        Unless strict, a folder that can't be watched (already deleted, or
+        out of watches) is reported and skipped.
+        """
+        found = []
+        for dirpath, _, filenames in os.walk(top):
+            try:
+                self._add_dir(dirpath)
+            except OSError as e:
+                if strict:
+                    raise
+                print(f"Not watching {dirpath}: {e}")
+            found += [os.path.join(dirpath, f) for f in filenames]
+        return found
+
+    def changes(self, timeout):
+        """Wait up to timeout seconds; return paths changed meanwhile."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        pos = 0
+        while pos < len(buf):
+            wd, mask, _, size = _EVENT.unpack_from(buf, pos)
+            name = buf[pos + _EVENT.size:pos + _EVENT.size + size].rstrip(b"\0")
+            pos += _EVENT.size + size
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost; report everything and let the
+                # ingest state sort out what is actually new
+                paths += self._add_tree(self.root, strict=False)
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            parent = self._dirs.get(wd)
+            if parent is None or not name:
+                continue
+            full = os.path.join(parent, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                # New folder (or one moved in): files may already be in it
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    paths += self._add_tree(full, strict=False)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                paths.append(full)
+        return [p for p in paths
+                if os.path.splitext(p)[1].lower() in self.extensions]
+
+    def close(self):
+        os.close(self._fd)
+
+def make_watcher(root, extensions, poll_interval=5.0, polling=False):
+    """inotify on Linux when available, polling everywhere else."""
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, extensions)
+        except (OSError, AttributeError):
+            pass  # no inotify (or out of watches): poll instead
+    return PollingWatcher(root, extensions, poll_interval)
+
+def watch(root, extensions, handle_batch, state, debounce=2.0, batch_size=50,
+          poll_interval=5.0, polling=False):
+    """
+    Feed new or changed files under root to handle_batch(paths), in
+    batches of at most batch_size, until interrupted.
+
+    Anything not yet in `state` (an IngestState) is picked up first, then
+    the tree is watched. A file is handed over once it has had no events
+    for `debounce` seconds. handle_batch returns the paths it ingested,
+    which are marked so; the others (files that failed to parse) are
+    tried again once they change or the watcher restarts. If it raises
+    (say the workbook is open in Excel), the batch is retried after
+    another debounce.
+    """
+    watcher = make_watcher(root, extensions, poll_interval, polling)
+    debounce = max(debounce, watcher.settle)
+    print(f"Watching {root} ({type(watcher).__name__}); Ctrl+C to stop")
+    # path -> time of its last event
+    pending = {}
+    try:
+        now = time.monotonic()
+        for dirpath, _, filenames in os.walk(root):
+            for fname in filenames:
+                if os.path.splitext(fname)[1].lower() in extensions:
+                    pending[os.path.join(dirpath, fname)] = now - debounce
+
+        while True:
+            now = time.monotonic()
+            ready = [p for p, t in pending.items() if now - t >= debounce]
+            for p in ready:
+                del pending[p]
+            ready = [p for p in ready if state.is_new(p)]
+            for i in range(0, len(ready), batch_size):
+                batch = ready[i:i + batch_size]
+                try:
+                    done = handle_batch(batch)
+                except Exception as e:
+                    print(f"Batch of {len(batch)} files failed, will retry: {e}")
+                    for p in batch:
+                        pending[p] = time.monotonic()
+                    continue
+                state.mark(done)
+
+            timeout = debounce if pending else 60.0
+            for p in watcher.changes(timeout):
+                pending[p] = time.monotonic()
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        watcher.close()
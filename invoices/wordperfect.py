@@ -0,0 +1,166 @@
+# invoices/wordperfect.py
+
+import re
+import struct
+from dataclasses import dataclass
+
+from . import timing
+from .archive import Member
+
+class WordPerfectError(ValueError):
+    """The file isn't a WordPerfect 5.x/6.x document this reader can decode."""
+
+# 16-byte prefix of WordPerfect 5.0 and later: magic, offset of the text
+# stream, product, file type, major/minor version, encryption key, and a
+# reserved word
+_PREFIX = struct.Struct("<4sIBBBBHH")
+_MAGIC = b"\xffWPC"
+_PRODUCT_WORDPERFECT = 1
+_FILE_DOCUMENT = 10
+
+# Plain ASCII runs are copied through in one go
+_TEXT_RE = re.compile(rb"[\x20-\x7e]+")
+
+# Extended characters by (character set, number); set 0 is ASCII. Only
+# the sets invoices actually use are mapped
+_CHARSETS = {
+    1: {23: "ß", **dict(enumerate(
+        "ÁáÂâÄäÀàÅåÆæÇçÉéÊêËëÈèÍíÎîÏïÌìÑñÓóÔôÖöÒòÚúÛûÜüÙùŸÿ", start=26))},
+    4: dict(enumerate("●○■•*¶§¡¿«»£¥₧ƒªº½¼¢²ⁿ®©¤¾³‛’‘‟”“–—")),
+}
+
+# WP6 stores the commonest accented letters as single bytes 0x01-0x1F,
+# the default extended international characters (as libwpd maps them)
+_WP6_INTERNATIONAL = "åÅæÆäÄáàâãÃçÇëéÉèêíñÑøØõÕöÖüÜúù"
+
+def _extended(number, charset):
+    if charset == 0 and 0x20 <= number < 0x7f:
+        return chr(number)
+    return _CHARSETS.get(charset, {}).get(number, "�")
+
+@dataclass(frozen=True)
+class _Format:
+    """Function-code layout of one major WordPerfect version."""
+    single: dict        # single-byte code -> text (unlisted: nothing)
+    fixed: dict         # fixed-length code -> length in bytes
+    fixed_text: dict    # fixed-length code -> text
+    extended: int       # fixed-length code holding an extended character
+    groups: range       # variable-length codes
+    group_header: int   # bytes before those counted by a group's length
+    group_text: dict    # variable-length code -> text
+    functions: int      # first multi-byte code
+
+# Tabs, indents, centering and flush right start a new line, as columns
+# do in the PDF text pdf_reader was written against; returns, page
+# breaks and table rows/cells end one
+_WP5 = _Format(
+    single={0x0a: "\n", 0x0b: "\n", 0x0c: "\n", 0x0d: "\n",  # HRt SPg HPg SRt
+            0x8c: "\n", 0x90: "\n", 0xaf: "\n", 0xb0: "\n",  # returns at EOP
+            0xa0: " ",                                       # hard space
+            0xa9: "-", 0xaa: "-", 0xab: "-"},                # hard hyphens
+    fixed={0xc0: 4, 0xc1: 9, 0xc2: 11, 0xc3: 3, 0xc4: 3,
+           0xc5: 5, 0xc6: 6, 0xc7: 7},
+    fixed_text={0xc1: "\n", 0xc2: "\n"},
+    extended=0xc0,
+    groups=range(0xd0, 0x100),
+    group_header=4,
+    group_text={0xdc: "\n", 0xdd: "\n"},                     # table EOL/EOP
+    functions=0xc0,
+)
+
+_WP6 = _Format(
+    single={**dict(enumerate(_WP6_INTERNATIONAL, start=0x01)),
+            0x80: " ", 0x81: " ",                            # soft/hard space
+            0x84: "-",                                       # hard hyphen
+            # A soft hyphen shows only where it ends a line, the soft
+            # return after it starting the next
+            0x85: "-", 0x86: "-",                            # at EOL, auto
+            **dict.fromkeys(range(0x87, 0xd0), "\n")},       # EOL/EOC/EOP codes
+    fixed={0xf0: 4, 0xf1: 5, 0xf2: 3, 0xf3: 3},
+    fixed_text={},
+    extended=0xf0,
+    groups=range(0xd0, 0xf0),
+    group_header=0,
+    group_text={0xd0: "\n", 0xe0: "\n"},                     # EOL group, tabs
+    functions=0xd0,
+)
+
+_FORMATS = {0: _WP5, 2: _WP6}
+
+def extract_text(path):
+    """
+    Return the text of a WordPerfect 5.x/6.x document without converting
+    it (path may be an archive Member). Raises WordPerfectError if it
+    can't be read natively.
+    """
+    with timing.stage("open"):
+        if isinstance(path, Member):
+            data = path.read()
+        else:
+            with open(path, "rb") as f:
+                data = f.read()
+    with timing.stage("get_text"):
+        return decode(data)
+
+def decode(data):
+    """
+    Decode the text stream of a WordPerfect 5.x/6.x document in bytes
+    data, one line per line, tab stop or table cell, the way PyMuPDF reads
+    the document's PDF export. Formatting codes, headers, footers and
+    footnotes are skipped.
+    """
+    # 1) Prefix
+    if len(data) < _PREFIX.size:
+        raise WordPerfectError("file too short for a WordPerfect prefix")
+    magic, pos, product, file_type, major, _, key, _ = _PREFIX.unpack_from(data)
+    if magic != _MAGIC:
+        raise WordPerfectError("no WordPerfect 5.0+ prefix")
+    if product != _PRODUCT_WORDPERFECT or file_type != _FILE_DOCUMENT:
+        raise WordPerfectError("not a WordPerfect document")
+    if key:
+        raise WordPerfectError("document is password protected")
+    fmt = _FORMATS.get(major)
+    if fmt is None:
+        raise WordPerfectError(f"unsupported WordPerfect major version {major}")
+    if not _PREFIX.size <= pos <= len(data):
+        raise WordPerfectError("text stream offset out of range")
+
+    # 2) Text stream
+    out = []
+    n = len(data)
+    text_re = _TEXT_RE
+    while pos < n:
+        if m := text_re.match(data, pos):
+            out.append(m.group().decode("ascii"))
+            pos = m.end()
+            continue
+
+        code = data[pos]
+        if code < fmt.functions:
+            out.append(fmt.single.get(code, ""))
+            pos += 1
+            continue
+
+        if code in fmt.fixed:
+            end = pos + fmt.fixed[code]
+            text = fmt.fixed_text.get(code, "")
+        elif code in fmt.groups:
+            if pos + 4 > n:
+                raise WordPerfectError(f"truncated function 0x{code:02X} at {pos}")
+            end = pos + fmt.group_header + int.from_bytes(data[pos+2:pos+4], "little")
+            text = fmt.group_text.get(code, "")
+        else:
+            raise WordPerfectError(f"unknown function 0x{code:02X} at {pos}")
+
+        # Every multi-byte function ends with its own code again
+        if not pos + 2 <= end <= n or data[end-1] != code:
+            raise WordPerfectError(f"malformed function 0x{code:02X} at {pos}")
+        if code == fmt.extended:
+            text = _extended(data[pos+1], data[pos+2])
+        out.append(text)
+        pos = end
+
+    text = "".join(out)
+    if not text.strip():
+        raise WordPerfectError("no text in document")
+    return text
@@ -0,0 +1,422 @@
+# invoices/workbook.py
+#
+# The workbook is written as a package edit: only the invoices sheet's
+# XML is rewritten (and styles.xml gains the cell formats its rows need);
+# every other part of the .xlsx is copied byte for byte, so other sheets,
+# charts, defined names and the like come through as Excel left them.
+
+import datetime
+import io
+import math
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+import openpyxl
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE, TIME_FORMATS
+from openpyxl.styles.numbers import BUILTIN_FORMATS, BUILTIN_FORMATS_REVERSE
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import MAC_EPOCH, WINDOWS_EPOCH, to_excel
+
+from . import timing
+from .records import COLUMNS
+from .store import Formula
+
+_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+_CENTER = (("horizontal", "center"), ("vertical", "center"))
+
+# Cell formats as (number format, alignment): each column's, and those of
+# dates and times in the extra cells to the right of COLUMNS
+_COLUMN_FORMATS = [
+    ("General", (("wrapText", "1"),)) if key == "project_description" else
+    ('"$"#,##0.00', _CENTER) if key == "invoice_amount" else
+    ("MM/DD/YYYY", _CENTER)
+    if key in ("test_date_start", "test_date_end", "invoice_date") else
+    ("General", _CENTER)
+    for key in COLUMNS
+]
+_TIME_FORMATS = {cls: (fmt, ()) for cls, fmt in TIME_FORMATS.items()
+                 if cls is not datetime.timedelta}
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+def _resolve(base, target):
+    """A relationship target, as a name in the package."""
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), target))
+
+def _relationships(zf, part):
+    """{id: (type, part name)} from part's .rels, {} if it has none."""
+    rels = posixpath.join(posixpath.dirname(part), "_rels",
+                          posixpath.basename(part) + ".rels")
+    if rels not in zf.namelist():
+        return {}
+    root = ET.fromstring(zf.read(rels))
+    return {rel.get("Id"): (rel.get("Type").rsplit("/", 1)[-1],
+                            _resolve(part, rel.get("Target")))
+            for rel in root if rel.get("TargetMode") != "External"}
+
+class _Package:
+    """Where the parts write_workbook needs sit in an .xlsx package."""
+
+    def __init__(self, zf):
+        book = next(name for kind, name in _relationships(zf, "").values()
+                    if kind == "officeDocument")
+        root = ET.fromstring(zf.read(book))
+        sheets, active, self.epoch = [], 0, WINDOWS_EPOCH
+        for el in root.iter():
+            tag = _local(el.tag)
+            if tag == "workbookPr" and el.get("date1904") in ("1", "true"):
+                self.epoch = MAC_EPOCH
+            elif tag == "workbookView":
+                active = int(el.get("activeTab", active))
+            elif tag == "sheet":
+                sheets.append(el.get(_REL))
+        rels = _relationships(zf, book)
+        self.book_rels = posixpath.join(posixpath.dirname(book), "_rels",
+                                        posixpath.basename(book) + ".rels")
+        self.sheet = rels[sheets[active]][1]
+        by_kind = {kind: name for kind, name in rels.values()}
+        self.styles = by_kind["styles"]
+        self.calc_chain = by_kind.get("calcChain")
+        self.tables = {name for kind, name in _relationships(zf, self.sheet).values()
+                       if kind == "table"}
+
+def _set_count(text, tag, count):
+    return re.sub(rf'(<{tag}\b[^>]*?\bcount=")\d+', rf"\g<1>{count}", text, count=1)
+
+def _append_children(text, tag, children, count, after):
+    """
+    Add the children XML to element tag of styles text, creating it after
+    the tag matching `after` if there is none; count is the new total.
+    """
+    if not children:
+        return text
+    if re.search(rf"</{tag}>", text):
+        text = text.replace(f"</{tag}>", children + f"</{tag}>", 1)
+        return _set_count(text, tag, count)
+    element = f'<{tag} count="{count}">{children}</{tag}>'
+    empty = re.search(rf"<{tag}\b[^>]*/>", text)
+    if empty:
+        return text[:empty.start()] + element + text[empty.end():]
+    start = re.search(after, text)
+    return text[:start.end()] + element + text[start.end():]
+
+def _add_formats(styles, formats):
+    """
+    styles.xml with the cell formats it lacks added, and {format: index}.
+    A format already there (same number format and alignment, default
+    font, fill and border) is reused rather than added again.
+    """
+    root = ET.fromstring(styles)
+    codes = dict(BUILTIN_FORMATS)
+    fmts = xfs = ()
+    for el in root:
+        if _local(el.tag) == "numFmts":
+            fmts = list(el)
+            codes.update((int(f.get("numFmtId")), f.get("formatCode")) for f in fmts)
+        elif _local(el.tag) == "cellXfs":
+            xfs = list(el)
+    custom = {code: id for id, code in codes.items() if id >= 164}
+    existing = {}
+    for i, xf in enumerate(xfs):
+        if any(xf.get(k, "0") != "0" for k in ("fontId", "fillId", "borderId")):
+            continue
+        align = next((a for a in xf if _local(a.tag) == "alignment"), None)
+        key = (codes.get(int(xf.get("numFmtId", 0))),
+               tuple(sorted(align.attrib.items())) if align is not None else ())
+        existing.setdefault(key, i)
+
+    text = styles.decode("utf-8")
+    prefix = re.search(r"<(\w+:)?styleSheet\b", text).group(1) or ""
+    new_fmts, new_xfs, index = [], [], {}
+    for code, align in formats:
+        key = (code, tuple(sorted(align)))
+        if key in existing:
+            index[code, align] = existing[key]
+            continue
+        fmt = BUILTIN_FORMATS_REVERSE.get(code, custom.get(code))
+        if fmt is None:
+            fmt = custom[code] = max(custom.values(), default=163) + 1
+            new_fmts.append(f'<{prefix}numFmt numFmtId="{fmt}" '
+                            f'formatCode={quoteattr(code)}/>')
+        xf = (f'<{prefix}xf numFmtId="{fmt}" fontId="0" fillId="0" borderId="0" '
+              f'xfId="0"' + (' applyNumberFormat="1"' if fmt else ""))
+        if align:
+            attrs = "".join(f' {k}="{v}"' for k, v in align)
+            xf += (f' applyAlignment="1"><{prefix}alignment{attrs}/>'
+                   f'</{prefix}xf>')
+        else:
+            xf += "/>"
+        new_xfs.append(xf)
+        index[code, align] = existing[key] = len(xfs) + len(new_xfs) - 1
+
+    text = _append_children(text, f"{prefix}numFmts", "".join(new_fmts),
+                            len(fmts) + len(new_fmts),
+                            rf"<{prefix}styleSheet\b[^>]*>")
+    text = _append_children(text, f"{prefix}cellXfs", "".join(new_xfs),
+                            len(xfs) + len(new_xfs), rf"</{prefix}cellStyleXfs>")
+    return text.encode("utf-8"), index
+
+def _split_sheet(f, size=1 << 16):
+    """
+    Worksheet XML stream f as (head, row 1, tail, prefix): the XML ahead
+    of <sheetData>, its first row if that is row 1 (else None), the XML
+    after </sheetData>, and the tags' namespace prefix. The other rows
+    are read past without being kept.
+    """
+    buf = b""
+    while True:
+        m = re.search(rb"<(\w+:)?sheetData\b([^>]*?)(/?)>", buf)
+        if m:
+            break
+        chunk = f.read(size)
+        if not chunk:
+            raise ValueError("worksheet has no sheetData")
+        buf += chunk
+    head, prefix = buf[:m.start()], m.group(1) or b""
+    buf = buf[m.end():]
+    if m.group(3):
+        return head, None, buf + f.read(), prefix.decode()
+
+    close = b"</" + prefix + b"sheetData>"
+    row = re.compile(rb"\s*(<" + re.escape(prefix) + rb"row\b[^>]*?"
+                     rb"(?:/>|>.*?</" + re.escape(prefix) + rb"row>))", re.S)
+    while True:
+        first = row.match(buf)
+        if first or close in buf:
+            break
+        chunk = f.read(size)
+        if not chunk:
+            raise ValueError("worksheet sheetData is not closed")
+        buf += chunk
+    header = None
+    if first:
+        r = re.search(rb'\br="(\d+)"', first.group(1)[:first.group(1).find(b">")])
+        if r is None or r.group(1) == b"1":
+            header = first.group(1)
+        buf = buf[first.end():]
+    while close not in buf:
+        chunk = f.read(size)
+        if not chunk:
+            raise ValueError("worksheet sheetData is not closed")
+        buf = buf[-len(close):] + chunk
+    tail = buf[buf.index(close) + len(close):]
+    return head, header, tail + f.read(), prefix.decode()
+
+_RANGE = re.compile(r"(\$?[A-Z]+\$?)(\d+)(?::(\$?[A-Z]+\$?)(\d+))?")
+
+def _refit_ranges(refs, last, header=False):
+    """
+    refs (space-separated cell ranges) with those covering the data rows,
+    from row 2 (or the header row 1 if header) on, made to end at row
+    last; whole columns and ranges elsewhere are left as they are.
+    """
+    def refit(m):
+        start = int(m.group(2))
+        end = int(m.group(4) or start)
+        if not (start <= 2 <= end or header and start == 1):
+            return m.group(0)
+        end = max(last, start + header)
+        return f"{m.group(1)}{start}:{m.group(3) or m.group(1)}{end}"
+    return _RANGE.sub(refit, refs)
+
+def _refit_sheet(xml, last):
+    """
+    Worksheet XML (the parts around sheetData) with the ranges that
+    follow the data rows refitted to end at row last: conditional
+    formatting and data validation, in the sheet and in its x14
+    extensions, and the autofilter and its sort. Merged cells among the
+    data rows are dropped, as the cells they joined are gone.
+    """
+    text = xml.decode("utf-8")
+    text = re.sub(
+        r'(<(?:\w+:)?(conditionalFormatting|dataValidation|autoFilter|sortState|'
+        r'sortCondition)\b[^>]*?\b(?:sq)?ref=")([^"]*)',
+        lambda m: m.group(1) + _refit_ranges(
+            m.group(3), last, header=m.group(2) in ("autoFilter", "sortState")),
+        text)
+    text = re.sub(r"(<(\w+:)?sqref>)([^<]*)",
+                  lambda m: m.group(1) + _refit_ranges(m.group(3), last), text)
+
+    def merged(m):
+        kept = [cell for cell in re.findall(r"<(?:\w+:)?mergeCell\b[^>]*/>", m.group(0))
+                if max(int(n) for n in re.findall(
+                    r"\d+", re.search(r'\bref="([^"]*)"', cell).group(1))) < 2]
+        if not kept:
+            return ""
+        return _set_count(m.group(1) + "".join(kept) + m.group(3), m.group(2), len(kept))
+    text = re.sub(r"(<((?:\w+:)?mergeCells)\b[^>]*>).*?(</(?:\w+:)?mergeCells>)",
+                  merged, text, flags=re.S)
+    return text.encode("utf-8")
+
+def _refit_table(xml, last):
+    """Table part XML with its range, and its filter's, refitted to end at row last."""
+    text = xml.decode("utf-8")
+    totals = re.search(r'<(?:\w+:)?table\b[^>]*?\btotalsRowCount="(\d+)"', text)
+    # A table keeps at least one data row, and its totals row after them
+    end = max(last, 2) + (int(totals.group(1)) if totals else 0)
+    text = re.sub(
+        r'(<(?:\w+:)?(?:table|autoFilter|sortState)\b[^>]*?\bref=")([^"]*)',
+        lambda m: m.group(1) + _refit_ranges(m.group(2), end, header=True),
+        text)
+    return text.encode("utf-8")
+
+def _write_rows(out, rows, header, prefix, styles, epoch):
+    """
+    Write <sheetData> with header (row XML, or None for a COLUMNS header)
+    and rows to binary stream out; return (rows written, widest row).
+    """
+    p = prefix
+    letters = [get_column_letter(i) for i in range(1, len(COLUMNS) + 1)]
+    columns = [styles[fmt] for fmt in _COLUMN_FORMATS]
+    times = {cls: styles[fmt] for cls, fmt in _TIME_FORMATS.items()}
+
+    def cell(ref, value, style):
+        s = f' s="{style}"' if style else ""
+        if isinstance(value, bool):
+            return f'<{p}c r="{ref}"{s} t="b"><{p}v>{int(value)}</{p}v></{p}c>'
+        if isinstance(value, (int, float)) and math.isfinite(value):
+            return f'<{p}c r="{ref}"{s}><{p}v>{value!r}</{p}v></{p}c>'
+        if isinstance(value, Formula):
+            # No cached value: Excel calculates it on opening
+            text = escape(ILLEGAL_CHARACTERS_RE.sub("", value[1:]))
+            return f'<{p}c r="{ref}"{s}><{p}f>{text}</{p}f></{p}c>'
+        if isinstance(value, (datetime.date, datetime.time)):
+            if style is None:
+                style = times[datetime.datetime if isinstance(value, datetime.datetime)
+                              else type(value)]
+                s = f' s="{style}"'
+            return f'<{p}c r="{ref}"{s}><{p}v>{to_excel(value, epoch)!r}</{p}v></{p}c>'
+        text = escape(ILLEGAL_CHARACTERS_RE.sub("", str(value)))
+        space = ' xml:space="preserve"' if text != text.strip() else ""
+        return (f'<{p}c r="{ref}"{s} t="inlineStr"><{p}is>'
+                f'<{p}t{space}>{text}</{p}t></{p}is></{p}c>')
+
+    out.write(f"<{p}sheetData>".encode())
+    if header is None:
+        header = "".join(cell(f"{letter}1", key, None)
+                         for letter, key in zip(letters, COLUMNS))
+        header = f'<{p}row r="1">{header}</{p}row>'.encode()
+    out.write(header)
+    count = width = 0
+    for n, values in enumerate(rows, 2):
+        while len(letters) < len(values):
+            letters.append(get_column_letter(len(letters) + 1))
+        width = max(width, len(values))
+        cells = "".join(
+            cell(f"{letter}{n}", value, columns[i] if i < len(columns) else None)
+            for i, (letter, value) in enumerate(zip(letters, values))
+            if value is not None
+        )
+        out.write(f'<{p}row r="{n}">{cells}</{p}row>'.encode("utf-8"))
+        count += 1
+    out.write(f"</{p}sheetData>".encode())
+    return count, width
+
+def _blank_workbook():
+    """An in-memory workbook whose one sheet holds just the COLUMNS header."""
+    wb = openpyxl.Workbook()
+    wb.active.append(COLUMNS)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf
+
+def _write_package(src, rows, path):
+    """
+    Copy .xlsx zip src to path with its active sheet's rows replaced by
+    rows; return how many were written.
+    """
+    package = _Package(src)
+    styles, index = _add_formats(src.read(package.styles),
+                                 [*_COLUMN_FORMATS, *_TIME_FORMATS.values()])
+    with src.open(package.sheet) as f:
+        head, header, tail, prefix = _split_sheet(f)
+    with tempfile.TemporaryFile() as data:
+        count, width = _write_rows(data, rows, header, prefix, index, package.epoch)
+
+        # The dimension, and the ranges over the data, follow the new rows
+        last = get_column_letter(max(width, len(COLUMNS))) + str(count + 1)
+        head = re.sub(rb'(<(?:\w+:)?dimension\b[^>]*?\bref=")[^"]*',
+                      rb"\g<1>A1:" + last.encode(), head, count=1)
+        head = _refit_sheet(head, count + 1)
+        tail = _refit_sheet(tail, count + 1)
+
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as out:
+            for info in src.infolist():
+                name = info.filename
+                entry = zipfile.ZipInfo(name, info.date_time)
+                entry.compress_type = zipfile.ZIP_DEFLATED
+                if name == package.sheet:
+                    data.seek(0)
+                    with out.open(entry, "w") as w:
+                        w.write(head)
+                        shutil.copyfileobj(data, w)
+                        w.write(tail)
+                elif name == package.styles:
+                    out.writestr(entry, styles)
+                elif name in package.tables:
+                    out.writestr(entry, _refit_table(src.read(name), count + 1))
+                elif name == package.calc_chain:
+                    # Lists formula cells the old rows may have had; Excel
+                    # rebuilds it
+                    continue
+                elif package.calc_chain and name in (package.book_rels,
+                                                     "[Content_Types].xml"):
+                    out.writestr(entry, re.sub(
+                        rb"<(?:\w+:)?(?:Relationship|Override)\b[^>]*calcChain[^>]*/>",
+                        b"", src.read(name)))
+                else:
+                    with src.open(info) as r, out.open(entry, "w") as w:
+                        shutil.copyfileobj(r, w)
+    return count
+
+def write_workbook(rows, workbook_path):
+    """
+    Write rows (value lists in COLUMNS order, maybe with extra cells after
+    them) as the data of the invoices sheet in workbook_path, with the
+    COLUMNS formatting; return how many were written.
+
+    Only the invoices (active) sheet's rows change: its header row and
+    everything else in it, such as column widths, frozen panes, merged
+    cells, conditional formatting, data validation and its autofilter,
+    stays, as does every other part of the workbook; the ranges that
+    cover the data rows (its tables, filter, conditional formatting and
+    data validation) are refitted to the new rows, and cells merged among
+    the old rows are unmerged. A missing workbook is created with a
+    COLUMNS header. Rows stream to a temporary file and the result is
+    swapped in, so a failed save can't truncate the workbook; it keeps
+    the workbook's file mode.
+    """
+    if os.path.exists(workbook_path):
+        src = zipfile.ZipFile(workbook_path)
+        mode = os.stat(workbook_path).st_mode & 0o7777
+    else:
+        src = zipfile.ZipFile(_blank_workbook())
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+
+    # Write next to the target and swap in, so a failed save can't
+    # truncate the workbook
+    fd, tmp_path = tempfile.mkstemp(
+        suffix=".xlsx", dir=os.path.dirname(os.path.abspath(workbook_path))
+    )
+    os.close(fd)
+    try:
+        os.chmod(tmp_path, mode)
+        with src, timing.stage("workbook_save"):
+            count = _write_package(src, rows, tmp_path)
+        os.replace(tmp_path, workbook_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
@@ -1,32 +1,32 @@
 # invoices/wpd_reader.py
 
-import os
-import subprocess
-import tempfile
-from invoices.pdf_reader import extract_invoice_data as extract_pdf
+from invoices import wordperfect
+from invoices.archive import spilled
+from invoices.pdf_reader import extract_text as extract_pdf_text
+from invoices.pdf_reader import parse_invoice_text
+from invoices.soffice import converted_pdf
 
-def extract_invoice_data(path):
+def extract_text(path):
     """
-    Convert a .wpd to PDF via LibreOffice, then parse with pdf_reader.
-    Requires 'soffice' on your PATH.
+    Return the text of a .wpd, read natively by invoices.wordperfect.
+    Files that reader can't handle (pre-5.0, encrypted, damaged, or not
+    WordPerfect at all, like .wps) are converted to PDF via LibreOffice
+    instead, through the shared, long-lived instance in invoices.soffice;
+    that needs 'soffice' on your PATH.
     """
-    # Create a temp dir for the converted PDF
-    with tempfile.TemporaryDirectory() as tmpdir:
-        # LibreOffice headless conversion
-        subprocess.run([
-            "soffice",
-            "--headless",
-            "--convert-to", "pdf",
-            "--outdir", tmpdir,
-            path
-        ], check=True)
-
-        # Construct the converted PDF’s filename
-        base = os.path.basename(path)
-        name, _ = os.path.splitext(base)
-        pdf_path = os.path.join(tmpdir, name + ".pdf")
+    try:
+        return wordperfect.extract_text(path)
+    except wordperfect.WordPerfectError:
+        return convert_and_extract_text(path)
 
-        # Delegate to your pdf_reader
-        records = extract_pdf(pdf_path)
+def convert_and_extract_text(path):
+    """
+    Convert a file to PDF via LibreOffice and return its text. An archive
+    member is written out to temp space for the conversion.
+    """
+    with spilled(path) as real_path, converted_pdf(real_path) as pdf_path:
+        return extract_pdf_text(pdf_path)
 
-    return records
+def extract_invoice_data(path):
+    """Read a .wpd (natively, or via LibreOffice), then parse with pdf_reader."""
+    return parse_invoice_text(extract_text(path))
@@ -1,25 +1,24 @@
 # test_wpd.py
 
-import os
-import subprocess
-import tempfile
 import fitz
+from invoices import wordperfect
+from invoices.soffice import converted_pdf
 from invoices.wpd_reader import extract_invoice_data
 
 if __name__ == "__main__":
     sample = r"C:\Users\akitc\OneDrive\Desktop\Data project\Invoices\Compass Minerals\2013\D1 Dryer May 2013 INVOICE 05211304.wpd"
 
-    # 1) Convert the .wpd to PDF in a temp dir
-    with tempfile.TemporaryDirectory() as tmpdir:
-        subprocess.run([
-            "soffice", "--headless", "--convert-to", "pdf",
-            "--outdir", tmpdir, sample
-        ], check=True)
-
-        base = os.path.splitext(os.path.basename(sample))[0]
-        pdf_path = os.path.join(tmpdir, base + ".pdf")
-
-        # 2) Open and immediately close the PDF via a context manager
+    # 1) Read the .wpd natively
+    try:
+        print("=== NATIVE TEXT (first 2000 chars) ===\n")
+        print(wordperfect.extract_text(sample)[:2000])
+    except wordperfect.WordPerfectError as e:
+        print(f"Native reader can't decode it ({e}); LibreOffice will be used")
+    print("\n... (truncated) ...\n")
+
+    # 2) For comparison, convert it to PDF with the shared LibreOffice service
+    with converted_pdf(sample) as pdf_path:
+        # 3) Open and immediately close the PDF via a context manager
         with fitz.open(pdf_path) as doc:
             raw_text = "\n".join(page.get_text() or "" for page in doc)
         # doc is now closed, so the file is free for deletion
@@ -28,10 +27,10 @@ if __name__ == "__main__":
         print(raw_text[:2000])
         print("\n... (truncated) ...\n")
 
-    # 3) Run your extractor on the original .wpd (it will reconvert internally)
+    # 4) Run your extractor on the original .wpd (native, LibreOffice as fallback)
     records = extract_invoice_data(sample)
 
-    # 4) Pretty‐print results
+    # 5) Pretty‐print results
     for i, rec in enumerate(records, start=1):
         print(f"\n=== Item #{i} ===")
         for k, v in rec.items():
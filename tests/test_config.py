@@ -0,0 +1,37 @@
+# tests/test_config.py
+
+import pytest
+
+from invoices import config
+
+@pytest.fixture(autouse=True)
+def no_settings(tmp_path, monkeypatch):
+    monkeypatch.delenv("TETCO_WORKBOOK", raising=False)
+    monkeypatch.setenv("TETCO_CONFIG", str(tmp_path / "tetco.ini"))
+
+def test_path_given_wins(monkeypatch):
+    monkeypatch.setenv("TETCO_WORKBOOK", "env.xlsx")
+    assert config.workbook_path("given.xlsx") == "given.xlsx"
+    assert config.workbook_path() == "env.xlsx"
+
+def test_config_file_setting_is_relative_to_the_file(tmp_path):
+    (tmp_path / "tetco.ini").write_text("[tetco]\nworkbook = books/invoices.xlsx\n")
+    assert config.workbook_path() == str(tmp_path / "books" / "invoices.xlsx")
+
+def test_no_workbook_configured_is_an_error():
+    with pytest.raises(config.ConfigError, match="no workbook"):
+        config.workbook_path()
+    assert config.workbook_path(default="gui.xlsx") == "gui.xlsx"
+
+def test_bad_config_file_is_an_error(tmp_path):
+    (tmp_path / "tetco.ini").write_text("workbook = x.xlsx\n")
+    with pytest.raises(config.ConfigError, match="tetco.ini"):
+        config.workbook_path()
+
+def test_manifest(tmp_path):
+    assert config.read_manifest(tmp_path) == (None, None)
+    (tmp_path / config.MANIFEST).write_text("[client]\nname = JR Simplot\n")
+    assert config.read_manifest(tmp_path) == ("JR Simplot", None)
+    (tmp_path / config.MANIFEST).write_text("[client]\nlocation = Pocatello, ID\n")
+    with pytest.raises(config.ConfigError, match="no client name"):
+        config.read_manifest(tmp_path)
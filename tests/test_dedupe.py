@@ -0,0 +1,45 @@
+# tests/test_dedupe.py
+
+import tarfile
+import zipfile
+
+import pytest
+
+from invoices import archive
+from invoices.cache import file_digest
+from invoices.dedupe import dedupe
+
+@pytest.fixture(params=[".zip", ".tar.gz"])
+def invoices(request, tmp_path):
+    """An archive of two identical invoices and one of the same size."""
+    files = {"a/INVOICE 1.pdf": b"%PDF same", "b/INVOICE 1.pdf": b"%PDF same",
+             "INVOICE 2.pdf": b"%PDF diff"}
+    for name, data in files.items():
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_bytes(data)
+    path = str(tmp_path / ("invoices" + request.param))
+    if request.param == ".zip":
+        with zipfile.ZipFile(path, "w") as zf:
+            for name in files:
+                zf.write(tmp_path / name, name)
+    else:
+        with tarfile.open(path, "w:gz") as tf:
+            for name in files:
+                tf.add(tmp_path / name, name)
+    return path
+
+def test_members_are_hashed_without_keeping_their_contents(invoices):
+    members = list(archive.iter_members(invoices, {".pdf"}))
+    keep, skipped = dedupe(members)
+    assert [m.name for m in keep] == ["a/INVOICE 1.pdf", "INVOICE 2.pdf"]
+    assert [(p.name, kept.name) for p, kept, _ in skipped] == \
+           [("b/INVOICE 1.pdf", "a/INVOICE 1.pdf")]
+    assert all(m.data is None for m in members)
+
+def test_member_digest_is_the_file_digest(invoices, tmp_path):
+    member = next(archive.iter_members(invoices, {".pdf"}))
+    expected = file_digest(str(tmp_path / member.name))
+    assert file_digest(member) == expected
+    assert member.data is None
+    assert file_digest(member, keep=True) == expected
+    assert member.data == b"%PDF same"
@@ -0,0 +1,118 @@
+# tests/test_store.py
+
+import datetime
+import sqlite3
+
+import openpyxl
+import pytest
+
+from invoices.store import InvoiceStore
+
+def record(number="08190001", amount=1250.0, source="2019/INVOICE 08190001.pdf",
+           client="Acme Power", date="03/20/2019", **fields):
+    return {"client_name": client, "project_description": "Stack test Unit 1",
+            "test_date_start": "03/04/2019", "test_date_end": "03/05/2019",
+            "mobilization_count": 1, "invoice_amount": amount,
+            "invoice_date": date, "invoice_number": number, "location": None,
+            "source_file": source, **fields}
+
+def invoice(number, items, client="Acme Power"):
+    source = f"INVOICE {number}.pdf"
+    return [record(number, 100.0 * (n + 1), source, client) for n in range(items)]
+
+@pytest.fixture
+def store(tmp_path):
+    with InvoiceStore(str(tmp_path / "store.sqlite")) as store:
+        yield store
+
+def count(store):
+    return store._db.execute("SELECT count(*) FROM invoices").fetchone()[0]
+
+def test_rerun_with_another_client_name_replaces_the_rows(store, tmp_path):
+    rows = invoice("1", 3) + invoice("2", 2)
+    store.upsert(rows, tmp_path)
+    store.upsert([dict(r, client_name="Acme Power Co.") for r in rows], tmp_path)
+    assert count(store) == 5
+    assert {r["client_name"] for r in store.find()} == {"Acme Power Co."}
+    assert store.totals(("client_name",)) == [
+        {"client_name": "Acme Power Co.", "revenue": 900.0, "invoices": 2,
+         "line_items": 5, "mobilizations": 2}]
+
+def test_rerun_drops_rows_the_parser_no_longer_finds(store, tmp_path):
+    store.upsert(invoice("1", 3), tmp_path)
+    fixed = [dict(r, invoice_number="11") for r in invoice("1", 2)]
+    store.upsert(fixed, tmp_path)
+    assert [(r["invoice_number"], r["invoice_amount"]) for r in store.find()] == \
+           [("11", 100.0), ("11", 200.0)]
+
+def test_same_file_name_in_another_folder_is_another_file(store, tmp_path):
+    store.upsert(invoice("1", 2), tmp_path / "a")
+    store.upsert(invoice("1", 2, client="Other Co."), tmp_path / "b")
+    assert count(store) == 4
+
+def test_rows_seeded_from_the_workbook_are_replaced_by_their_file(store, tmp_path):
+    seeded = [dict(r, source_file=None, extra='["note"]')
+              for r in invoice("1", 2) + invoice("2", 1)]
+    store.upsert(seeded)
+    store.upsert(invoice("1", 2), tmp_path)
+    rows = store._db.execute(
+        "SELECT invoice_key, folder != '', extra FROM invoices ORDER BY id"
+    ).fetchall()
+    assert rows == [("2", 0, '["note"]'), ("1", 1, '["note"]'), ("1", 1, '["note"]')]
+
+def test_checkpoint_clears_a_file_that_now_has_no_rows(store, tmp_path):
+    run = store.start_run(str(tmp_path), "Acme Power", None)
+    store.checkpoint(run, invoice("1", 2), ["INVOICE 1.pdf"])
+    store.checkpoint(run, [], ["INVOICE 1.pdf"])
+    assert count(store) == 0
+
+def test_extra_cells_stay_with_a_reingested_row(store, tmp_path):
+    store.upsert([dict(r, extra='["checked"]') for r in invoice("1", 2)], tmp_path)
+    store.upsert(invoice("1", 2), tmp_path)
+    assert [r[-1] for r in store.rows()] == ["checked", "checked"]
+
+def test_old_store_is_tied_to_its_files(tmp_path):
+    path = str(tmp_path / "store.sqlite")
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE invoices (
+            id INTEGER PRIMARY KEY, client_name TEXT NOT NULL,
+            project_description TEXT, test_date_start TEXT, test_date_end TEXT,
+            mobilization_count INTEGER, invoice_amount REAL, invoice_date TEXT,
+            invoice_number, location TEXT, source_file TEXT NOT NULL,
+            invoice_key TEXT NOT NULL, line INTEGER NOT NULL,
+            UNIQUE (client_name, invoice_key, source_file, line));
+        CREATE TABLE runs (id INTEGER PRIMARY KEY, folder TEXT NOT NULL,
+            client_name TEXT, location TEXT, started REAL NOT NULL, finished REAL);
+        CREATE TABLE run_files (run_id INTEGER NOT NULL, source_file TEXT NOT NULL,
+            PRIMARY KEY (run_id, source_file));
+    """)
+    folder = str(tmp_path / "invoices")
+    db.execute("INSERT INTO runs VALUES (1, ?, 'A', NULL, 0, 0)", (folder,))
+    db.execute("INSERT INTO run_files VALUES (1, 'INVOICE 1.pdf')")
+    # The same file under two client names, and a watch-mode file
+    for client in ("A", "A Corrected"):
+        for line in (1, 2):
+            db.execute("INSERT INTO invoices VALUES (NULL, ?, 'x', NULL, NULL, 1, ?, "
+                       "'2019-03-20', '1', NULL, 'INVOICE 1.pdf', '1', ?)",
+                       (client, 100.0 * line, line))
+    db.execute("INSERT INTO invoices VALUES (NULL, 'A', 'x', NULL, NULL, 1, 100.0, "
+               "'2019-03-20', '2', NULL, 'INVOICE 2.pdf', '2', 1)")
+    db.commit()
+    db.close()
+
+    with InvoiceStore(path) as store:
+        store.upsert(invoice("1", 2, client="A Corrected"), folder)
+        store.upsert(invoice("2", 1, client="A Corrected"), folder)
+        assert sorted((r["client_name"], r["invoice_number"]) for r in store.find()) == \
+               [("A Corrected", "1"), ("A Corrected", "1"), ("A Corrected", "2")]
+
+def test_export_writes_every_row(store, tmp_path):
+    store.upsert(invoice("1", 2), tmp_path)
+    path = str(tmp_path / "out.xlsx")
+    assert store.export(path) == 2
+    ws = openpyxl.load_workbook(path).active
+    rows = list(ws.iter_rows(min_row=2, values_only=True))
+    assert [(r[0], r[5], r[6]) for r in rows] == [
+        ("Acme Power", 100.0, datetime.datetime(2019, 3, 20)),
+        ("Acme Power", 200.0, datetime.datetime(2019, 3, 20))]
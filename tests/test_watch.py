@@ -0,0 +1,56 @@
+# tests/test_watch.py
+
+import pytest
+
+from invoices import watch as watch_module
+from invoices.watch import IngestState, watch
+
+class StopWatcher:
+    settle = 0.0
+
+    def changes(self, timeout):
+        raise KeyboardInterrupt
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch_module, "make_watcher",
+                        lambda *args, **kwargs: StopWatcher())
+    with IngestState(str(tmp_path / "state.sqlite")) as state:
+        yield state
+
+def test_only_files_ingested_are_marked(tmp_path, state):
+    folder = tmp_path / "invoices"
+    folder.mkdir()
+    good, bad = folder / "good.pdf", folder / "bad.pdf"
+    good.write_bytes(b"good")
+    bad.write_bytes(b"bad")
+    batches = []
+    def handle_batch(paths):
+        batches.append(sorted(paths))
+        return [p for p in paths if p != str(bad)]
+
+    watch(str(folder), {".pdf"}, handle_batch, state, debounce=0)
+    assert batches == [[str(bad), str(good)]]
+    assert not state.is_new(str(good))
+    assert state.is_new(str(bad))
+
+def test_batch_that_raises_marks_nothing(tmp_path, state):
+    (tmp_path / "a.pdf").write_bytes(b"a")
+    def handle_batch(paths):
+        raise PermissionError("workbook is open")
+
+    watch(str(tmp_path), {".pdf"}, handle_batch, state, debounce=0)
+    assert state.is_new(str(tmp_path / "a.pdf"))
+
+def test_touched_file_is_not_new_until_it_changes(tmp_path, state):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"a")
+    assert state.is_new(str(path))
+    state.mark([str(path)])
+    path.write_bytes(b"a")
+    assert not state.is_new(str(path))
+    path.write_bytes(b"b")
+    assert state.is_new(str(path))
@@ -0,0 +1,67 @@
+# tests/test_wordperfect.py
+#
+# Documents assembled byte by byte after the WordPerfect 5.1 and 6.x
+# file format references, with their text written out by hand rather
+# than taken from the reader's own tables.
+
+import struct
+
+import pytest
+
+from invoices.wordperfect import WordPerfectError, decode
+
+def document(major, minor, text, packets=b""):
+    """A WordPerfect document: the 16-byte prefix, packets, then text."""
+    prefix = struct.pack("<4sIBBBBHH", b"\xffWPC", 16 + len(packets),
+                         1, 10, major, minor, 0, 0)
+    return prefix + packets + text
+
+# Index block header (type 0xFFFB, 5 packets, 50 bytes) and its packets
+WP51_PACKETS = b"\xfb\xff\x05\x00\x32\x00" + bytes(50)
+
+WP51_INVOICE = (
+    b"\xd0\x01\x08\x00\x58\x02\x58\x02\x08\x00\x01\xd0"  # margins (group)
+    b"\xc3\x0c\xc3INVOICE\xc4\x0c\xc4\x0a"                  # bold on/off, HRt
+    b"Soci\xc0\x29\x01\xc0t\xc0\x29\x01\xc0 G\xc0\x29\x01\xc0n"
+    b"\xc0\x29\x01\xc0rale\x0d"                             # 1,41 e acute; SRt
+    b"Gro\xc0\x17\x01\xc0e Stra\xc0\x17\x01\xc0e\x0a"       # 1,23 sharp s
+    b"INVOICE NO.\xc1\x00\x00\x00\x00\x00\x00\x00\xc1"      # tab
+    b"08190001\x0a"
+    # Hard space, 4,34 em dash, hard hyphen, hard page
+    b"Stack\xa0test \xc0\x22\x04\xc0 Unit\xa91\x0c"
+)
+
+WP6_INVOICE = (
+    b"\xd4\x1b\x0b\x00\x00\x00\x00\x00\x00\x00\xd4"      # page group
+    b"\xf2\x0c\xf2INVOICE\xf3\x0c\xf3\xcc"                  # bold on/off, HRt
+    b"Espa\x14a Energ\xf0\x31\x01\xf0a\xcc"                 # n tilde, 1,49 i acute
+    b"M\x1cller Kraftwerk\xcc"                              # u umlaut
+    b"INVOICE NO.\xe0\x11\x08\x00\x00\x00\x10\xe0"          # tab (group)
+    b"08190002\xcc"
+    # Hard space, hard hyphen, a soft hyphen ending a line and one within
+    b"Stack\x81test\x84Unit 1 and emis\x85\xcfsions\xcc"
+    b"test\x82ing\xcc"
+)
+
+def test_wp51_document():
+    assert decode(document(0, 1, WP51_INVOICE, WP51_PACKETS)) == (
+        "INVOICE\nSociété Générale\nGroße Straße\nINVOICE NO.\n08190001\n"
+        "Stack test — Unit-1\n")
+
+def test_wp6_document():
+    assert decode(document(2, 1, WP6_INVOICE, bytes(40))) == (
+        "INVOICE\nEspaña Energía\nMüller Kraftwerk\nINVOICE NO.\n08190002\n"
+        "Stack test-Unit 1 and emis-\nsions\ntesting\n")
+
+@pytest.mark.parametrize("data, error", [
+    (b"\xffWPC", "too short"),
+    (document(0, 1, b"x").replace(b"WPC", b"WPD"), "no WordPerfect"),
+    (document(2, 1, b"x").replace(b"\x01\x0a", b"\x01\x0b", 1), "not a WordPerfect document"),
+    (document(2, 1, b"x")[:12] + b"\x01\x00" + bytes(2) + b"x", "password"),
+    (document(1, 0, b"x"), "major version 1"),
+    (document(0, 1, b"A\xc0\x29\x01B"), "malformed"),
+    (document(0, 1, b"\x0a\x0d"), "no text"),
+])
+def test_documents_that_cannot_be_read(data, error):
+    with pytest.raises(WordPerfectError, match=error):
+        decode(data)
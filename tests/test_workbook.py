@@ -0,0 +1,144 @@
+# tests/test_workbook.py
+
+import datetime
+import os
+
+import openpyxl
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.worksheet.datavalidation import DataValidation
+from openpyxl.worksheet.table import Table
+
+from invoices.records import COLUMNS
+from invoices.store import InvoiceStore
+from invoices.workbook import write_workbook
+
+ROW = ["Acme Power", "Emissions testing on Boiler 1.",
+       datetime.datetime(2019, 3, 4), datetime.datetime(2019, 3, 5), 1, 1250.0,
+       datetime.datetime(2019, 3, 20), "08190001", "Ogden, UT"]
+
+def make_workbook(path, rows, extra_header=()):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(COLUMNS + list(extra_header))
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    return path
+
+def test_ranges_over_the_data_follow_the_new_rows(tmp_path):
+    path = make_workbook(tmp_path / "book.xlsx", [ROW] * 3, ["remark", "by"])
+    wb = openpyxl.load_workbook(path)
+    ws = wb.active
+    ws.auto_filter.ref = "A1:K4"
+    ws.merge_cells("J1:K1")
+    ws.merge_cells("J3:K3")
+    ws.conditional_formatting.add("F2:F4 H2", CellIsRule(operator="greaterThan",
+                                                         formula=["1000"]))
+    validation = DataValidation(type="list", formula1='"Ogden, UT,Provo, UT"')
+    validation.add("I2:I4")
+    validation.add("C20:C30")
+    ws.add_data_validation(validation)
+    wb.create_sheet("Notes")["A1"] = "kept"
+    wb.save(path)
+
+    assert write_workbook([ROW] * 6, str(path)) == 6
+
+    wb = openpyxl.load_workbook(path)
+    ws = wb.active
+    assert ws.auto_filter.ref == "A1:K7"
+    assert [str(r) for r in ws.merged_cells.ranges] == ["J1:K1"]
+    assert [str(cf.sqref) for cf in ws.conditional_formatting] == ["F2:F7 H2:H7"]
+    assert sorted(str(ws.data_validations.dataValidation[0].sqref).split()) == \
+           ["C20:C30", "I2:I7"]
+    assert wb["Notes"]["A1"].value == "kept"
+
+def test_table_follows_the_new_rows(tmp_path):
+    path = make_workbook(tmp_path / "book.xlsx", [ROW] * 3)
+    wb = openpyxl.load_workbook(path)
+    wb.active.add_table(Table(displayName="Invoices", ref="A1:I4"))
+    wb.save(path)
+
+    write_workbook([ROW] * 5, str(path))
+    assert openpyxl.load_workbook(path).active.tables["Invoices"].ref == "A1:I6"
+    write_workbook([], str(path))
+    assert openpyxl.load_workbook(path).active.tables["Invoices"].ref == "A1:I2"
+
+def test_workbook_keeps_its_file_mode(tmp_path):
+    path = make_workbook(tmp_path / "book.xlsx", [ROW])
+    os.chmod(path, 0o644)
+    write_workbook([ROW], str(path))
+    assert os.stat(path).st_mode & 0o777 == 0o644
+
+    umask = os.umask(0o022)
+    try:
+        write_workbook([ROW], str(tmp_path / "new.xlsx"))
+    finally:
+        os.umask(umask)
+    assert os.stat(tmp_path / "new.xlsx").st_mode & 0o777 == 0o644
+
+def test_formulas_in_extra_cells_survive_export(tmp_path):
+    path = make_workbook(tmp_path / "book.xlsx", [ROW + ["=F2*1.1", "note"]],
+                         ["with_markup", "remark"])
+    ws = openpyxl.load_workbook(path).active
+    ws["K2"] = "=not a formula"
+    ws["K2"].data_type = "s"
+    ws.parent.save(path)
+
+    with InvoiceStore.for_workbook(str(path)) as store:
+        store.export(str(path))
+
+    ws = openpyxl.load_workbook(path).active
+    assert ws["J2"].data_type == "f"
+    assert ws["J2"].value == "=F2*1.1"
+    assert ws["K2"].data_type == "s"
+    assert ws["K2"].value == "=not a formula"
+    assert ws["G2"].value == datetime.datetime(2019, 3, 20)
+
+def edit(path, change):
+    wb = openpyxl.load_workbook(path)
+    change(wb.active)
+    wb.save(path)
+
+def test_edits_made_in_excel_survive_the_next_export(tmp_path, capsys):
+    rows = [ROW[:7] + [f"0819000{n}"] + ROW[8:] for n in range(1, 4)]
+    path = str(make_workbook(tmp_path / "book.xlsx", rows))
+    with InvoiceStore.for_workbook(path) as store:
+        store.export(path)
+
+    def change(ws):
+        ws["I3"] = "Provo, UT"
+        ws.delete_rows(2)
+        ws.append(ROW[:7] + ["08190009"] + ROW[8:])
+    edit(path, change)
+
+    with InvoiceStore.for_workbook(path) as store:
+        assert "2 row(s) changed or deleted, 1 added" in capsys.readouterr().out
+        store.upsert([{"client_name": "Acme Power", "invoice_number": "08190010",
+                       "source_file": "INVOICE 08190010.pdf"}], tmp_path)
+        store.export(path)
+
+    ws = openpyxl.load_workbook(path).active
+    assert [(r[7], r[8]) for r in ws.iter_rows(min_row=2, values_only=True)] == [
+        ("08190002", "Provo, UT"), ("08190003", "Ogden, UT"),
+        ("08190009", "Ogden, UT"), ("08190010", None)]
+
+def test_export_merges_edits_made_while_the_store_was_open(tmp_path):
+    path = str(make_workbook(tmp_path / "book.xlsx", [ROW]))
+    with InvoiceStore.for_workbook(path) as store:
+        store.export(path)
+        edit(path, lambda ws: ws.cell(2, 10, "checked"))
+        store.export(path)
+    assert openpyxl.load_workbook(path).active["J2"].value == "checked"
+
+def test_edit_to_a_row_read_again_since_is_left_out(tmp_path, capsys):
+    path = str(make_workbook(tmp_path / "book.xlsx", []))
+    source = {"client_name": "Acme Power", "invoice_number": "08190001",
+              "source_file": "INVOICE 08190001.pdf"}
+    with InvoiceStore.for_workbook(path) as store:
+        store.upsert([source], tmp_path)
+        store.export(path)
+        edit(path, lambda ws: ws.cell(2, 9, "Provo, UT"))
+        store.upsert([dict(source, invoice_amount=100.0)], tmp_path)
+        store.export(path)
+    assert "1 edited row(s) were left out" in capsys.readouterr().out
+    assert openpyxl.load_workbook(path).active["I2"].value is None
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# tetco.py
+#
+# Headless command line for batch jobs (cron, a job runner). Everything
+# comes from arguments, the invoices folder's client.ini or the config
+# file (see invoices.config), never from a prompt or a dialog, and a
+# command imports only what it uses, so starting one costs next to
+# nothing; benchmarks/bench_startup.py holds it to that.
+#
+#   python tetco.py extract FOLDER [--client NAME [--location LOC]] [--resume] ...
+#   python tetco.py locate FOLDER [--client NAME ...]
+#   python tetco.py export [--out PATH]
+
+import argparse
+import os
+import sys
+from contextlib import nullcontext
+
+from invoices import config
+
+def _workbook_argument(parser):
+    parser.add_argument("--workbook",
+                        help="workbook to export to (default: $TETCO_WORKBOOK or "
+                             f"the workbook setting in {config.CONFIG_PATH})")
+
+def _folder_argument(parser, **kwargs):
+    parser.add_argument("folder", help="folder of invoices (and zip/tar archives)",
+                        **kwargs)
+
+def _extract_arguments(parser):
+    from extract_invoice_data import add_run_arguments
+    _folder_argument(parser, nargs="?")  # not needed for --quarantined
+    add_run_arguments(parser)
+
+def _locate_arguments(parser):
+    from find_locations_for_specific_clients import ALL_LOCATIONS
+    _folder_argument(parser)
+    parser.add_argument("--client", action="append", choices=list(ALL_LOCATIONS),
+                        help="client to find locations for; repeat for more "
+                             "(default: every client)")
+    _workbook_argument(parser)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="re-read every file, bypassing the extraction cache")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="re-read every file and overwrite its cache entry")
+
+def _export_arguments(parser):
+    _workbook_argument(parser)
+    parser.add_argument("--out",
+                        help="write the export here instead of over the workbook")
+
+def _check_folder(args, parser):
+    if args.folder is None:
+        parser.error("the folder is required")
+    if not os.path.isdir(args.folder):
+        parser.error(f"no such folder: {args.folder}")
+
+def extract(args, parser):
+    from extract_invoice_data import extract as run
+
+    def ask():
+        parser.error(f"no client for {args.folder}: pass --client (and "
+                     f"--location) or put a {config.MANIFEST} in the folder")
+
+    if not args.quarantined:
+        _check_folder(args, parser)
+    run(args.folder, args, ask)
+
+def locate(args, parser):
+    from find_locations_for_specific_clients import (ALL_LOCATIONS,
+                                                     locate as run,
+                                                     save_locations)
+    from invoices.cache import ExtractionCache
+    from invoices.store import InvoiceStore
+
+    _check_folder(args, parser)
+    wb_path = config.workbook_path(args.workbook)
+    cache = None if args.no_cache else ExtractionCache(refresh=args.rebuild_cache)
+    with InvoiceStore.for_workbook(wb_path) as store, cache or nullcontext():
+        found = run(args.folder, store, args.client or list(ALL_LOCATIONS),
+                    cache)
+        save_locations(store, found, wb_path)
+
+def export(args, parser):
+    from invoices.store import InvoiceStore
+
+    wb_path = config.workbook_path(args.workbook)
+    out = args.out or wb_path
+    with InvoiceStore.for_workbook(wb_path) as store:
+        count = store.export(out)
+    print(f"Exported {count} records to:\n  {out}")
+
+# name: (help, adds the command's arguments, runs it)
+COMMANDS = {
+    "extract": ("parse a folder of invoices into the store and workbook",
+                _extract_arguments, extract),
+    "locate":  ("infer job locations for invoices already in the store",
+                _locate_arguments, locate),
+    "export":  ("write the store out as the workbook",
+                _export_arguments, export),
+}
+
+def build_parser(command=None):
+    """
+    The command line parser. Only `command`'s arguments are set up, as
+    doing so imports its modules; the others are listed by name.
+    """
+    parser = argparse.ArgumentParser(
+        description="Headless batch commands for the Tetco invoice workbook."
+    )
+    commands = parser.add_subparsers(dest="command", required=True,
+                                     metavar="COMMAND")
+    for name, (summary, add_arguments, run) in COMMANDS.items():
+        sub = commands.add_parser(name, help=summary, description=summary)
+        if name == command:
+            add_arguments(sub)
+        sub.set_defaults(run=run, parser=sub)
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = next((a for a in argv if not a.startswith("-")), None)
+    args = build_parser(command).parse_args(argv)
+    try:
+        args.run(args, args.parser)
+    except config.ConfigError as e:
+        args.parser.error(str(e))
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())